@@ -8,42 +8,81 @@ na cidade e no estado de São Paulo.
 @author: https://github.com/DaviSRodrigues
 """
 
+import base64
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+import gzip
+import hashlib
 from io import StringIO
+import json
 import locale
 from math import isnan, nan
+import os
+import re
 from tableauscraper import TableauScraper
 import traceback
 import sys
 import unicodedata
 
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.io as pio
 from plotly.subplots import make_subplots
+from plotly.utils import PlotlyJSONEncoder
 import requests
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 
 def main():
     locale.setlocale(locale.LC_ALL, 'pt_BR.UTF-8')
 
-    print(f'Carregando dados... {datetime.now():%H:%M:%S}')
-    hospitais_campanha, leitos_municipais, leitos_municipais_privados, leitos_municipais_total = carrega_dados_cidade()
-    dados_munic, dados_estado, isolamento, leitos_estaduais, internacoes, doencas, dados_raciais, dados_vacinacao, doses_aplicadas, doses_recebidas, dados_imunizantes, atualizacao_imunizantes = carrega_dados_estado()
-
-    print(f'\nLimpando e enriquecendo dos dados... {datetime.now():%H:%M:%S}')
-    dados_cidade, dados_munic, hospitais_campanha, leitos_municipais, leitos_municipais_privados, leitos_municipais_total, dados_estado, isolamento, leitos_estaduais, internacoes, doencas, dados_raciais, dados_vacinacao, dados_imunizantes = pre_processamento(hospitais_campanha, leitos_municipais, leitos_municipais_privados, leitos_municipais_total, dados_estado, isolamento, leitos_estaduais, internacoes, doencas, dados_raciais, dados_vacinacao, doses_aplicadas, doses_recebidas, dados_munic, dados_imunizantes, atualizacao_imunizantes)
-    evolucao_cidade, evolucao_estado = gera_dados_evolucao_pandemia(dados_munic, dados_estado, isolamento, dados_vacinacao, internacoes)
-    evolucao_cidade, evolucao_estado = gera_dados_semana(evolucao_cidade, evolucao_estado, leitos_estaduais, isolamento, internacoes)
+    dados = prepara_dados()
 
     print(f'\nGerando gráficos e tabelas... {datetime.now():%H:%M:%S}')
-    gera_graficos(dados_munic, dados_cidade, hospitais_campanha, leitos_municipais, leitos_municipais_privados, leitos_municipais_total, dados_estado, isolamento, leitos_estaduais, evolucao_cidade, evolucao_estado, internacoes, doencas, dados_raciais, dados_vacinacao, dados_imunizantes)
+    arquivos, falhas = gera_graficos(*dados)
+
+    arquivos.append(escreve_indice_graficos(arquivos))
+    remove_blocos_sem_uso()
+
+    if comprime_graficos:
+        print(f'\nComprimindo arquivos... {datetime.now():%H:%M:%S}')
+        comprime_arquivos(arquivos + _ARQUIVOS_ESTATICOS)
+
+    # depois da compressão, cujos tamanhos usa
+    arquivos.append(escreve_navegacao())
+
+    if comprime_graficos:
+        comprime_arquivos([_ARQUIVO_NAVEGACAO])
 
     print(f'\nAtualizando serviceWorker.js... {datetime.now():%H:%M:%S}')
-    atualiza_service_worker(dados_estado)
+    atualiza_service_worker(arquivos)
+
+    if falhas:
+        print(f'\nGráficos com erro: {", ".join(falhas)}', file=sys.stderr)
 
     print('\nFim')
 
+    return falhas
+
+
+def prepara_dados():
+    # dados carregados e processados, na ordem dos parâmetros de gera_graficos
+    print(f'Carregando dados... {datetime.now():%H:%M:%S}')
+    hospitais_campanha, leitos_municipais, leitos_municipais_privados, leitos_municipais_total = carrega_dados_cidade()
+    dados_munic, dados_estado, isolamento, leitos_estaduais, internacoes, doencas, dados_raciais, dados_vacinacao, doses_aplicadas, doses_recebidas, dados_imunizantes, atualizacao_imunizantes = carrega_dados_estado()
+
+    print(f'\nLimpando e enriquecendo dos dados... {datetime.now():%H:%M:%S}')
+    dados_cidade, dados_munic, hospitais_campanha, leitos_municipais, leitos_municipais_privados, leitos_municipais_total, dados_estado, isolamento, leitos_estaduais, internacoes, indice_internacoes, doencas, dados_raciais, dados_vacinacao, dados_imunizantes = pre_processamento(hospitais_campanha, leitos_municipais, leitos_municipais_privados, leitos_municipais_total, dados_estado, isolamento, leitos_estaduais, internacoes, doencas, dados_raciais, dados_vacinacao, doses_aplicadas, doses_recebidas, dados_munic, dados_imunizantes, atualizacao_imunizantes)
+    evolucao_cidade, evolucao_estado = gera_dados_evolucao_pandemia(dados_munic, dados_estado, isolamento, dados_vacinacao, indice_internacoes)
+    evolucao_cidade, evolucao_estado = gera_dados_semana(evolucao_cidade, evolucao_estado, leitos_estaduais, isolamento, indice_internacoes)
+
+    return dados_munic, dados_cidade, hospitais_campanha, leitos_municipais, leitos_municipais_privados, leitos_municipais_total, dados_estado, isolamento, leitos_estaduais, evolucao_cidade, evolucao_estado, internacoes, indice_internacoes, doencas, dados_raciais, dados_vacinacao, dados_imunizantes
+
 
 def carrega_dados_cidade():
     hospitais_campanha = pd.read_csv('dados/hospitais_campanha_sp.csv', sep=',')
@@ -54,6 +93,21 @@ def carrega_dados_cidade():
     return hospitais_campanha, leitos_municipais, leitos_municipais_privados, leitos_municipais_total
 
 
+def _busca_csv(url, **opcoes):
+    # com busca_dados=False nada é baixado e cada busca cai na leitura do arquivo local (gráficos refeitos só com os arquivos de dados/)
+    if not busca_dados:
+        raise RuntimeError(f'busca de dados desativada: {url}')
+
+    return pd.read_csv(url, **opcoes)
+
+
+def _busca_url(url, **opcoes):
+    if not busca_dados:
+        raise RuntimeError(f'busca de dados desativada: {url}')
+
+    return requests.get(url, **opcoes)
+
+
 def carrega_dados_estado():
     hoje = data_processamento
     ano = hoje.strftime('%Y')
@@ -63,7 +117,7 @@ def carrega_dados_estado():
     try:
         print('\tAtualizando dados dos municípios...')
         URL = 'https://raw.githubusercontent.com/seade-R/dados-covid-sp/master/data/dados_covid_sp.csv'
-        dados_munic = pd.read_csv(URL, sep=';', decimal=',')
+        dados_munic = _busca_csv(URL, sep=';', decimal=',')
         opcoes_zip = dict(method='zip', archive_name='dados_munic.csv')
         dados_munic.to_csv('dados/dados_munic.zip', sep=';', decimal=',', index=False, compression=opcoes_zip)
     except Exception as e:
@@ -74,7 +128,7 @@ def carrega_dados_estado():
     try:
         print('\tAtualizando dados estaduais...')
         URL = 'https://raw.githubusercontent.com/seade-R/dados-covid-sp/master/data/sp.csv'
-        dados_estado = pd.read_csv(URL, sep=';')
+        dados_estado = _busca_csv(URL, sep=';')
         dados_estado.to_csv('dados/dados_estado_sp.csv', sep=';')
     except Exception as e:
         traceback.print_exception(type(e), e, e.__traceback__)
@@ -83,21 +137,21 @@ def carrega_dados_estado():
 
     try:
         print('\tCarregando dados de isolamento social...')
-        isolamento = pd.read_csv('dados/isolamento_social.csv', sep=',')
+        isolamento = carrega_isolamento()
     except Exception as e:
-        print(f'\tErro ao buscar isolamento_social.csv\n\t{e}')
+        print(f'\tErro ao carregar os dados de isolamento social\n\t{e}')
 
     try:
         print('\tAtualizando dados de internações...')
         URL = ('https://raw.githubusercontent.com/seade-R/dados-covid-sp/master/data/plano_sp_leitos_internacoes.csv')
-        internacoes = pd.read_csv(URL, sep=';', decimal=',', thousands='.')
+        internacoes = _busca_csv(URL, sep=';', decimal=',', thousands='.')
         internacoes.to_csv('dados/internacoes.csv', sep=';', decimal=',')
     except Exception as e:
         try:
             print(f'\tErro ao buscar internacoes.csv do GitHub: lendo arquivo da Seade.\n\t{e}')
             URL = (f'http://www.seade.gov.br/wp-content/uploads/{ano}/{mes}/Leitos-e-Internacoes.csv')
-            internacoes = pd.read_csv(URL, sep=';', encoding='latin-1', decimal=',', thousands='.', engine='python',
-                                      skipfooter=2)
+            internacoes = _busca_csv(URL, sep=';', encoding='latin-1', decimal=',', thousands='.', engine='python',
+                                     skipfooter=2)
         except Exception as e:
             print(f'\tErro ao buscar internacoes.csv da Seade: lendo arquivo local.\n\t{e}')
             internacoes = pd.read_csv('dados/internacoes.csv', sep=';', decimal=',', thousands='.', index_col=0)
@@ -105,7 +159,7 @@ def carrega_dados_estado():
     try:
         print('\tAtualizando dados de doenças preexistentes...')
         URL = ('https://raw.githubusercontent.com/seade-R/dados-covid-sp/master/data/casos_obitos_doencas_preexistentes.csv.zip')
-        doencas = pd.read_csv(URL, sep=';')
+        doencas = _busca_csv(URL, sep=';')
         if len(doencas.asma.unique()) == 3:
             opcoes_zip = dict(method='zip', archive_name='doencas_preexistentes.csv')
             doencas.to_csv('dados/doencas_preexistentes.zip', sep=';', compression=opcoes_zip)
@@ -120,12 +174,12 @@ def carrega_dados_estado():
         except Exception as e:
             print(f'\tErro ao buscar doencas_preexistentes.csv localmente: lendo arquivo da Seade.\n\t{e}')
             URL = f'http://www.seade.gov.br/wp-content/uploads/{ano}/{mes}/casos_obitos_doencas_preexistentes.csv'
-            doencas = pd.read_csv(URL, sep=';', encoding='latin-1')
+            doencas = _busca_csv(URL, sep=';', encoding='latin-1')
 
     try:
         print('\tAtualizando dados de casos/óbitos por raça e cor...')
         URL = ('https://raw.githubusercontent.com/seade-R/dados-covid-sp/master/data/casos_obitos_raca_cor.csv.zip')
-        dados_raciais = pd.read_csv(URL, sep=';')
+        dados_raciais = _busca_csv(URL, sep=';')
         opcoes_zip = dict(method='zip', archive_name='dados_raciais.csv')
         dados_raciais.to_csv('dados/dados_raciais.zip', sep=';', compression=opcoes_zip)
     except Exception as e:
@@ -146,7 +200,7 @@ def carrega_dados_estado():
         try:
             print('\t\tDoses aplicadas por município...')
             URL = f'https://www.saopaulo.sp.gov.br/wp-content/uploads/{ano}/{mes}/{data}_vacinometro.csv'
-            req = requests.get(URL, headers=headers, stream=True)
+            req = _busca_url(URL, headers=headers, stream=True)
             req.encoding = req.apparent_encoding
             doses_aplicadas = pd.read_csv(StringIO(req.text), sep=';', encoding=req.encoding)
             if doses_aplicadas.columns.size == 1:
@@ -155,14 +209,14 @@ def carrega_dados_estado():
             try:
                 print('\t\tDoses recebidas por cada município...')
                 URL = f'https://www.saopaulo.sp.gov.br/wp-content/uploads/{ano}/{mes}/{data}_vacinometro-1.csv'
-                req = requests.get(URL, headers=headers, stream=True)
+                req = _busca_url(URL, headers=headers, stream=True)
                 req.encoding = req.apparent_encoding
                 doses_aplicadas = pd.read_csv(StringIO(req.text), sep=';', encoding=req.encoding)
             except Exception as e:
                 try:
                     print('\t\tDoses aplicadas por município... .csv.csv')
                     URL = f'https://www.saopaulo.sp.gov.br/wp-content/uploads/{ano}/{mes}/{data}_vacinometro.csv.csv'
-                    req = requests.get(URL, headers=headers, stream=True)
+                    req = _busca_url(URL, headers=headers, stream=True)
                     req.encoding = req.apparent_encoding
                     doses_aplicadas = pd.read_csv(StringIO(req.text), sep=';', encoding=req.encoding)
                 except Exception as e:
@@ -172,7 +226,7 @@ def carrega_dados_estado():
         try:
             print('\t\tDoses recebidas por cada município...')
             URL = f'https://www.saopaulo.sp.gov.br/wp-content/uploads/{ano}/{mes}/{data}_painel_distribuicao_doses.csv'
-            req = requests.get(URL, headers=headers, stream=True)
+            req = _busca_url(URL, headers=headers, stream=True)
             req.encoding = req.apparent_encoding
             doses_recebidas = pd.read_csv(StringIO(req.text), sep=';', encoding=req.encoding)
             if doses_recebidas.columns.size == 1:
@@ -181,14 +235,14 @@ def carrega_dados_estado():
             try:
                 print('\t\tDoses recebidas por cada município...')
                 URL = f'https://www.saopaulo.sp.gov.br/wp-content/uploads/{ano}/{mes}/{data}_painel_distribuicao_doses-1.csv'
-                req = requests.get(URL, headers=headers, stream=True)
+                req = _busca_url(URL, headers=headers, stream=True)
                 req.encoding = req.apparent_encoding
                 doses_recebidas = pd.read_csv(StringIO(req.text), sep=';', encoding=req.encoding)
             except Exception as e:
                 try:
                     print('\t\tDoses recebidas por cada município... .csv.csv')
                     URL = f'https://www.saopaulo.sp.gov.br/wp-content/uploads/{ano}/{mes}/{data}_painel_distribuicao_doses.csv.csv'
-                    req = requests.get(URL, headers=headers, stream=True)
+                    req = _busca_url(URL, headers=headers, stream=True)
                     req.encoding = req.apparent_encoding
                     doses_recebidas = pd.read_csv(StringIO(req.text), sep=';', encoding=req.encoding)
                 except Exception as e:
@@ -220,20 +274,156 @@ def carrega_dados_estado():
         doses_recebidas = None
         atualizacao_imunizantes = None
 
-    leitos_estaduais = pd.read_csv('dados/leitos_estaduais.csv', index_col=0)
-    dados_vacinacao = pd.read_csv('dados/dados_vacinacao.zip')
-    dados_imunizantes = pd.read_csv('dados/dados_imunizantes.csv')
+    leitos_estaduais = carrega_tabela('leitos_estaduais')
+    dados_vacinacao = carrega_tabela('dados_vacinacao')
+    dados_imunizantes = carrega_tabela('dados_imunizantes')
 
     return dados_munic, dados_estado, isolamento, leitos_estaduais, internacoes, doencas, dados_raciais, dados_vacinacao, doses_aplicadas, doses_recebidas, dados_imunizantes, atualizacao_imunizantes
 
 
+# dados de isolamento social, um arquivo AAAA-MM.csv por mês, aos quais só se acrescentam linhas
+_PASTA_ISOLAMENTO = 'dados/isolamento'
+
+# arquivo único com todos os dados de isolamento social, substituído pelas partições mensais
+_ARQUIVO_ISOLAMENTO_ANTIGO = 'dados/isolamento_social.csv'
+
+# colunas das partições de isolamento social, na ordem do cabeçalho
+_COLUNAS_ISOLAMENTO = ['data', 'município', 'populacao', 'UF', 'isolamento', 'dia']
+
+
+def _particao_isolamento(data):
+    return f'{_PASTA_ISOLAMENTO}/{data:%Y-%m}.csv'
+
+
+def carrega_isolamento():
+    # lê todas as partições mensais; as linhas de um dia podem ter sido acrescentadas fora de ordem (ver
+    # grava_isolamento) e a ordenação fica com ordena_por_data
+    if not os.path.isdir(_PASTA_ISOLAMENTO):
+        _migra_isolamento()
+
+    arquivos = sorted(a for a in os.listdir(_PASTA_ISOLAMENTO) if a.endswith('.csv'))
+
+    return pd.concat([pd.read_csv(f'{_PASTA_ISOLAMENTO}/{a}', sep=',') for a in arquivos], ignore_index=True)
+
+
+def grava_isolamento(novos):
+    # acrescenta as linhas ao fim das partições dos seus meses, sem reescrever os dados já gravados; as colunas
+    # são gravadas na ordem do cabeçalho das partições, qualquer que seja a ordem em novos
+    novos = novos[_COLUNAS_ISOLAMENTO].copy()
+    novos['data'] = pd.to_datetime(novos.data).dt.normalize()
+    novos.sort_values(by=['data', 'isolamento'], kind='mergesort', inplace=True)
+
+    for particao, linhas in novos.groupby(novos.data.apply(_particao_isolamento), sort=True):
+        existe = os.path.isfile(particao)
+        linhas.to_csv(particao, sep=',', index=False, mode='a' if existe else 'w', header=not existe,
+                      date_format='%Y-%m-%d')
+
+
+def _migra_isolamento():
+    # divide o arquivo único antigo nas partições mensais, que são gravadas numa pasta temporária e só então
+    # passam a valer, para que uma falha no meio do caminho não deixe partições incompletas
+    print('\t\tDividindo isolamento_social.csv em partições mensais...')
+    isolamento = pd.read_csv(_ARQUIVO_ISOLAMENTO_ANTIGO, sep=',')
+    pasta_temporaria = _PASTA_ISOLAMENTO + '.tmp'
+    os.makedirs(pasta_temporaria, exist_ok=True)
+
+    for mes, linhas in isolamento.groupby(isolamento.data.str[:7], sort=True):
+        linhas.to_csv(f'{pasta_temporaria}/{mes}.csv', sep=',', index=False)
+
+    os.replace(pasta_temporaria, _PASTA_ISOLAMENTO)
+    os.remove(_ARQUIVO_ISOLAMENTO_ANTIGO)
+
+
+# tabelas gravadas como um arquivo base mais um arquivo de alterações (ver carrega_tabela e grava_tabela):
+# colunas que identificam cada linha (a data primeiro) e opções de gravação do arquivo base
+_TABELAS_ATUALIZAVEIS = {
+    'leitos_estaduais': {'arquivo': 'dados/leitos_estaduais.csv', 'chaves': ['data'], 'indice': True},
+    'dados_vacinacao': {'arquivo': 'dados/dados_vacinacao.zip', 'chaves': ['data', 'municipio'], 'indice': False,
+                        'compressao': dict(method='zip', archive_name='dados_vacinacao.csv')},
+    'dados_imunizantes': {'arquivo': 'dados/dados_imunizantes.csv', 'chaves': ['data', 'vacina'], 'indice': False}
+}
+
+# formato das datas gravadas nessas tabelas
+_FORMATO_DATA_TABELAS = '%d/%m/%Y'
+
+# o arquivo de alterações é incorporado ao arquivo base quando passa dessa fração das linhas da base
+_PROPORCAO_COMPACTACAO = 0.1
+
+
+def _arquivo_alteracoes(tabela):
+    return os.path.splitext(tabela['arquivo'])[0] + '-alteracoes.csv'
+
+
+def _le_tabela(nome):
+    # linhas do arquivo base e do arquivo de alterações como estão gravadas (datas em texto); os decimais são
+    # lidos sem perda para que grava_tabela reconheça as linhas que não mudaram
+    tabela = _TABELAS_ATUALIZAVEIS[nome]
+    base = pd.read_csv(tabela['arquivo'], index_col=0 if tabela['indice'] else None, float_precision='round_trip')
+    arquivo = _arquivo_alteracoes(tabela)
+
+    if os.path.isfile(arquivo):
+        alteracoes = pd.read_csv(arquivo, float_precision='round_trip')
+    else:
+        alteracoes = base.iloc[:0]
+
+    return base, alteracoes
+
+
+def _aplica_alteracoes(nome, base, alteracoes):
+    # última versão de cada linha, ordenada pela data e pelas demais chaves
+    if alteracoes.empty:
+        return base
+
+    chaves = _TABELAS_ATUALIZAVEIS[nome]['chaves']
+    dados = pd.concat([base, alteracoes], ignore_index=True).drop_duplicates(subset=chaves, keep='last')
+    dados['_ordem'] = pd.to_datetime(dados.data, format=_FORMATO_DATA_TABELAS)
+    dados.sort_values(by=['_ordem'] + chaves[1:], kind='mergesort', inplace=True)
+
+    return dados.drop(columns='_ordem').reset_index(drop=True)
+
+
+def carrega_tabela(nome):
+    return _aplica_alteracoes(nome, *_le_tabela(nome))
+
+
+def grava_tabela(nome, dados):
+    # acrescenta ao arquivo de alterações só as linhas novas ou modificadas em relação às gravadas (linhas
+    # ausentes de dados não são apagadas); quando ele cresce demais, a tabela é compactada num novo arquivo base
+    tabela = _TABELAS_ATUALIZAVEIS[nome]
+    dados = dados.assign(data=pd.to_datetime(dados.data).dt.strftime(_FORMATO_DATA_TABELAS))
+    base, alteracoes = _le_tabela(nome)
+
+    if list(dados.columns) == list(base.columns):
+        gravadas = set(_aplica_alteracoes(nome, base, alteracoes).to_csv(index=False, header=False).splitlines())
+        novas = dados.loc[[linha not in gravadas for linha in dados.to_csv(index=False, header=False).splitlines()]]
+    else:
+        novas = dados
+
+    if novas.empty:
+        return
+
+    arquivo = _arquivo_alteracoes(tabela)
+
+    if novas is dados or len(alteracoes) + len(novas) > _PROPORCAO_COMPACTACAO * len(base):
+        temporario = tabela['arquivo'] + '.tmp'
+        compactada = _aplica_alteracoes(nome, base, pd.concat([alteracoes, novas], ignore_index=True))
+        compactada.to_csv(temporario, index=tabela['indice'], compression=tabela.get('compressao'))
+        os.replace(temporario, tabela['arquivo'])
+
+        if os.path.isfile(arquivo):
+            os.remove(arquivo)
+    else:
+        existe = os.path.isfile(arquivo)
+        novas.to_csv(arquivo, index=False, mode='a' if existe else 'w', header=not existe)
+
+
 def pre_processamento(hospitais_campanha, leitos_municipais, leitos_municipais_privados, leitos_municipais_total, dados_estado, isolamento, leitos_estaduais, internacoes, doencas, dados_raciais, dados_vacinacao, doses_aplicadas, doses_recebidas, dados_munic, dados_imunizantes, atualizacao_imunizantes):
     print('\tDados municipais...')
     dados_cidade, hospitais_campanha, leitos_municipais, leitos_municipais_privados, leitos_municipais_total = pre_processamento_cidade(dados_munic, hospitais_campanha, leitos_municipais, leitos_municipais_privados, leitos_municipais_total)
     print('\tDados estaduais...')
-    dados_estado, isolamento, leitos_estaduais, internacoes, doencas, dados_raciais, dados_vacinacao, dados_munic, dados_imunizantes = pre_processamento_estado(dados_estado, isolamento, leitos_estaduais, internacoes, doencas, dados_raciais, dados_vacinacao, doses_aplicadas, doses_recebidas, dados_munic, dados_imunizantes, atualizacao_imunizantes)
+    dados_estado, isolamento, leitos_estaduais, internacoes, indice_internacoes, doencas, dados_raciais, dados_vacinacao, dados_munic, dados_imunizantes = pre_processamento_estado(dados_estado, isolamento, leitos_estaduais, internacoes, doencas, dados_raciais, dados_vacinacao, doses_aplicadas, doses_recebidas, dados_munic, dados_imunizantes, atualizacao_imunizantes)
 
-    return dados_cidade, dados_munic, hospitais_campanha, leitos_municipais, leitos_municipais_privados, leitos_municipais_total, dados_estado, isolamento, leitos_estaduais, internacoes, doencas, dados_raciais, dados_vacinacao, dados_imunizantes
+    return dados_cidade, dados_munic, hospitais_campanha, leitos_municipais, leitos_municipais_privados, leitos_municipais_total, dados_estado, isolamento, leitos_estaduais, internacoes, indice_internacoes, doencas, dados_raciais, dados_vacinacao, dados_imunizantes
 
 
 def pre_processamento_cidade(dados_munic, hospitais_campanha, leitos_municipais, leitos_municipais_privados, leitos_municipais_total):
@@ -267,23 +457,77 @@ def formata_municipio(m):
         .replace(' Dos ', ' dos ')
 
 
+def ordena_por_data(dados, coluna='data'):
+    # datas normalizadas (sem horário) e quadro ordenado por elas: pré-requisito das buscas binárias de
+    # linhas_data; a ordenação é estável para preservar a ordem original das linhas de um mesmo dia.
+    # Altera o próprio quadro recebido, que é também o devolvido
+    dados[coluna] = dados[coluna].dt.normalize()
+
+    if not dados[coluna].is_monotonic_increasing:
+        dados.sort_values(by=coluna, kind='mergesort', inplace=True)
+
+    return dados
+
+
+def linhas_data(dados, inicio, fim=None, coluna='data'):
+    # linhas do dia inicio ou do intervalo fechado [inicio, fim], localizadas por busca binária num quadro
+    # ordenado por ordena_por_data; inicio=None considera desde a primeira linha
+    datas = dados[coluna]
+    fim = inicio if fim is None else fim
+
+    primeira = 0 if inicio is None else datas.searchsorted(pd.Timestamp(inicio).normalize(), side='left')
+    ultima = datas.searchsorted(pd.Timestamp(fim).normalize() + timedelta(days=1), side='left')
+
+    return dados.iloc[primeira:ultima]
+
+
+def indexa_internacoes(internacoes):
+    # internações indexadas por (drs, data) e séries já separadas do estado, da capital e da região
+    # metropolitana (soma das DRS), ordenadas por data: as consultas por dia viram buscas no índice
+    # em vez de filtros booleanos sobre o quadro inteiro
+    filtro_estado = internacoes.drs == 'Estado de São Paulo'
+    filtro_municipio = internacoes.drs == 'Município de São Paulo'
+    filtro_rmsp = (internacoes.drs.str.contains('SP')) | filtro_municipio
+
+    colunas = internacoes.columns.drop(['drs', 'data', 'dia'])
+
+    return dict(por_drs=internacoes.set_index(['drs', 'data']).sort_index(),
+                estado=internacoes.loc[filtro_estado].set_index('data').sort_index(),
+                municipio=internacoes.loc[filtro_municipio].set_index('data').sort_index(),
+                rmsp=internacoes.loc[filtro_rmsp].groupby('data')[colunas].sum())
+
+
+def busca_internacoes(indice_internacoes, regiao, data, coluna):
+    # regiao: 'estado', 'municipio', 'rmsp' ou o nome de uma DRS
+    data = pd.Timestamp(data).normalize()
+
+    if regiao in ('estado', 'municipio', 'rmsp'):
+        dados, chave = indice_internacoes[regiao], data
+    else:
+        dados, chave = indice_internacoes['por_drs'], (regiao, data)
+
+    try:
+        return dados.at[chave, coluna]
+    except KeyError:
+        return None
+
+
 def pre_processamento_estado(dados_estado, isolamento, leitos_estaduais, internacoes, doencas, dados_raciais, dados_vacinacao, doses_aplicadas, doses_recebidas, dados_munic, dados_imunizantes, atualizacao_imunizantes):
     dados_estado.columns = ['data', 'total_casos', 'total_obitos']
     dados_estado['data'] = pd.to_datetime(dados_estado.data)
+    dados_estado = ordena_por_data(dados_estado)
     dados_estado['dia'] = dados_estado.data.apply(lambda d: d.strftime('%d %b %y'))
 
     dados_munic['datahora'] = pd.to_datetime(dados_munic.datahora)
+    dados_munic = ordena_por_data(dados_munic, coluna='datahora')
 
     isolamento['data'] = pd.to_datetime(isolamento.data)
+    isolamento = ordena_por_data(isolamento)
 
-    dias_faltantes = []
-    data_atual = datetime.strptime('01/01/2021', '%d/%m/%Y')
-    data_final = isolamento['data'].max()
-
-    while data_atual.date() < data_final.date():
-        if len(isolamento.loc[isolamento.data.dt.date == data_atual.date()]) == 0:
-            dias_faltantes.append(data_atual.date())
-        data_atual = data_atual + timedelta(days=1)
+    # dias desde 01/01/2021 sem dados de isolamento
+    data_final = isolamento['data'].iat[-1]
+    periodo = pd.date_range(datetime.strptime('01/01/2021', '%d/%m/%Y'), data_final - timedelta(days=1))
+    dias_faltantes = [d.date() for d in periodo.difference(pd.DatetimeIndex(isolamento.data.unique()))]
 
     dias_faltantes.append(data_processamento.date() - timedelta(days=1))
 
@@ -311,6 +555,7 @@ def pre_processamento_estado(dados_estado, isolamento, leitos_estaduais, interna
     if busca_isolamento():
         dados_atualizados.columns = ['codigo_ibge', 'data', 'município', 'populacao', 'UF', 'isolamento']
         dados_atualizados.drop(columns='codigo_ibge', inplace=True)
+        atualizacoes = []
 
         for data in dias_faltantes:
             locale.setlocale(locale.LC_ALL, 'en_US.UTF-8')
@@ -318,20 +563,24 @@ def pre_processamento_estado(dados_estado, isolamento, leitos_estaduais, interna
             isolamento_atualizado = dados_atualizados.loc[dados_atualizados.data == data_str].copy()
             locale.setlocale(locale.LC_ALL, 'pt_BR.UTF-8')
 
-            if not isolamento_atualizado.empty and isolamento.loc[isolamento.data.dt.date == data, 'data'].empty:
+            if not isolamento_atualizado.empty and linhas_data(isolamento, data).empty:
                 isolamento_atualizado['isolamento'] = pd.to_numeric(isolamento_atualizado.isolamento.str.replace('%', ''))
                 isolamento_atualizado['município'] = isolamento_atualizado.município.apply(lambda m: formata_municipio(m))
                 isolamento_atualizado['data'] = isolamento_atualizado.data.apply(
                     lambda d: datetime.strptime(d.split(', ')[1] + '/' + str(data.year), '%d/%m/%Y'))
                 isolamento_atualizado['dia'] = isolamento_atualizado.data.apply(lambda d: d.strftime('%d %b %y'))
 
-                isolamento = isolamento.append(isolamento_atualizado)
-                isolamento['data'] = pd.to_datetime(isolamento.data)
-                isolamento.sort_values(by=['data', 'isolamento'], inplace=True)
-                isolamento.to_csv('dados/isolamento_social.csv', sep=',', index=False)
+                grava_isolamento(isolamento_atualizado)
+                atualizacoes.append(isolamento_atualizado)
+
+        if atualizacoes:
+            isolamento = pd.concat([isolamento] + atualizacoes, ignore_index=True)
+            isolamento['data'] = pd.to_datetime(isolamento.data)
+            isolamento = ordena_por_data(isolamento)
 
     print('\t\tAtualizando dados de internações...')
     leitos_estaduais['data'] = pd.to_datetime(leitos_estaduais.data, format='%d/%m/%Y')
+    leitos_estaduais = ordena_por_data(leitos_estaduais)
 
     internacoes.columns = ['data', 'drs', 'pacientes_uti_mm7d', 'total_covid_uti_mm7d', 'ocupacao_leitos',
                            'pop', 'leitos_pc', 'internacoes_7d', 'internacoes_7d_l', 'internacoes_7v7',
@@ -342,6 +591,8 @@ def pre_processamento_estado(dados_estado, isolamento, leitos_estaduais, interna
     internacoes['data'] = pd.to_datetime(internacoes.data)
     internacoes['dia'] = internacoes.data.apply(lambda d: d.strftime('%d %b %y'))
 
+    indice_internacoes = indexa_internacoes(internacoes)
+
     if internacoes.data.max() > leitos_estaduais.data.max():
         novos_dados = {'data': internacoes.data.max(),
                        'sp_uti': None,
@@ -349,31 +600,30 @@ def pre_processamento_estado(dados_estado, isolamento, leitos_estaduais, interna
                        'rmsp_uti': None,
                        'rmsp_enfermaria': None}
 
-        leitos_estaduais = leitos_estaduais.append(novos_dados, ignore_index=True)
+        leitos_estaduais = ordena_por_data(leitos_estaduais.append(novos_dados, ignore_index=True))
 
     def atualizaOcupacaoUTI(series):
-        ocupacao = internacoes.loc[(internacoes.drs == 'Estado de São Paulo') & (internacoes.data == series['data']), 'ocupacao_leitos_ultimo_dia']
-        series['sp_uti'] = ocupacao.item() if any(ocupacao) else series['sp_uti']
+        ocupacao = busca_internacoes(indice_internacoes, 'estado', series['data'], 'ocupacao_leitos_ultimo_dia')
+        series['sp_uti'] = ocupacao if ocupacao else series['sp_uti']
 
-        leitos_enf = internacoes.loc[(internacoes.drs == 'Estado de São Paulo') & (internacoes.data == series['data']), 'total_covid_enf_ultimo_dia']
+        leitos_enf = busca_internacoes(indice_internacoes, 'estado', series['data'], 'total_covid_enf_ultimo_dia')
 
-        if any(leitos_enf):
-            pacientes_enf = internacoes.loc[(internacoes.drs == 'Estado de São Paulo') & (internacoes.data == series['data']), 'pacientes_enf_ultimo_dia']
-            ocupacao = pacientes_enf.item() / leitos_enf.item()
+        if leitos_enf:
+            pacientes_enf = busca_internacoes(indice_internacoes, 'estado', series['data'], 'pacientes_enf_ultimo_dia')
+            ocupacao = pacientes_enf / leitos_enf
             series['sp_enfermaria'] = round(ocupacao * 100, 2)
 
-        filtro_drs = ((internacoes.drs.str.contains('SP')) | (internacoes.drs == 'Município de São Paulo'))
-        leitos = internacoes.loc[(filtro_drs) & (internacoes.data == series['data']), 'total_covid_uti_ultimo_dia'].sum()
+        leitos = busca_internacoes(indice_internacoes, 'rmsp', series['data'], 'total_covid_uti_ultimo_dia') or 0
 
         if leitos > 0:
-            pacientes = internacoes.loc[(filtro_drs) & (internacoes.data == series['data']), 'pacientes_uti_ultimo_dia'].sum()
+            pacientes = busca_internacoes(indice_internacoes, 'rmsp', series['data'], 'pacientes_uti_ultimo_dia')
             ocupacao = pacientes / leitos
             series['rmsp_uti'] = round(ocupacao * 100, 2)
 
-        leitos_enf = internacoes.loc[(filtro_drs) & (internacoes.data == series['data']), 'total_covid_enf_ultimo_dia'].sum()
+        leitos_enf = busca_internacoes(indice_internacoes, 'rmsp', series['data'], 'total_covid_enf_ultimo_dia') or 0
 
         if leitos_enf > 0:
-            pacientes_enf = internacoes.loc[(filtro_drs) & (internacoes.data == series['data']), 'pacientes_enf_ultimo_dia'].sum()
+            pacientes_enf = busca_internacoes(indice_internacoes, 'rmsp', series['data'], 'pacientes_enf_ultimo_dia')
             ocupacao = pacientes_enf / leitos_enf
             series['rmsp_enfermaria'] = round(ocupacao * 100, 2)
 
@@ -382,10 +632,8 @@ def pre_processamento_estado(dados_estado, isolamento, leitos_estaduais, interna
     leitos_estaduais = leitos_estaduais.apply(lambda linha: atualizaOcupacaoUTI(linha), axis=1)
 
     leitos_estaduais['dia'] = leitos_estaduais.data.apply(lambda d: d.strftime('%d %b %y'))
-    leitos_estaduais['data'] = leitos_estaduais.data.apply(lambda d: d.strftime('%d/%m/%Y'))
     colunas = ['data', 'sp_uti', 'sp_enfermaria', 'rmsp_uti', 'rmsp_enfermaria']
-    leitos_estaduais[colunas].to_csv('dados/leitos_estaduais.csv', sep=',')
-    leitos_estaduais['data'] = pd.to_datetime(leitos_estaduais.data, format='%d/%m/%Y')
+    grava_tabela('leitos_estaduais', leitos_estaduais[colunas])
 
     print('\t\tAtualizando dados de doenças preexistentes...')
 
@@ -404,44 +652,41 @@ def pre_processamento_estado(dados_estado, isolamento, leitos_estaduais, interna
                   'imunodepressao': 'count', 'obesidade': 'count', 'outros': 'count', 'pneumopatia': 'count',
                   'puerpera': 'count', 'sindrome_de_down': 'count'})
 
-    def calcula_letalidade(series):
-        # localiza a linha atual passada como parâmetro e obtém a o índice da linha anterior
-        indice = dados_estado.index[dados_estado.data == series['data']].item() - 1
-
-        if indice >= 0:
-            series['casos_dia'] = series['total_casos'] - dados_estado.loc[indice, 'total_casos']
-            series['obitos_dia'] = series['total_obitos'] - dados_estado.loc[indice, 'total_obitos']
-        else:
-            series['casos_dia'] = series['total_casos']
-            series['obitos_dia'] = series['total_obitos']
-
-        # calcula a taxa de letalidade até a data atual
-        if series['total_casos'] > 0:
-            series['letalidade'] = round((series['total_obitos'] / series['total_casos']) * 100, 2)
-
-        return series
-
-    dados_estado = dados_estado.apply(lambda linha: calcula_letalidade(linha), axis=1)
-
-    dados_raciais = dados_raciais[['obito', 'raca_cor']]
-    dados_raciais = dados_raciais.fillna('IGNORADO')
+    # casos e óbitos do dia pela diferença com a linha anterior, por posição no quadro já ordenado por data
+    dados_estado['casos_dia'] = dados_estado.total_casos.diff().fillna(dados_estado.total_casos) \
+        .astype(dados_estado.total_casos.dtype)
+    dados_estado['obitos_dia'] = dados_estado.total_obitos.diff().fillna(dados_estado.total_obitos) \
+        .astype(dados_estado.total_obitos.dtype)
+
+    # taxa de letalidade até cada data
+    dados_estado['letalidade'] = (dados_estado.total_obitos / dados_estado.total_casos * 100).round(2) \
+        .where(dados_estado.total_casos > 0)
+
+    # sexo e idade são mantidos (quando presentes no arquivo) para permitir cruzamentos com raça/cor
+    colunas = ['obito', 'raca_cor'] + [c for c in ['cs_sexo', 'idade'] if c in dados_raciais.columns]
+    dados_raciais = dados_raciais[colunas].rename(columns={'cs_sexo': 'sexo'})
+
+    if 'idade' in dados_raciais.columns:
+        faixas = [0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 200]
+        rotulos = ['0 a 9', '10 a 19', '20 a 29', '30 a 39', '40 a 49', '50 a 59', '60 a 69', '70 a 79', '80 a 89',
+                   '90 ou mais']
+        idades = pd.to_numeric(dados_raciais.idade, errors='coerce')
+        dados_raciais['faixa_etaria'] = pd.cut(idades, bins=faixas, labels=rotulos, right=False).astype(object)
+        dados_raciais = dados_raciais.drop(columns='idade')
+
+    # obito sem valor continua NaN (dropna=False): conta nos casos, mas não é categoria de óbito
+    dados_raciais = dados_raciais.fillna({'raca_cor': 'IGNORADO', 'sexo': 'IGNORADO', 'faixa_etaria': 'IGNORADO'})
     dados_raciais.loc[dados_raciais.raca_cor == 'NONE', 'raca_cor'] = 'IGNORADO'
     dados_raciais['raca_cor'] = dados_raciais.raca_cor.str.title()
-    dados_raciais = dados_raciais.groupby(['obito', 'raca_cor']).agg(contagem=('obito', 'count'))
+    dados_raciais = dados_raciais.groupby(list(dados_raciais.columns), dropna=False).size().to_frame('contagem')
 
     def obtem_dado_anterior(municipio, coluna):
-        indice = pd.Series(dtype='float64')
-        dia_anterior = data_processamento - timedelta(days=1)
-
-        data_inicio_vacinacao = dados_vacinacao.data.min().date()
-
-        while indice.empty and dia_anterior.date() >= data_inicio_vacinacao:
-            indice = dados_vacinacao.index[(dados_vacinacao.data.dt.date == dia_anterior.date()) &
-                                           (dados_vacinacao.municipio == municipio)]
-            dia_anterior = dia_anterior - timedelta(days=1)
+        # registro mais recente do município anterior à data de processamento
+        anteriores = linhas_data(dados_vacinacao, None, data_processamento - timedelta(days=1))
+        indice = anteriores.index[anteriores.municipio == municipio]
 
         if not indice.empty:
-            return dados_vacinacao.loc[indice.item(), coluna]
+            return dados_vacinacao.loc[indice[-1], coluna]
 
         return None if coluna != 'dose_unica' else 0
 
@@ -497,10 +742,10 @@ def pre_processamento_estado(dados_estado, isolamento, leitos_estaduais, interna
             recebidas = None if recebidas.empty else recebidas.iat[0]
 
         nonlocal dados_vacinacao
-        filtro = (dados_vacinacao.municipio == municipio) & (dados_vacinacao.data.dt.date == data_processamento.date())
-        busca = dados_vacinacao.loc[filtro, 'municipio']
+        linhas = linhas_data(dados_vacinacao, data_processamento)
+        filtro = linhas.index[linhas.municipio == municipio]
 
-        if busca.empty:
+        if filtro.empty:
             novos_dados = {'data': data_processamento,
                            'municipio': municipio,
                            'doses_recebidas': recebidas,
@@ -512,7 +757,7 @@ def pre_processamento_estado(dados_estado, isolamento, leitos_estaduais, interna
                            '6a_dose': sexta_dose,
                            'dose_unica': dose_unica}
 
-            dados_vacinacao = dados_vacinacao.append(novos_dados, ignore_index=True)
+            dados_vacinacao = ordena_por_data(dados_vacinacao.append(novos_dados, ignore_index=True))
         else:
             dados_vacinacao.loc[filtro, 'doses_recebidas'] = recebidas
             dados_vacinacao.loc[filtro, '1a_dose'] = primeira_dose
@@ -524,12 +769,11 @@ def pre_processamento_estado(dados_estado, isolamento, leitos_estaduais, interna
             dados_vacinacao.loc[filtro, 'dose_unica'] = dose_unica
 
     def atualiza_populacao():
-        pop_cidade = internacoes.loc[(internacoes.drs == 'Município de São Paulo') &
-                                     (internacoes.data == internacoes.data.max()), 'pop'].iat[0]
+        pop_cidade = busca_internacoes(indice_internacoes, 'municipio', internacoes.data.max(), 'pop')
 
         if pop_cidade is not None:
-            dados_vacinacao.loc[(dados_vacinacao.municipio == 'SAO PAULO') &
-                                (dados_vacinacao.data.dt.date == data_processamento.date()), 'populacao'] = pop_cidade
+            linhas = linhas_data(dados_vacinacao, data_processamento)
+            dados_vacinacao.loc[linhas.index[linhas.municipio == 'SAO PAULO'], 'populacao'] = pop_cidade
 
     def atualiza_estado():
         if doses_aplicadas is None:
@@ -584,12 +828,10 @@ def pre_processamento_estado(dados_estado, isolamento, leitos_estaduais, interna
             recebidas = doses_recebidas['contagem'].sum()
 
         nonlocal dados_vacinacao
-        filtro_e = dados_vacinacao.municipio == 'ESTADO DE SAO PAULO'
-        filtro_d = dados_vacinacao.data.dt.date == data_processamento.date()
-
-        busca = dados_vacinacao.loc[filtro_d & filtro_e, 'municipio']
+        linhas = linhas_data(dados_vacinacao, data_processamento)
+        filtro = linhas.index[linhas.municipio == 'ESTADO DE SAO PAULO']
 
-        if busca.empty:
+        if filtro.empty:
             novos_dados = {'data': data_processamento,
                            'municipio': 'ESTADO DE SAO PAULO',
                            'doses_recebidas': recebidas,
@@ -600,19 +842,19 @@ def pre_processamento_estado(dados_estado, isolamento, leitos_estaduais, interna
                            '5a_dose': quinta_dose,
                            '6a_dose': sexta_dose,
                            'dose_unica': dose_unica,
-                           'populacao': internacoes.loc[(internacoes.drs == 'Estado de São Paulo') & (internacoes.data == internacoes.data.max()), 'pop'].iat[0]}
+                           'populacao': busca_internacoes(indice_internacoes, 'estado', internacoes.data.max(), 'pop')}
 
-            dados_vacinacao = dados_vacinacao.append(novos_dados, ignore_index=True)
+            dados_vacinacao = ordena_por_data(dados_vacinacao.append(novos_dados, ignore_index=True))
         else:
-            dados_vacinacao.loc[filtro_d & filtro_e, 'doses_recebidas'] = recebidas
-            dados_vacinacao.loc[filtro_d & filtro_e, '1a_dose'] = primeira_dose
-            dados_vacinacao.loc[filtro_d & filtro_e, '2a_dose'] = segunda_dose
-            dados_vacinacao.loc[filtro_d & filtro_e, '3a_dose'] = terceira_dose
-            dados_vacinacao.loc[filtro_d & filtro_e, '4a_dose'] = quarta_dose
-            dados_vacinacao.loc[filtro_d & filtro_e, '5a_dose'] = quinta_dose
-            dados_vacinacao.loc[filtro_d & filtro_e, '6a_dose'] = sexta_dose
-            dados_vacinacao.loc[filtro_d & filtro_e, 'dose_unica'] = dose_unica
-            dados_vacinacao.loc[filtro_d & filtro_e, 'populacao'] = internacoes.loc[(internacoes.drs == 'Estado de São Paulo') & (internacoes.data == internacoes.data.max()), 'pop'].iat[0]
+            dados_vacinacao.loc[filtro, 'doses_recebidas'] = recebidas
+            dados_vacinacao.loc[filtro, '1a_dose'] = primeira_dose
+            dados_vacinacao.loc[filtro, '2a_dose'] = segunda_dose
+            dados_vacinacao.loc[filtro, '3a_dose'] = terceira_dose
+            dados_vacinacao.loc[filtro, '4a_dose'] = quarta_dose
+            dados_vacinacao.loc[filtro, '5a_dose'] = quinta_dose
+            dados_vacinacao.loc[filtro, '6a_dose'] = sexta_dose
+            dados_vacinacao.loc[filtro, 'dose_unica'] = dose_unica
+            dados_vacinacao.loc[filtro, 'populacao'] = busca_internacoes(indice_internacoes, 'estado', internacoes.data.max(), 'pop')
 
     def calcula_campos_adicionais(linha):
         primeira_dose = 0 if linha['1a_dose'] is None or isnan(linha['1a_dose']) else linha['1a_dose']
@@ -738,6 +980,7 @@ def pre_processamento_estado(dados_estado, isolamento, leitos_estaduais, interna
     global vacinacao
 
     dados_vacinacao['data'] = pd.to_datetime(dados_vacinacao.data, format='%d/%m/%Y')
+    dados_vacinacao = ordena_por_data(dados_vacinacao)
 
     if vacinacao is True:
         print('\t\tAtualizando dados da campanha de vacinação...')
@@ -773,35 +1016,33 @@ def pre_processamento_estado(dados_estado, isolamento, leitos_estaduais, interna
             atualiza_estado()
 
             print(f'\t\t\tCalculando campos adicionais... {datetime.now():%H:%M:%S}')
-            dados_vacinacao.loc[dados_vacinacao.data.dt.date == hoje.date()] = \
-                dados_vacinacao.loc[dados_vacinacao.data.dt.date == hoje.date()].apply(lambda linha: calcula_campos_adicionais(linha), axis=1)
+            indice_hoje = linhas_data(dados_vacinacao, hoje).index
+            dados_vacinacao.loc[indice_hoje] = dados_vacinacao.loc[indice_hoje].apply(lambda linha: calcula_campos_adicionais(linha), axis=1)
 
             print(f'\t\t\tOrdenando e salvando dados vacinação... {datetime.now():%H:%M:%S}')
-            dados_vacinacao.sort_values(by=['data', 'municipio'], ascending=True, inplace=True)
-            dados_vacinacao['data'] = dados_vacinacao.data.apply(lambda d: d.strftime('%d/%m/%Y'))
-            opcoes_zip = dict(method='zip', archive_name='dados_vacinacao.csv')
-            dados_vacinacao.to_csv('dados/dados_vacinacao.zip', index=False, compression=opcoes_zip)
-            dados_vacinacao['data'] = pd.to_datetime(dados_vacinacao.data, format='%d/%m/%Y')
+            dados_vacinacao.sort_values(by=['data', 'municipio'], kind='mergesort', inplace=True)
+            grava_tabela('dados_vacinacao', dados_vacinacao)
 
         print(f'\t\t\tAtualizando imunizantes... {datetime.now():%H:%M:%S}')
         dados_imunizantes['data'] = pd.to_datetime(dados_imunizantes.data, format='%d/%m/%Y')
+        dados_imunizantes = ordena_por_data(dados_imunizantes)
 
         if atualizacao_imunizantes is not None:
-            if dados_imunizantes.data.max().date() <= data_processamento.date():
-                busca = dados_imunizantes.loc[dados_imunizantes.data.dt.date == data_processamento.date(), 'data']
+            if dados_imunizantes.data.iat[-1].date() <= data_processamento.date():
+                busca = linhas_data(dados_imunizantes, data_processamento)
 
                 if busca.empty:
                     dados_imunizantes = dados_imunizantes.append(atualizacao_imunizantes)
                 else:
+                    atualizacao = linhas_data(ordena_por_data(atualizacao_imunizantes), data_processamento)
+
                     for v in dados_imunizantes.vacina.unique():
-                        dados_imunizantes.loc[(dados_imunizantes.data.dt.date == data_processamento.date()) & (dados_imunizantes.vacina == v), 'aplicadas'] = atualizacao_imunizantes.loc[(atualizacao_imunizantes.data.dt.date == data_processamento.date()) & (atualizacao_imunizantes.vacina == v), 'aplicadas'].iat[0]
+                        dados_imunizantes.loc[busca.index[busca.vacina == v], 'aplicadas'] = atualizacao.loc[atualizacao.vacina == v, 'aplicadas'].iat[0]
 
-                dados_imunizantes['data'] = dados_imunizantes['data'].apply(lambda d: d.strftime('%d/%m/%Y'))
-                dados_imunizantes = dados_imunizantes.astype({'aplicadas': 'int32'})
-                dados_imunizantes.to_csv('dados/dados_imunizantes.csv', index=False)
-                dados_imunizantes['data'] = pd.to_datetime(dados_imunizantes.data, format='%d/%m/%Y')
+                dados_imunizantes = ordena_por_data(dados_imunizantes.astype({'aplicadas': 'int32'}))
+                grava_tabela('dados_imunizantes', dados_imunizantes)
 
-    return dados_estado, isolamento, leitos_estaduais, internacoes, doencas, dados_raciais, dados_vacinacao, dados_munic, dados_imunizantes
+    return dados_estado, isolamento, leitos_estaduais, internacoes, indice_internacoes, doencas, dados_raciais, dados_vacinacao, dados_munic, dados_imunizantes
 
 
 def _converte_semana(data):
@@ -824,7 +1065,7 @@ def _formata_semana_extenso(data, inclui_ano=True):
                datetime.strptime(data + '-6', '%Y-W%U-%w').strftime('%d/%b')
 
 
-def gera_dados_evolucao_pandemia(dados_munic, dados_estado, isolamento, dados_vacinacao, internacoes):
+def gera_dados_evolucao_pandemia(dados_munic, dados_estado, isolamento, dados_vacinacao, indice_internacoes):
     print('\tProcessando dados da evolução da pandemia...')
     # criar dataframe relação: comparar média de isolamento social de duas
     # semanas atrás com a quantidade de casos e de óbitos da semana atual
@@ -840,531 +1081,1229 @@ def gera_dados_evolucao_pandemia(dados_munic, dados_estado, isolamento, dados_va
 
     estado = esquerda.merge(estado, on=['data'], how='outer', suffixes=('_isolamento', '_estado'))
 
-    filtro = dados_vacinacao.municipio == 'ESTADO DE SAO PAULO'
-    colunas = ['data', 'aplicadas_dia', 'perc_imunizadas']
-    vacinacao = dados_vacinacao.loc[filtro, colunas].groupby(['data']).sum().reset_index()
-    vacinacao.columns = ['data', 'vacinadas_semana', 'perc_imu_semana']
+    filtro = dados_vacinacao.municipio == 'ESTADO DE SAO PAULO'
+    colunas = ['data', 'aplicadas_dia', 'perc_imunizadas']
+    vacinacao = dados_vacinacao.loc[filtro, colunas].groupby(['data']).sum().reset_index()
+    vacinacao.columns = ['data', 'vacinadas_semana', 'perc_imu_semana']
+
+    estado = vacinacao.merge(estado, on=['data'], how='outer', suffixes=('_vacinacao', '_estado'))
+
+    intern = indice_internacoes['estado'][['internacoes_ultimo_dia']].groupby(level='data').sum().reset_index()
+    intern.columns = ['data', 'internacoes_semana']
+
+    estado = intern.merge(estado, on=['data'], how='outer', suffixes=('_internacoes', '_estado'))
+
+    estado['data'] = estado.data.apply(lambda d: _converte_semana(d))
+
+    estado = estado.groupby('data') \
+                   .agg({'isolamento': 'mean', 'obitos_semana': sum, 'casos_semana': sum,
+                         'vacinadas_semana': sum, 'perc_imu_semana': max, 'internacoes_semana': sum}) \
+                   .reset_index()
+
+    estado['data'] = estado.data.apply(lambda d: _formata_semana_extenso(d))
+
+    estado['casos_semana'] = estado.casos_semana.apply(lambda c: nan if c == 0 else c)
+    estado['obitos_semana'] = estado.obitos_semana.apply(lambda c: nan if c == 0 else c)
+    estado['vacinadas_semana'] = estado.vacinadas_semana.apply(lambda c: nan if c == 0 else c)
+    estado['internacoes_semana'] = estado.internacoes_semana.apply(lambda c: nan if c == 0 else c)
+
+    evolucao_estado = estado
+
+    # dados municipais
+    filtro = isolamento.município == 'São Paulo'
+    colunas = ['data_futuro', 'isolamento']
+    esquerda = isolamento.loc[filtro, colunas].groupby(['data_futuro']).mean().reset_index()
+    esquerda.columns = ['data', 'isolamento']
+
+    # cidade = dados_cidade[['data', 'óbitos_dia', 'casos_dia']].groupby(['data']).sum().reset_index()
+    cidade = dados_munic.loc[dados_munic.nome_munic == 'São Paulo', ['datahora', 'obitos_novos', 'casos_novos']].groupby(['datahora']).sum().reset_index()
+    cidade.columns = ['data', 'obitos_semana', 'casos_semana']
+
+    cidade = esquerda.merge(cidade, on=['data'], how='outer', suffixes=('_isolamento', '_cidade'))
+
+    filtro = dados_vacinacao.municipio == 'SAO PAULO'
+    colunas = ['data', 'aplicadas_dia', 'perc_imunizadas']
+    vacinacao = dados_vacinacao.loc[filtro, colunas].groupby(['data']).sum().reset_index()
+    vacinacao.columns = ['data', 'vacinadas_semana', 'perc_imu_semana']
+
+    cidade = vacinacao.merge(cidade, on=['data'], how='outer', suffixes=('_vacinacao', '_cidade'))
+
+    intern = indice_internacoes['rmsp'][['internacoes_ultimo_dia']].reset_index()
+    intern.columns = ['data', 'internacoes_semana']
+
+    cidade = intern.merge(cidade, on=['data'], how='outer', suffixes=('_internacoes', '_estado'))
+
+    cidade['data'] = cidade.data.apply(lambda d: _converte_semana(d))
+
+    cidade = cidade.groupby('data') \
+                   .agg({'isolamento': 'mean', 'obitos_semana': sum, 'casos_semana': sum,
+                         'vacinadas_semana': sum, 'perc_imu_semana': max, 'internacoes_semana': sum}) \
+                   .reset_index()
+
+    cidade['data'] = cidade.data.apply(lambda d: _formata_semana_extenso(d))
+
+    cidade['casos_semana'] = cidade.casos_semana.apply(lambda c: nan if c == 0 else c)
+    cidade['obitos_semana'] = cidade.obitos_semana.apply(lambda c: nan if c == 0 else c)
+    cidade['vacinadas_semana'] = cidade.vacinadas_semana.apply(lambda c: nan if c == 0 else c)
+    estado['internacoes_semana'] = estado.internacoes_semana.apply(lambda c: nan if c == 0 else c)
+
+    evolucao_cidade = cidade
+
+    return evolucao_cidade, evolucao_estado
+
+
+def gera_dados_semana(evolucao_cidade, evolucao_estado, leitos_estaduais, isolamento, indice_internacoes):
+    print('\tProcessando dados semanais...')
+
+    def calcula_variacao(dados, linha):
+        indice = dados.index[dados.data == linha['data']].item() - 1
+
+        if indice >= 0:
+            casos_anterior = dados.loc[indice, 'casos_semana']
+            obitos_anterior = dados.loc[indice, 'obitos_semana']
+            uti_anterior = dados.loc[indice, 'uti']
+            isolamento_anterior = dados.loc[indice, 'isolamento_atual']
+            isolamento_2sem_anterior = dados.loc[indice, 'isolamento']
+            vacinadas_anterior = dados.loc[indice, 'vacinadas_semana']
+            perc_imu_semana_anterior = dados.loc[indice, 'perc_imu_semana']
+            internacoes_semana_anterior = dados.loc[indice, 'internacoes_semana']
+
+            if casos_anterior > 0:
+                linha['variacao_casos'] = ((linha['casos_semana'] / casos_anterior) - 1) * 100
+
+            if obitos_anterior > 0:
+                linha['variacao_obitos'] = ((linha['obitos_semana'] / obitos_anterior) - 1) * 100
+
+            if uti_anterior > 0:
+                linha['variacao_uti'] = ((linha['uti'] / uti_anterior) - 1) * 100
+
+            if isolamento_anterior > 0:
+                linha['variacao_isolamento'] = ((linha['isolamento_atual'] / isolamento_anterior) - 1) * 100
+
+            if isolamento_2sem_anterior > 0:
+                linha['variacao_isolamento_2sem'] = ((linha['isolamento'] / isolamento_2sem_anterior) - 1) * 100
+
+            if vacinadas_anterior > 0:
+                linha['variacao_vacinadas'] = ((linha['vacinadas_semana'] / vacinadas_anterior) - 1) * 100
+
+            if perc_imu_semana_anterior > 0:
+                linha['variacao_perc_imu'] = ((linha['perc_imu_semana'] / perc_imu_semana_anterior) - 1) * 100
+
+            if internacoes_semana_anterior > 0:
+                linha['variacao_internacoes'] = ((linha['internacoes_semana'] / internacoes_semana_anterior) - 1) * 100
+
+        return linha
+
+    # cálculo da média da taxa de ocupação de leitos de UTI na semana
+    leitos = indice_internacoes['municipio'][['ocupacao_leitos_ultimo_dia']].reset_index()
+    leitos.columns = ['data', 'uti']
+    leitos['data'] = leitos.data.apply(lambda d: _formata_semana_extenso(_converte_semana(d)))
+
+    leitos = leitos.groupby('data').mean().reset_index()
+
+    evolucao_cidade = evolucao_cidade.merge(leitos, on='data', how='outer', suffixes=('_efeito', '_leitos'))
+
+    filtro = isolamento.município == 'São Paulo'
+    colunas = ['data', 'isolamento']
+
+    isola_atual = isolamento.loc[filtro, colunas]
+    isola_atual['data'] = isola_atual.data.apply(lambda d: _formata_semana_extenso(_converte_semana(d)))
+    isola_atual = isola_atual.groupby('data').mean().reset_index()
+    isola_atual.columns = ['data', 'isolamento_atual']
+
+    evolucao_cidade = evolucao_cidade.merge(isola_atual, on='data', how='left', suffixes=('_efeito', '_isola'))
+
+    evolucao_cidade = evolucao_cidade.apply(lambda linha: calcula_variacao(evolucao_cidade, linha), axis=1)
+
+    # dados estaduais
+    leitos = pd.DataFrame()
+    leitos['data'] = leitos_estaduais.data.apply(lambda d: _formata_semana_extenso(_converte_semana(d)))
+    leitos['uti'] = leitos_estaduais.sp_uti
+
+    leitos = leitos.groupby('data').mean().reset_index()
+
+    evolucao_estado = evolucao_estado.merge(leitos, on='data', how='outer', suffixes=('_efeito', '_leitos'))
+
+    filtro = isolamento.município == 'Estado de São Paulo'
+    colunas = ['data', 'isolamento']
+
+    isola_atual = isolamento.loc[filtro, colunas]
+    isola_atual['data'] = isola_atual.data.apply(lambda d: _formata_semana_extenso(_converte_semana(d)))
+    isola_atual = isola_atual.groupby('data').mean().reset_index()
+    isola_atual.columns = ['data', 'isolamento_atual']
+
+    evolucao_estado = evolucao_estado.merge(isola_atual, on='data', how='left', suffixes=('_efeito', '_isola'))
+
+    evolucao_estado = evolucao_estado.apply(lambda linha: calcula_variacao(evolucao_estado, linha), axis=1)
+
+    return evolucao_cidade, evolucao_estado
+
+
+def lista_graficos(dados_munic, dados_cidade, hospitais_campanha, leitos_municipais, leitos_municipais_privados, leitos_municipais_total, dados_estado, isolamento, leitos_estaduais, evolucao_cidade, evolucao_estado, internacoes, indice_internacoes, doencas, dados_raciais, dados_vacinacao, dados_imunizantes):
+    # (descrição, função, argumentos) de cada gráfico e tabela gerados
+    retrato = gera_retrato_diario(data_processamento, dados_munic, dados_estado, leitos_estaduais, isolamento, indice_internacoes, dados_vacinacao)
+
+    graficos = [  # ('Resumo da campanha de vacinação', gera_resumo_vacinacao, (retrato,)),
+                ('Resumo diário', gera_resumo_diario, (retrato,)),
+                ('Resumo semanal', gera_resumo_semanal, (evolucao_cidade, evolucao_estado)),
+                ('Evolução da pandemia no estado', gera_evolucao_estado, (evolucao_estado,)),
+                ('Evolução da pandemia na cidade', gera_evolucao_cidade, (evolucao_cidade,)),
+                ('Casos no estado', gera_casos_estado, (dados_estado,)),
+                ('Casos na cidade', gera_casos_cidade, (dados_cidade,)),
+                ('Casos e óbitos estaduais por raça/cor', gera_casos_obitos_por_raca_cor, (dados_raciais,)),
+                ('Isolamento social', gera_isolamento_grafico, (isolamento,)),
+                ('Tabela de isolamento social', gera_isolamento_tabela, (isolamento,)),
+                ('Leitos no estado', gera_leitos_estaduais, (leitos_estaduais,)),
+                ('Departamentos Regionais de Saúde', gera_drs, (internacoes,))]
+                # ('Evolução da campanha de vacinação no estado', gera_evolucao_vacinacao_estado, (dados_vacinacao,)),
+                # ('Evolução da campanha de vacinação na cidade', gera_evolucao_vacinacao_cidade, (dados_vacinacao,)),
+                # ('População vacinada', gera_populacao_vacinada, (dados_vacinacao,)),
+                # ('1ª dose x 2ª dose', gera_tipo_doses, (dados_vacinacao,)),
+                # ('Doses recebidas x aplicadas', gera_doses_aplicadas, (dados_vacinacao,)),
+                # ('Tabela da campanha de vacinação', gera_tabela_vacinacao, (dados_vacinacao,)),
+                # ('Distribuição de imunizantes por fabricante', gera_distribuicao_imunizantes, (dados_imunizantes,))]
+
+    if processa_doencas:
+        graficos.append(('Doenças preexistentes nos casos estaduais', gera_doencas_preexistentes_casos, (doencas,)))
+        graficos.append(('Doenças preexistentes nos óbitos estaduais', gera_doencas_preexistentes_obitos, (doencas,)))
+
+    return graficos
+
+
+def gera_graficos(*dados):
+    graficos = lista_graficos(*dados)
+    configuracao = dict(data_processamento=data_processamento, processa_doencas=processa_doencas,
+                        vacinacao=vacinacao, graficos_json=graficos_json)
+
+    # os gráficos só usam o dia de data_processamento, e o horário da execução não deve refazê-los
+    configuracao_impressao = dict(configuracao, data_processamento=data_processamento.date())
+
+    # gráficos cujas entradas não mudaram desde a última execução e cujos arquivos ainda existem não são refeitos
+    cache = _carrega_json(_ARQUIVO_CACHE_GRAFICOS, {}) if cache_graficos else {}
+    pendentes = []
+
+    for descricao, funcao, argumentos in graficos:
+        impressao = _impressao_grafico(funcao, argumentos, configuracao_impressao)
+        registro = cache.get(funcao.__name__)
+
+        if registro is not None and registro['impressao'] == impressao and \
+                all(os.path.exists(arquivo) for arquivo in registro['arquivos']):
+            print(f'\t{descricao}: sem alterações')
+        else:
+            pendentes.append((descricao, funcao, argumentos, impressao))
+
+    # gráficos que falharam: os demais são gerados normalmente, mas a execução termina com erro (ver main)
+    falhas = []
+
+    for descricao, funcao, impressao, erro, arquivos in _executa_graficos(pendentes, configuracao):
+        _informa_erro_grafico(descricao, erro)
+
+        if erro is None:
+            cache[funcao.__name__] = {'impressao': impressao, 'arquivos': arquivos}
+        else:
+            cache.pop(funcao.__name__, None)
+            falhas.append(descricao)
+
+    if cache_graficos:
+        _grava_cache_graficos(cache)
+
+    # arquivos de todos os gráficos conhecidos, refeitos ou não nesta execução
+    return [arquivo for registro in cache.values() for arquivo in registro['arquivos']], falhas
+
+
+def _executa_graficos(graficos, configuracao):
+    if processos_graficos == 1 or len(graficos) <= 1:
+        for descricao, funcao, argumentos, impressao in graficos:
+            print(f'\t{descricao}...')
+            yield (descricao, funcao, impressao) + _executa_grafico(funcao, argumentos)
+
+        return
+
+    # cada gráfico é independente dos demais e grava os próprios arquivos: os trabalhos são distribuídos
+    # entre processos e os resultados são lidos na ordem de submissão, para que o log seja determinístico
+    with ProcessPoolExecutor(max_workers=processos_graficos, initializer=_inicializa_processo_graficos,
+                             initargs=(configuracao,)) as executor:
+        tarefas = [(descricao, funcao, impressao, executor.submit(_executa_grafico, funcao, argumentos))
+                   for descricao, funcao, argumentos, impressao in graficos]
+
+        for descricao, funcao, impressao, tarefa in tarefas:
+            print(f'\t{descricao}...')
+
+            try:
+                erro, arquivos = tarefa.result()
+            except Exception as e:
+                # falha do próprio processo (ex.: argumentos que não puderam ser serializados)
+                erro, arquivos = ''.join(traceback.format_exception(type(e), e, e.__traceback__)), []
+
+            yield descricao, funcao, impressao, erro, arquivos
+
+
+def _inicializa_processo_graficos(configuracao):
+    # variáveis globais definidas no bloco principal, que não existem nos processos criados por spawn
+    globals().update(configuracao)
+
+    locale.setlocale(locale.LC_ALL, 'pt_BR.UTF-8')
+
+
+def _executa_grafico(funcao, argumentos):
+    # o erro volta como texto para que uma falha não interrompa os demais gráficos;
+    # a lista de arquivos gravados vai para o cache de gráficos
+    _arquivos_gerados.clear()
+
+    try:
+        funcao(*argumentos)
+    except Exception as e:
+        return ''.join(traceback.format_exception(type(e), e, e.__traceback__)), []
+    finally:
+        _finaliza_graficos()
+
+    return None, list(dict.fromkeys(_arquivos_gerados))
+
+
+def _impressao_grafico(funcao, argumentos, configuracao):
+    # resumo de tudo o que define os arquivos de um gráfico: o código do script, os argumentos (DataFrames pelo
+    # conteúdo) e as variáveis globais consultadas pela função (graficos_json muda os arquivos de todos eles)
+    impressao = hashlib.sha256()
+
+    with open(__file__, 'rb') as script:
+        impressao.update(script.read())
+
+    impressao.update(funcao.__name__.encode())
+
+    for nome, valor in sorted(configuracao.items()):
+        if nome == 'graficos_json' or nome in funcao.__code__.co_names:
+            impressao.update(f'{nome}={valor!r}'.encode())
+
+    _atualiza_impressao(impressao, argumentos)
+
+    return impressao.hexdigest()
+
+
+def _atualiza_impressao(impressao, valor):
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        colunas = list(valor.columns) if isinstance(valor, pd.DataFrame) else [valor.name]
+        impressao.update(repr((colunas, [str(t) for t in np.atleast_1d(valor.dtypes)])).encode())
+        impressao.update(pd.util.hash_pandas_object(valor, index=True).values.tobytes())
+    elif isinstance(valor, dict):
+        for chave in sorted(valor, key=str):
+            impressao.update(repr(chave).encode())
+            _atualiza_impressao(impressao, valor[chave])
+    elif isinstance(valor, (list, tuple)):
+        impressao.update(f'[{len(valor)}'.encode())
+
+        for item in valor:
+            _atualiza_impressao(impressao, item)
+    else:
+        impressao.update(repr(valor).encode())
+
+
+def _grava_cache_graficos(cache):
+    with open(_ARQUIVO_CACHE_GRAFICOS, 'w', encoding='utf-8') as arquivo:
+        json.dump(cache, arquivo, indent=1, sort_keys=True)
+
+
+def _informa_erro_grafico(descricao, erro):
+    if erro is not None:
+        print(f'\t\tErro ao gerar o gráfico "{descricao}":\n{erro}', file=sys.stderr)
+
+
+_MODELO_GRAFICO = '''<html>
+<head><meta charset="utf-8" /></head>
+<body>
+    <div id="grafico" class="plotly-graph-div" style="height:{altura}; width:100%;"></div>
+    <script src="plotly.min.js"></script>
+    <script src="grafico.js"></script>
+    <script>carregaGrafico('grafico', '{nome}', {mobile});</script>
+</body>
+</html>
+'''
+
+_MODELO_TABELA = '''<!DOCTYPE html>
+<html lang="pt-br">
+<head>
+    <meta charset="utf-8"/>
+    <meta name="viewport" content="width=device-width, initial-scale=1"/>
+    <link rel="stylesheet" href="tabela.css"/>
+</head>
+<body{classe}>
+{busca}    <div class="rolagem"{altura}>
+    <table class="{classes}"{atributos}>
+{legenda}    <thead>
+{cabecalho}
+    </thead>
+    <tbody>
+{linhas}    </tbody>
+    </table>
+    </div>
+{rodape}</body>
+</html>
+'''
+
+# especificações das versões desktop aguardando a versão mobile do mesmo gráfico
+_graficos_pendentes = {}
+
+# arquivos gravados pelo gráfico em execução (ver _executa_grafico)
+_arquivos_gerados = []
+
+# impressão das entradas e arquivos gravados de cada gráfico (ver _impressao_grafico)
+_ARQUIVO_CACHE_GRAFICOS = 'docs/graficos/cache.json'
+
+# gráficos que app.js monta na própria página (ver escreve_indice_graficos)
+_ARQUIVO_INDICE_GRAFICOS = 'docs/graficos/graficos.json'
+
+# arquivos buscados por cada menu de app.js (ver escreve_navegacao)
+_ARQUIVO_NAVEGACAO = 'docs/graficos/navegacao.json'
+
+# menus de montaPagina em docs/app.js, na ordem dos cases, e os gráficos e tabelas de cada um (ver _menus_app)
+_ARQUIVO_APP = 'docs/app.js'
+_MENU_APP = re.compile(r"case '([^']+)':(.*?)break;", re.S)
+_GRAFICO_APP = re.compile(r"criaGrafico\('graficos/([^']+)\.html'")
+
+
+def _adiciona_animacao(fig, duracao):
+    # cada quadro d da animação mostra os d + 1 primeiros pontos de cada trace; no modo JSON os quadros são
+    # montados no navegador a partir dos próprios traces (ver grafico.js), sem gravar todos os prefixos
+    traces = list(range(len(fig.data)))
+
+    if graficos_json:
+        fig.update_layout(meta=dict(fig.layout.meta or {}, animacao={'traces': traces}))
+    else:
+        fig.frames = [dict(data=[dict(type=t.type, x=t.x[:d + 1], y=t.y[:d + 1]) for t in fig.data],
+                           traces=traces) for d in range(0, len(fig.data[0].x))]
+
+    return [dict(label='Animar', method='animate',
+                 args=[None, dict(frame=dict(duration=duracao, redraw=True), fromcurrent=True, mode='immediate')])]
+
+
+def _decima_series(fig, arquivo):
+    # modo JSON: traces de linha longos ficam com _PONTOS_VISAO_GERAL pontos escolhidos por LTTB e as séries
+    # completas vão para X-completo.json, que grafico.js carrega quando o usuário dá zoom no eixo x
+    if not graficos_json:
+        return
+
+    # as séries completas também vão para o JSON já arredondadas
+    _arredonda_traces(fig)
+
+    decimados = [i for i, trace in enumerate(fig.data)
+                 if trace.type == 'scatter' and trace.x is not None and len(trace.x) > _PONTOS_VISAO_GERAL]
+
+    if not decimados:
+        return
+
+    # todas as categorias continuam no eixo x, na ordem em que o plotly as encontraria nos traces completos
+    categorias = list(dict.fromkeys(x for trace in fig.data if trace.x is not None for x in trace.x))
+
+    if all(isinstance(c, str) for c in categorias):
+        fig.update_xaxes(type='category', categoryorder='array', categoryarray=categorias)
+
+    # traces com o mesmo eixo x recebem os mesmos pontos (a união das escolhas de cada um, dividindo entre eles o
+    # total de pontos), para que o vetor x continue único no JSON
+    grupos = {}
+
+    for i in decimados:
+        grupos.setdefault(tuple(fig.data[i].x), []).append(i)
+
+    completos = {}
+
+    for grupo in grupos.values():
+        pontos = max(_PONTOS_VISAO_GERAL // len(grupo), 2)
+        indices = np.unique(np.concatenate([_lttb(np.asarray(fig.data[i].y, dtype=float), pontos) for i in grupo]))
+
+        for i in grupo:
+            trace = fig.data[i]
+            completos[i] = {atributo: np.asarray(getattr(trace, atributo)) for atributo in _ATRIBUTOS_POR_PONTO
+                            if getattr(trace, atributo) is not None and not isinstance(getattr(trace, atributo), str)}
+
+            trace.update({atributo: valor[indices] for atributo, valor in completos[i].items()})
+
+    arquivo_completo = arquivo[:-len('.html')] + '-completo.json'
+    escreve_dados_grafico(arquivo_completo, [completos[i] for i in decimados])
+
+    fig.update_layout(meta=dict(fig.layout.meta or {},
+                                detalhe={'arquivo': os.path.basename(arquivo_completo), 'traces': decimados}))
+
+
+def _lttb(y, pontos):
+    # largest-triangle-three-buckets: mantém o primeiro e o último ponto e, em cada balde intermediário, o ponto
+    # que forma o maior triângulo com o ponto escolhido no balde anterior e a média do balde seguinte
+    n = len(y)
+
+    if n <= pontos:
+        return np.arange(n)
+
+    y = pd.Series(y).ffill().bfill().fillna(0).to_numpy()
+    x = np.arange(n, dtype=float)
+
+    # pontos - 2 baldes entre o primeiro e o último ponto; as médias de todos eles são calculadas de uma vez
+    bordas = np.linspace(1, n - 1, pontos - 1).astype(int)
+    tamanhos = np.diff(bordas)
+    medias_x = np.append((bordas[:-1] + bordas[1:] - 1) / 2, n - 1)
+    medias_y = np.append(np.add.reduceat(y[:-1], bordas[:-1]) / tamanhos, y[-1])
+
+    escolhidos = np.empty(pontos, dtype=int)
+    escolhidos[0], escolhidos[-1] = 0, n - 1
+    ax, ay = x[0], y[0]
+
+    for k in range(pontos - 2):
+        inicio, fim = bordas[k], bordas[k + 1]
+        cx, cy = medias_x[k + 1], medias_y[k + 1]
+        areas = np.abs((ax - cx) * (y[inicio:fim] - ay) - (ax - x[inicio:fim]) * (cy - ay))
+
+        escolhido = inicio + int(np.argmax(areas))
+        escolhidos[k + 1] = escolhido
+        ax, ay = x[escolhido], y[escolhido]
+
+    return escolhidos
+
+
+def _arredonda_traces(fig):
+    # y é arredondado às casas decimais que o gráfico exibe: as do hovertemplate ('%{y:.2f}') ou, sem ele,
+    # as do hoverformat do eixo ('.1f'); traces sem formato declarado mantêm os valores originais
+    casas = [_casas_exibidas(fig, trace) for trace in fig.data]
+
+    for trace, casas_trace in zip(fig.data, casas):
+        if casas_trace is not None and _vetor_decimal(trace.y):
+            trace.y = _arredonda(trace.y, casas_trace)
+
+    # os quadros de animação trazem os mesmos valores dos traces indicados em 'traces'
+    for quadro in fig.frames:
+        for i, dados in zip(quadro.traces or range(len(quadro.data)), quadro.data):
+            if i < len(casas) and casas[i] is not None and _vetor_decimal(getattr(dados, 'y', None)):
+                dados.y = _arredonda(dados.y, casas[i])
+
+
+def _arredonda_exibidos(valores, hovertemplate):
+    # o mesmo arredondamento de _arredonda_traces para os dados gravados à parte (ver escreve_dados_grafico),
+    # a partir do hovertemplate do trace que os exibe
+    casas = _casas_hovertemplate(hovertemplate)
+
+    return _arredonda(valores, casas) if casas is not None and _vetor_decimal(valores) else valores
+
+
+def _casas_exibidas(fig, trace):
+    if getattr(trace, 'y', None) is None:
+        return None
+
+    if trace.hovertemplate:
+        return _casas_hovertemplate(trace.hovertemplate)
+
+    eixo = fig.layout['yaxis' + (trace.yaxis or 'y')[1:]]
+    formato = _FORMATO_HOVERFORMAT.search(eixo.hoverformat or '')
+
+    return int(formato.group(1)) if formato else None
+
+
+def _casas_hovertemplate(hovertemplate):
+    formatos = _FORMATO_HOVERTEMPLATE.findall(hovertemplate) if isinstance(hovertemplate, str) else []
+
+    return max(int(casas) for casas in formatos) if formatos else None
+
+
+def _vetor_decimal(valor):
+    return valor is not None and not isinstance(valor, str) and np.asarray(valor).dtype.kind == 'f'
+
+
+def _arredonda(valores, casas):
+    # como o toFixed usado na formatação do plotly.js: arredonda o valor binário exato, com empates se afastando
+    # do zero. O erro do produto por 10 ** casas (Dekker) decide os casos em que o produto cai exatamente em ,5,
+    # como 79.55 (na verdade 79.5499...), que deve continuar sendo exibido como 79.5
+    valores = np.asarray(valores, dtype='f8')
+    absolutos = np.abs(valores)
+    fator = 10.0 ** casas
+
+    produto = absolutos * fator
+    erro = _erro_produto(absolutos, fator, produto)
+
+    inteiros = np.floor(produto + 0.5)
+    inteiros[(produto - np.floor(produto) == 0.5) & (erro < 0)] -= 1
+
+    return np.copysign(inteiros / fator, valores)
+
+
+def _erro_produto(a, b, produto):
+    # a * b = produto + erro, exatamente (Dekker/Veltkamp)
+    def divide(x):
+        c = 134217729.0 * x
+        alto = c - (c - x)
+        return alto, x - alto
+
+    a_alto, a_baixo = divide(a)
+    b_alto, b_baixo = divide(b)
+
+    return ((a_alto * b_alto - produto) + a_alto * b_baixo + a_baixo * b_alto) + a_baixo * b_baixo
+
+
+# casas decimais de y no hovertemplate ('%{y:.2f}') e no hoverformat do eixo ('.2f')
+_FORMATO_HOVERTEMPLATE = re.compile(r'%\{y:[^}]*?\.(\d+)f\}')
+_FORMATO_HOVERFORMAT = re.compile(r'\.(\d+)f$')
+
+# pontos mantidos por trace na visão geral das séries longas (ver _decima_series)
+_PONTOS_VISAO_GERAL = 300
+
+# atributos dos traces com um valor por ponto, reduzidos junto com x e y
+_ATRIBUTOS_POR_PONTO = ('x', 'y', 'text', 'hovertext', 'customdata')
+
+
+def escreve_grafico(fig, arquivo):
+    _arquivos_gerados.append(arquivo)
+    _arredonda_traces(fig)
+
+    # modo HTML: cada versão é um arquivo autocontido, como gerado pelo plotly
+    if not graficos_json:
+        pio.write_html(fig, file=arquivo, include_plotlyjs='directory', auto_open=False, auto_play=False)
+        return
+
+    # modo JSON: dados e layout desktop são gravados uma única vez em X.json e a versão mobile (X-mobile.html)
+    # é apenas uma sobreposição com o que mudou; X.html e X-mobile.html viram páginas mínimas que carregam o JSON
+    mobile = arquivo.endswith('-mobile.html')
+    nome = arquivo[:-len('-mobile.html')] if mobile else arquivo[:-len('.html')]
+    especificacao = fig.to_dict()
+
+    if not mobile:
+        _graficos_pendentes[nome] = especificacao
+        _escreve_pagina_grafico(arquivo, nome, especificacao['layout'], mobile=False)
+        return
+
+    base = _graficos_pendentes.pop(nome, None)
+
+    if base is None:
+        _escreve_especificacao(nome, especificacao, None)
+    else:
+        sobreposicao = {'layout': _diferenca_especificacao(base['layout'], especificacao['layout'])}
+
+        dados_base = base['data']
+        dados_mobile = especificacao['data']
+        diferencas = [_diferenca_especificacao(dados_base[i] if i < len(dados_base) else {}, trace)
+                      for i, trace in enumerate(dados_mobile)]
+
+        if len(dados_base) != len(dados_mobile) or any(diferencas):
+            sobreposicao['data'] = diferencas
+
+        if not _valores_iguais(base.get('frames'), especificacao.get('frames')):
+            sobreposicao['frames'] = especificacao.get('frames')
+
+        _escreve_especificacao(nome, base, sobreposicao)
+
+    _escreve_pagina_grafico(arquivo, nome, especificacao['layout'], mobile=True)
+
+
+def _finaliza_graficos():
+    # versões desktop sem a respectiva versão mobile
+    while _graficos_pendentes:
+        nome, especificacao = _graficos_pendentes.popitem()
+        _escreve_especificacao(nome, especificacao, None)
+
+
+def escreve_indice_graficos(arquivos):
+    # índice dos gráficos gravados em JSON, {nome: {altura, altura_mobile}}: app.js monta esses gráficos em
+    # divs da própria página, com um único Plotly carregado quando o primeiro deles aparece na tela, em vez de
+    # um iframe por gráfico; no modo HTML (ou com graficos_na_pagina=False) o índice fica vazio e app.js
+    # continua usando os iframes
+    indice = {}
+
+    if graficos_json and graficos_na_pagina:
+        for arquivo in sorted(arquivos):
+            if os.path.dirname(arquivo) != 'docs/graficos' or not arquivo.endswith('.json'):
+                continue
+
+            especificacao = _carrega_json(arquivo, {})
+
+            if 'figura' not in especificacao:
+                continue
+
+            altura = especificacao['figura']['layout'].get('height')
+            mobile = (especificacao['mobile'] or {}).get('layout', {})
+
+            indice[os.path.basename(arquivo)[:-len('.json')]] = {'altura': altura,
+                                                                 'altura_mobile': mobile.get('height', altura)}
+
+    with open(_ARQUIVO_INDICE_GRAFICOS, 'w', encoding='utf-8') as saida:
+        json.dump(indice, saida, indent=1)
+
+    return _ARQUIVO_INDICE_GRAFICOS
+
+
+def _menus_app():
+    # {menu: [gráfico, ...]} lidos de montaPagina, a única lista dos menus e dos seus gráficos
+    with open(_ARQUIVO_APP, 'r', encoding='utf-8') as entrada:
+        codigo = entrada.read()
+
+    codigo = codigo[codigo.index('function montaPagina('):]
+
+    return {menu: _GRAFICO_APP.findall(trecho) for menu, trecho in _MENU_APP.findall(codigo)}
+
+
+def escreve_navegacao():
+    # manifesto de navegação, {'comuns': [[arquivo, bytes], ...], 'menus': {menu: {'desktop': [...], 'mobile':
+    # [...]}}}: os arquivos que cada menu de app.js busca ao ser aberto, na ordem da página, e os comuns a vários
+    # menus (plotly.min.js e grafico.js), que app.js baixa antecipadamente nos momentos ociosos (ver
+    # preCarregaMenus); os tamanhos são os transferidos (.gz, ver comprime_arquivos) quando houver
+    indice = _carrega_json(_ARQUIVO_INDICE_GRAFICOS, {})
+    tamanhos = _carrega_json(_ARQUIVO_TAMANHOS, {})
+    comuns = ['docs/graficos/plotly.min.js', 'docs/graficos/grafico.js']
+
+    def tamanho(arquivo):
+        return tamanhos.get(os.path.relpath(arquivo, 'docs/graficos'), {}).get('gz') or os.path.getsize(arquivo)
+
+    def lista(arquivos):
+        return [[arquivo[len('docs/'):], tamanho(arquivo)] for arquivo in dict.fromkeys(arquivos)
+                if os.path.exists(arquivo)]
+
+    menus = {}
+    usados = []
+
+    for menu, graficos in _menus_app().items():
+        menus[menu] = {}
+
+        for versao, sufixo in (('desktop', ''), ('mobile', '-mobile')):
+            arquivos = []
+
+            for nome in graficos:
+                if nome in indice:
+                    # montado na própria página (ver escreve_indice_graficos)
+                    arquivos += comuns + [f'docs/graficos/{nome}.json']
+                    usados = comuns
+                    continue
+
+                pagina = f'docs/graficos/{nome}{sufixo}.html'
+
+                if not os.path.exists(pagina):
+                    continue
+
+                with open(pagina, 'r', encoding='utf-8') as entrada:
+                    conteudo = entrada.read()
+
+                # arquivos estáticos e dados (tabelas virtuais) carregados pela página
+                arquivos += [pagina] + [estatico for estatico in _ARQUIVOS_ESTATICOS
+                                        if os.path.basename(estatico) in conteudo]
+
+                if f'data-dados="{nome}{sufixo}.json"' in conteudo:
+                    arquivos.append(f'docs/graficos/{nome}{sufixo}.json')
+
+            menus[menu][versao] = lista(arquivos)
+
+    navegacao = {'comuns': lista(usados), 'menus': menus}
+
+    with open(_ARQUIVO_NAVEGACAO, 'w', encoding='utf-8') as saida:
+        json.dump(navegacao, saida, indent=1)
+
+    return _ARQUIVO_NAVEGACAO
+
+
+def _escreve_especificacao(nome, especificacao, sobreposicao):
+    _escreve_json(nome + '.json', {'figura': especificacao, 'mobile': sobreposicao})
+
+
+def escreve_dados_grafico(arquivo, traces):
+    # dados de traces carregados sob demanda por botões com method='skip' e args[0] = {'arquivo', 'traces'};
+    # os vetores longos vão em blocos (ver _escreve_bloco)
+    os.makedirs(os.path.dirname(arquivo), exist_ok=True)
+    _escreve_json(arquivo, {'traces': traces}, blocos=True)
+
+
+def _escreve_json(arquivo, conteudo, blocos=False):
+    # os vetores de dados vão para uma tabela única (sem repetições) e são referenciados por {'vetor': i}
+    vetores, indices = [], {}
+    conteudo = {chave: _compacta_vetores(valor, vetores, indices, blocos=blocos) for chave, valor in conteudo.items()}
+    conteudo['vetores'] = vetores
+
+    _arquivos_gerados.append(arquivo)
+
+    # json.dumps (e não json.dump) para que o PlotlyJSONEncoder converta NaN em null
+    with open(arquivo, 'w', encoding='utf-8') as saida:
+        saida.write(json.dumps(conteudo, cls=PlotlyJSONEncoder, separators=(',', ':')))
+
+
+def _nome_arquivo(texto):
+    # 'São João da Boa Vista' -> 'sao-joao-da-boa-vista'
+    texto = ''.join(c for c in unicodedata.normalize('NFD', texto.lower()) if unicodedata.category(c) != 'Mn')
+
+    return '-'.join(''.join(c if c.isalnum() else ' ' for c in texto).split())
+
+
+# vetores menores que isso ficam no próprio JSON
+_TAMANHO_MINIMO_VETOR = 8
+
+# tipos de typed array usados na codificação binária, do menor para o maior
+_TIPOS_INTEIROS = ['i1', 'i2', 'i4']
+
+# casas decimais aceitas na codificação de decimais como inteiros com 'escala'
+_CASAS_DECIMAIS_CODIFICADAS = 4
+
+# vetores dos dados sob demanda maiores que isso são gravados em blocos desse tamanho (ver _escreve_bloco)
+_TAMANHO_BLOCO = 256
+
+# blocos de vetores, compartilhados por todos os gráficos
+_PASTA_BLOCOS = 'docs/graficos/blocos'
+
+# lista de blocos de um vetor nos JSON gravados (ver remove_blocos_sem_uso)
+_REFERENCIA_BLOCOS = re.compile(r'"blocos":\[([^\]]*)\]')
+
+# atributos em que o plotly.js aceita typed arrays; os demais vetores são apenas deduplicados
+_ATRIBUTOS_BINARIOS = ('x', 'y', 'z', 'customdata')
+
+
+def _compacta_vetores(valor, vetores, indices, atributo=None, blocos=False):
+    if isinstance(valor, dict):
+        return {chave: _compacta_vetores(v, vetores, indices, chave, blocos) for chave, v in valor.items()}
+
+    if isinstance(valor, (pd.Series, pd.Index)):
+        valor = valor.to_numpy()
+
+    if isinstance(valor, np.ndarray):
+        if valor.ndim != 1 or len(valor) < _TAMANHO_MINIMO_VETOR:
+            return valor
+
+        valor = list(valor) if valor.dtype == object else valor
+    elif isinstance(valor, (list, tuple)):
+        if len(valor) < _TAMANHO_MINIMO_VETOR or any(isinstance(v, (dict, list, tuple, np.ndarray)) for v in valor):
+            return [_compacta_vetores(v, vetores, indices, blocos=blocos) for v in valor]
+    else:
+        return valor
+
+    if blocos and len(valor) > _TAMANHO_BLOCO:
+        vetor = {'blocos': [_escreve_bloco(valor[inicio:inicio + _TAMANHO_BLOCO], atributo)
+                            for inicio in range(0, len(valor), _TAMANHO_BLOCO)]}
+    else:
+        vetor = _codifica_vetor(valor) if atributo in _ATRIBUTOS_BINARIOS else valor
+
+    chave = json.dumps(vetor, cls=PlotlyJSONEncoder, separators=(',', ':'))
+
+    if chave not in indices:
+        indices[chave] = len(vetores)
+        vetores.append(vetor)
+
+    return {'vetor': indices[chave]}
+
+
+def _escreve_bloco(valores, atributo):
+    # trecho de _TAMANHO_BLOCO valores de um vetor longo, gravado em _PASTA_BLOCOS com o resumo do conteúdo
+    # como nome: nas séries diárias, só o último trecho muda de um dia para o outro e os demais arquivos
+    # continuam os mesmos (e iguais entre gráficos, como as datas); ver remove_blocos_sem_uso
+    bloco = _codifica_vetor(valores) if atributo in _ATRIBUTOS_BINARIOS else valores
+    texto = json.dumps(bloco, cls=PlotlyJSONEncoder, separators=(',', ':'))
+    nome = hashlib.sha256(texto.encode()).hexdigest()[:_TAMANHO_REVISAO]
+
+    arquivo = f'{_PASTA_BLOCOS}/{nome}.json'
+    _arquivos_gerados.append(arquivo)
+
+    if not os.path.exists(arquivo):
+        # outro processo pode estar gravando o mesmo bloco
+        os.makedirs(_PASTA_BLOCOS, exist_ok=True)
+        temporario = f'{arquivo}.{os.getpid()}'
+
+        with open(temporario, 'w', encoding='utf-8') as saida:
+            saida.write(texto)
+
+        os.replace(temporario, arquivo)
+
+    return nome
+
+
+def remove_blocos_sem_uso():
+    # blocos que nenhum JSON de docs/graficos referencia mais, com as versões comprimidas
+    if not os.path.isdir(_PASTA_BLOCOS):
+        return
+
+    usados = set()
+
+    for pasta, _, arquivos in os.walk('docs/graficos'):
+        if pasta == _PASTA_BLOCOS:
+            continue
+
+        for arquivo in arquivos:
+            if arquivo.endswith('.json'):
+                with open(os.path.join(pasta, arquivo), 'r', encoding='utf-8') as entrada:
+                    for lista in _REFERENCIA_BLOCOS.findall(entrada.read()):
+                        usados.update(re.findall(r'"([0-9a-f]+)"', lista))
+
+    removidos = 0
+
+    for arquivo in os.listdir(_PASTA_BLOCOS):
+        if arquivo.split('.')[0] not in usados:
+            os.remove(os.path.join(_PASTA_BLOCOS, arquivo))
+            removidos += arquivo.endswith('.json')
+
+    print(f'\tBlocos sem uso removidos: {removidos}')
+
+
+def _codifica_vetor(valor):
+    # vetores numéricos viram typed arrays little-endian em base64 ({'dtype', 'bdata'}) quando isso
+    # ocupa menos que o texto JSON; os demais (textos, datas, booleanos) continuam como listas.
+    # Decimais com até _CASAS_DECIMAIS_CODIFICADAS casas viram inteiros divididos por 'escala' e, havendo NaN,
+    # o menor valor do tipo inteiro é reservado para ele em 'nulo' (ver decodificaVetor em grafico.js)
+    if isinstance(valor, np.ndarray):
+        if not np.issubdtype(valor.dtype, np.number):
+            return valor
+
+        numeros = valor.astype('f8')
+    else:
+        if not all(v is None or (isinstance(v, (int, float, np.number)) and not isinstance(v, bool)) for v in valor):
+            return valor
+
+        numeros = np.array([nan if v is None else v for v in valor], dtype='f8')
+
+    vetor = _codifica_inteiros(numeros)
+
+    if vetor is None:
+        vetor = {'dtype': 'f8', 'bdata': base64.b64encode(numeros.astype('<f8').tobytes()).decode('ascii')}
+        texto = numeros.tolist()
+    else:
+        texto = numeros.astype('i8').tolist() if len(vetor) == 2 else numeros.tolist()
+
+    if len(vetor['bdata']) >= len(json.dumps(texto, separators=(',', ':'))):
+        return texto
+
+    return vetor
+
 
-    estado = vacinacao.merge(estado, on=['data'], how='outer', suffixes=('_vacinacao', '_estado'))
+def _codifica_inteiros(numeros):
+    nulos = np.isnan(numeros)
+    finitos = numeros[~nulos]
 
-    filtro = internacoes.drs == 'Estado de São Paulo'
-    colunas = ['data', 'internacoes_ultimo_dia']
-    intern = internacoes.loc[filtro, colunas].groupby(['data']).sum().reset_index()
-    intern.columns = ['data', 'internacoes_semana']
+    if not np.isfinite(finitos).all():
+        return None
 
-    estado = intern.merge(estado, on=['data'], how='outer', suffixes=('_internacoes', '_estado'))
+    for casas in range(_CASAS_DECIMAIS_CODIFICADAS + 1):
+        escala = 10 ** casas
+        inteiros = np.round(finitos * escala)
 
-    estado['data'] = estado.data.apply(lambda d: _converte_semana(d))
+        # só quando a divisão feita no navegador devolve exatamente o mesmo valor
+        if not (inteiros / escala == finitos).all():
+            continue
 
-    estado = estado.groupby('data') \
-                   .agg({'isolamento': 'mean', 'obitos_semana': sum, 'casos_semana': sum,
-                         'vacinadas_semana': sum, 'perc_imu_semana': max, 'internacoes_semana': sum}) \
-                   .reset_index()
+        for tipo in _TIPOS_INTEIROS:
+            limites = np.iinfo(tipo)
+            minimo = limites.min + 1 if nulos.any() else limites.min
 
-    estado['data'] = estado.data.apply(lambda d: _formata_semana_extenso(d))
+            if not len(inteiros) or (inteiros.min() >= minimo and inteiros.max() <= limites.max):
+                codificados = np.full(len(numeros), limites.min, dtype='<' + tipo)
+                codificados[~nulos] = inteiros
+                vetor = {'dtype': tipo, 'bdata': base64.b64encode(codificados.tobytes()).decode('ascii')}
 
-    estado['casos_semana'] = estado.casos_semana.apply(lambda c: nan if c == 0 else c)
-    estado['obitos_semana'] = estado.obitos_semana.apply(lambda c: nan if c == 0 else c)
-    estado['vacinadas_semana'] = estado.vacinadas_semana.apply(lambda c: nan if c == 0 else c)
-    estado['internacoes_semana'] = estado.internacoes_semana.apply(lambda c: nan if c == 0 else c)
+                if casas:
+                    vetor['escala'] = escala
 
-    evolucao_estado = estado
+                if nulos.any():
+                    vetor['nulo'] = int(limites.min)
 
-    # dados municipais
-    filtro = isolamento.município == 'São Paulo'
-    colunas = ['data_futuro', 'isolamento']
-    esquerda = isolamento.loc[filtro, colunas].groupby(['data_futuro']).mean().reset_index()
-    esquerda.columns = ['data', 'isolamento']
+                return vetor
 
-    # cidade = dados_cidade[['data', 'óbitos_dia', 'casos_dia']].groupby(['data']).sum().reset_index()
-    cidade = dados_munic.loc[dados_munic.nome_munic == 'São Paulo', ['datahora', 'obitos_novos', 'casos_novos']].groupby(['datahora']).sum().reset_index()
-    cidade.columns = ['data', 'obitos_semana', 'casos_semana']
+        return None
 
-    cidade = esquerda.merge(cidade, on=['data'], how='outer', suffixes=('_isolamento', '_cidade'))
+    return None
 
-    filtro = dados_vacinacao.municipio == 'SAO PAULO'
-    colunas = ['data', 'aplicadas_dia', 'perc_imunizadas']
-    vacinacao = dados_vacinacao.loc[filtro, colunas].groupby(['data']).sum().reset_index()
-    vacinacao.columns = ['data', 'vacinadas_semana', 'perc_imu_semana']
 
-    cidade = vacinacao.merge(cidade, on=['data'], how='outer', suffixes=('_vacinacao', '_cidade'))
+def _escreve_pagina_grafico(arquivo, nome, layout, mobile):
+    altura = layout.get('height')
+    altura = '100%' if altura is None else f'{altura}px'
+    nome = nome.split('/')[-1]
 
-    filtro = ((internacoes.drs.str.contains('SP')) | (internacoes.drs == 'Município de São Paulo'))
-    colunas = ['data', 'internacoes_ultimo_dia']
-    intern = internacoes.loc[filtro, colunas].groupby(['data']).sum().reset_index()
-    intern.columns = ['data', 'internacoes_semana']
+    with open(arquivo, 'w', encoding='utf-8') as pagina:
+        pagina.write(_MODELO_GRAFICO.format(altura=altura, nome=nome, mobile='true' if mobile else 'false'))
 
-    cidade = intern.merge(cidade, on=['data'], how='outer', suffixes=('_internacoes', '_estado'))
 
-    cidade['data'] = cidade.data.apply(lambda d: _converte_semana(d))
+def escreve_tabela(tabela, arquivo, ordenavel=False, chaves=None, titulos_linhas=False, legenda=None, fonte=None,
+                   altura=None, virtual=False):
+    # tabela em HTML simples, sem o plotly: colunas e células de tabela já formatadas (aceitam HTML, como no
+    # go.Table); com ordenavel=True um clique no cabeçalho ordena a coluna (tabela.js), pelos números da coluna
+    # de mesmo nome em chaves ou, se não houver, pelo texto; altura (px) limita a tabela com barra de rolagem
+    _arquivos_gerados.append(arquivo)
 
-    cidade = cidade.groupby('data') \
-                   .agg({'isolamento': 'mean', 'obitos_semana': sum, 'casos_semana': sum,
-                         'vacinadas_semana': sum, 'perc_imu_semana': max, 'internacoes_semana': sum}) \
-                   .reset_index()
+    celulas = [tabela[coluna].tolist() for coluna in tabela.columns]
+    valores = [chaves[coluna].to_numpy() if chaves is not None and coluna in chaves.columns else None
+               for coluna in tabela.columns]
 
-    cidade['data'] = cidade.data.apply(lambda d: _formata_semana_extenso(d))
+    # modo JSON, tabelas longas (virtual=True): as linhas vão para X.json, em colunas, e a página desenha só as
+    # linhas visíveis, com ordenação e busca (ver montaTabelaVirtual em tabela.js); altura é obrigatória
+    virtual = virtual and graficos_json
+    busca = ''
 
-    cidade['casos_semana'] = cidade.casos_semana.apply(lambda c: nan if c == 0 else c)
-    cidade['obitos_semana'] = cidade.obitos_semana.apply(lambda c: nan if c == 0 else c)
-    cidade['vacinadas_semana'] = cidade.vacinadas_semana.apply(lambda c: nan if c == 0 else c)
-    estado['internacoes_semana'] = estado.internacoes_semana.apply(lambda c: nan if c == 0 else c)
+    if virtual:
+        dados = arquivo[:-len('.html')] + '.json'
+        _escreve_tabela_json(dados, celulas, valores)
 
-    evolucao_cidade = cidade
+        ordenavel = True
+        busca = '    <input type="search" class="busca" placeholder="Buscar" aria-label="Buscar na tabela"/>\n'
+        linhas = ''
+    else:
+        linhas = ''.join('        <tr>' + ''.join(_celula_tabela(celulas, valores, j, i, titulos_linhas)
+                                                  for j in range(len(celulas))) + '</tr>\n'
+                         for i in range(len(tabela)))
 
-    return evolucao_cidade, evolucao_estado
+    cabecalho = '        <tr>' + ''.join(f'<th scope="col">{coluna}</th>' for coluna in tabela.columns) + '</tr>'
+    legenda = '' if legenda is None else f'    <caption>{legenda}</caption>\n'
+    rodape = ''
 
+    if fonte is not None:
+        rodape += f'    <p class="fonte"><i><b>Fonte:</b> {fonte}</i></p>\n'
 
-def gera_dados_semana(evolucao_cidade, evolucao_estado, leitos_estaduais, isolamento, internacoes):
-    print('\tProcessando dados semanais...')
+    if ordenavel:
+        rodape += '    <script src="tabela.js"></script>\n'
 
-    def calcula_variacao(dados, linha):
-        indice = dados.index[dados.data == linha['data']].item() - 1
+    classes = 'tabela'
+    atributos = ''
 
-        if indice >= 0:
-            casos_anterior = dados.loc[indice, 'casos_semana']
-            obitos_anterior = dados.loc[indice, 'obitos_semana']
-            uti_anterior = dados.loc[indice, 'uti']
-            isolamento_anterior = dados.loc[indice, 'isolamento_atual']
-            isolamento_2sem_anterior = dados.loc[indice, 'isolamento']
-            vacinadas_anterior = dados.loc[indice, 'vacinadas_semana']
-            perc_imu_semana_anterior = dados.loc[indice, 'perc_imu_semana']
-            internacoes_semana_anterior = dados.loc[indice, 'internacoes_semana']
+    if ordenavel:
+        classes += ' ordenavel'
 
-            if casos_anterior > 0:
-                linha['variacao_casos'] = ((linha['casos_semana'] / casos_anterior) - 1) * 100
+    if virtual:
+        classes += ' virtual'
+        atributos = f' data-dados="{dados.split("/")[-1]}" data-titulos-linhas="{str(titulos_linhas).lower()}"'
 
-            if obitos_anterior > 0:
-                linha['variacao_obitos'] = ((linha['obitos_semana'] / obitos_anterior) - 1) * 100
+    if altura is None:
+        estilo = ''
+    else:
+        estilo = f' style="{"height" if virtual else "max-height"}:{altura}px;"'
 
-            if uti_anterior > 0:
-                linha['variacao_uti'] = ((linha['uti'] / uti_anterior) - 1) * 100
+    with open(arquivo, 'w', encoding='utf-8') as pagina:
+        pagina.write(_MODELO_TABELA.format(classe=' class="mobile"' if arquivo.endswith('-mobile.html') else '',
+                                           busca=busca, altura=estilo, classes=classes, atributos=atributos,
+                                           legenda=legenda, cabecalho=cabecalho, linhas=linhas, rodape=rodape))
 
-            if isolamento_anterior > 0:
-                linha['variacao_isolamento'] = ((linha['isolamento_atual'] / isolamento_anterior) - 1) * 100
 
-            if isolamento_2sem_anterior > 0:
-                linha['variacao_isolamento_2sem'] = ((linha['isolamento'] / isolamento_2sem_anterior) - 1) * 100
+def _celula_tabela(celulas, valores, j, i, titulos_linhas):
+    if titulos_linhas and j == 0:
+        return f'<th scope="row">{celulas[j][i]}</th>'
 
-            if vacinadas_anterior > 0:
-                linha['variacao_vacinadas'] = ((linha['vacinadas_semana'] / vacinadas_anterior) - 1) * 100
+    if valores[j] is None:
+        return f'<td>{celulas[j][i]}</td>'
 
-            if perc_imu_semana_anterior > 0:
-                linha['variacao_perc_imu'] = ((linha['perc_imu_semana'] / perc_imu_semana_anterior) - 1) * 100
+    valor = valores[j][i]
+    valor = '' if pd.isna(valor) else repr(float(valor))
 
-            if internacoes_semana_anterior > 0:
-                linha['variacao_internacoes'] = ((linha['internacoes_semana'] / internacoes_semana_anterior) - 1) * 100
+    return f'<td data-valor="{valor}">{celulas[j][i]}</td>'
 
-        return linha
 
-    # cálculo da média da taxa de ocupação de leitos de UTI na semana
-    leitos = pd.DataFrame()
-    leitos['data'] = internacoes.loc[internacoes.drs == 'Município de São Paulo', 'data'].apply(lambda d: _formata_semana_extenso(_converte_semana(d)))
-    leitos['uti'] = internacoes.loc[internacoes.drs == 'Município de São Paulo', 'ocupacao_leitos_ultimo_dia']
+def _escreve_tabela_json(arquivo, celulas, valores):
+    # {'celulas': textos de cada coluna, 'valores': números para a ordenação de cada coluna (ou null)}
+    conteudo = {'celulas': celulas, 'valores': [None if v is None else _numeros_json(v) for v in valores]}
 
-    leitos = leitos.groupby('data').mean().reset_index()
+    _arquivos_gerados.append(arquivo)
 
-    evolucao_cidade = evolucao_cidade.merge(leitos, on='data', how='outer', suffixes=('_efeito', '_leitos'))
+    with open(arquivo, 'w', encoding='utf-8') as saida:
+        saida.write(json.dumps(conteudo, ensure_ascii=False, separators=(',', ':')))
 
-    filtro = isolamento.município == 'São Paulo'
-    colunas = ['data', 'isolamento']
 
-    isola_atual = isolamento.loc[filtro, colunas]
-    isola_atual['data'] = isola_atual.data.apply(lambda d: _formata_semana_extenso(_converte_semana(d)))
-    isola_atual = isola_atual.groupby('data').mean().reset_index()
-    isola_atual.columns = ['data', 'isolamento_atual']
+def _numeros_json(valores):
+    # lista para o JSON com NaN como None e valores inteiros sem o '.0'
+    numeros = np.asarray(valores, dtype=float)
+    inteiros = np.isfinite(numeros) & (numeros == np.rint(numeros))
 
-    evolucao_cidade = evolucao_cidade.merge(isola_atual, on='data', how='left', suffixes=('_efeito', '_isola'))
+    lista = numeros.astype(object)
+    lista[inteiros] = numeros[inteiros].astype(np.int64).astype(object)
+    lista[np.isnan(numeros)] = None
 
-    evolucao_cidade = evolucao_cidade.apply(lambda linha: calcula_variacao(evolucao_cidade, linha), axis=1)
+    return lista.tolist()
 
-    # dados estaduais
-    leitos = pd.DataFrame()
-    leitos['data'] = leitos_estaduais.data.apply(lambda d: _formata_semana_extenso(_converte_semana(d)))
-    leitos['uti'] = leitos_estaduais.sp_uti
 
-    leitos = leitos.groupby('data').mean().reset_index()
+def _diferenca_especificacao(base, variante):
+    # sobreposição que transforma base em variante: dicionários são comparados recursivamente,
+    # listas e valores simples são substituídos por inteiro e chaves removidas viram None
+    diferenca = {chave: None for chave in base if chave not in variante}
 
-    evolucao_estado = evolucao_estado.merge(leitos, on='data', how='outer', suffixes=('_efeito', '_leitos'))
+    for chave, valor in variante.items():
+        if chave not in base:
+            diferenca[chave] = valor
+        elif isinstance(valor, dict) and isinstance(base[chave], dict):
+            subdiferenca = _diferenca_especificacao(base[chave], valor)
 
-    filtro = isolamento.município == 'Estado de São Paulo'
-    colunas = ['data', 'isolamento']
+            if subdiferenca:
+                diferenca[chave] = subdiferenca
+        elif not _valores_iguais(base[chave], valor):
+            diferenca[chave] = valor
 
-    isola_atual = isolamento.loc[filtro, colunas]
-    isola_atual['data'] = isola_atual.data.apply(lambda d: _formata_semana_extenso(_converte_semana(d)))
-    isola_atual = isola_atual.groupby('data').mean().reset_index()
-    isola_atual.columns = ['data', 'isolamento_atual']
+    return diferenca
 
-    evolucao_estado = evolucao_estado.merge(isola_atual, on='data', how='left', suffixes=('_efeito', '_isola'))
 
-    evolucao_estado = evolucao_estado.apply(lambda linha: calcula_variacao(evolucao_estado, linha), axis=1)
+def _valores_iguais(a, b):
+    a = a.to_numpy() if isinstance(a, (pd.Series, pd.Index)) else a
+    b = b.to_numpy() if isinstance(b, (pd.Series, pd.Index)) else b
 
-    return evolucao_cidade, evolucao_estado
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        if not (isinstance(a, np.ndarray) and isinstance(b, np.ndarray)) or a.shape != b.shape:
+            return False
 
+        try:
+            return np.array_equal(a, b, equal_nan=True)
+        except TypeError:
+            return np.array_equal(a, b)
 
-def gera_graficos(dados_munic, dados_cidade, hospitais_campanha, leitos_municipais, leitos_municipais_privados, leitos_municipais_total, dados_estado, isolamento, leitos_estaduais, evolucao_cidade, evolucao_estado, internacoes, doencas, dados_raciais, dados_vacinacao, dados_imunizantes):
-    # print('\tResumo da campanha de vacinação...')
-    # gera_resumo_vacinacao(dados_vacinacao)
-    print('\tResumo diário...')
-    gera_resumo_diario(dados_munic, dados_cidade, leitos_municipais_total, dados_estado, leitos_estaduais, isolamento, internacoes, dados_vacinacao)
-    print('\tResumo semanal...')
-    gera_resumo_semanal(evolucao_cidade, evolucao_estado)
-    print('\tEvolução da pandemia no estado...')
-    gera_evolucao_estado(evolucao_estado)
-    print('\tEvolução da pandemia na cidade...')
-    gera_evolucao_cidade(evolucao_cidade)
-    print('\tCasos no estado...')
-    gera_casos_estado(dados_estado)
-    print('\tCasos na cidade...')
-    gera_casos_cidade(dados_cidade)
-    print('\tCasos e óbitos estaduais por raça/cor...')
-    gera_casos_obitos_por_raca_cor(dados_raciais)
-    print('\tIsolamento social...')
-    gera_isolamento_grafico(isolamento)
-    print('\tTabela de isolamento social...')
-    gera_isolamento_tabela(isolamento)
-    print('\tLeitos no estado...')
-    gera_leitos_estaduais(leitos_estaduais)
-    print('\tDepartamentos Regionais de Saúde...')
-    gera_drs(internacoes)
-    # print('\tEvolução da campanha de vacinação no estado...')
-    # gera_evolucao_vacinacao_estado(dados_vacinacao)
-    # print('\tEvolução da campanha de vacinação na cidade...')
-    # gera_evolucao_vacinacao_cidade(dados_vacinacao)
-    # print('\tPopulação vacinada...')
-    # gera_populacao_vacinada(dados_vacinacao)
-    # print('\t1ª dose x 2ª dose...')
-    # gera_tipo_doses(dados_vacinacao)
-    # print('\tDoses recebidas x aplicadas...')
-    # gera_doses_aplicadas(dados_vacinacao)
-    # print('\tTabela da campanha de vacinação...')
-    # gera_tabela_vacinacao(dados_vacinacao)
-    # print('\tDistribuição de imunizantes por fabricante...')
-    # gera_distribuicao_imunizantes(dados_imunizantes)
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all(_valores_iguais(x, y) for x, y in zip(a, b))
 
-    if processa_doencas:
-        print('\tDoenças preexistentes nos casos estaduais...')
-        gera_doencas_preexistentes_casos(doencas)
-        print('\tDoenças preexistentes nos óbitos estaduais...')
-        gera_doencas_preexistentes_obitos(doencas)
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_valores_iguais(a[chave], b[chave]) for chave in a)
 
+    return a == b
 
-def gera_resumo_vacinacao(dados_vacinacao):
-    filtro_data = dados_vacinacao.data.dt.date == data_processamento.date()
-    filtro_data_max = dados_vacinacao.data == dados_vacinacao.data.max()
-    filtro_estado = dados_vacinacao.municipio == 'ESTADO DE SAO PAULO'
-    filtro_cidade = dados_vacinacao.municipio == 'SAO PAULO'
-    inicio_vacinacao = pd.to_datetime('2021-01-17')
 
-    cabecalho = ['<b>Campanha de<br>vacinação</b>',
-                 '<b>Estado de SP</b><br><i>' + data_processamento.strftime('%d/%m/%Y') + '</i>',
-                 '<b>Cidade de SP</b><br><i>' + data_processamento.strftime('%d/%m/%Y') + '</i>']
+def _valor_retrato(linhas, coluna):
+    if linhas.empty:
+        return None
 
-    info = ['<b>Doses aplicadas</b>', '<b>1ª dose</b>', '<b>2ª dose</b>', '<b>3ª dose</b>', '<b>4ª dose</b>',
-            '<b>Dose única</b>', '<b>População 1ª dose (%)</b>', '<b>População 2ª dose (%)</b>',
-            '<b>População 3ª dose (%)</b>', '<b>População 4ª dose (%)</b>', '<b>Média diária</b>',
-            '<b>Média móvel 7 dias</b>', '<b>Média semanal</b>']
+    valor = linhas[coluna].iat[0]
 
-    doses_aplicadas = dados_vacinacao.loc[filtro_data & filtro_estado, 'total_doses']
-    doses_aplicadas = 'indisponível' if doses_aplicadas.empty else f'{doses_aplicadas.item():7,.0f}'.replace(',', '.')
+    return None if pd.isna(valor) else valor
 
-    dose_1 = dados_vacinacao.loc[filtro_data & filtro_estado, '1a_dose']
-    dose_1 = 'indisponível' if dose_1.empty else f'{dose_1.item():7,.0f}'.replace(',', '.')
 
-    dose_2 = dados_vacinacao.loc[filtro_data & filtro_estado, '2a_dose']
-    dose_2 = 'indisponível' if dose_2.empty else f'{dose_2.item():7,.0f}'.replace(',', '.')
+def _colunas_retrato(retrato, linhas):
+    # linhas: (campo, casas decimais do percentual ou None para inteiros), formatadas para as duas regiões de uma vez
+    colunas = ([], [])
 
-    dose_3 = dados_vacinacao.loc[filtro_data & filtro_estado, '3a_dose']
-    dose_3 = 'indisponível' if dose_3.empty else f'{dose_3.item():7,.0f}'.replace(',', '.')
+    for campo, casas in linhas:
+        valores = [retrato[regiao][campo] for regiao in ('estado', 'cidade')]
+        textos = _formata_inteiros(valores, largura=7) if casas is None else \
+            _formata_decimais(valores, casas, sufixo='%', largura=7)
 
-    dose_4 = dados_vacinacao.loc[filtro_data & filtro_estado, '4a_dose']
-    dose_4 = 'indisponível' if dose_4.empty else f'{dose_4.item():7,.0f}'.replace(',', '.')
-
-    dose_unica = dados_vacinacao.loc[filtro_data & filtro_estado, 'dose_unica']
-    dose_unica = 'indisponível' if dose_unica.empty else f'{dose_unica.item():7,.0f}'.replace(',', '.')
-
-    total_doses = dados_vacinacao.loc[filtro_data_max & filtro_estado, 'total_doses'].item()
-    data_max = dados_vacinacao.loc[filtro_data_max & filtro_estado, 'data'].item()
-    dias = (data_max - inicio_vacinacao).days + 1
-    media_diaria = total_doses / dias
-    media_diaria = f'{media_diaria:7,.0f}'.replace(',', '.')
-
-    media_movel = dados_vacinacao.loc[filtro_estado, ['data', 'aplicadas_dia']] \
-                                 .rolling('7D', on='data') \
-                                 .mean() \
-                                 .iat[-1,1]
-    media_movel = f'{media_movel:7,.0f}'.replace(',', '.')
-
-    semanas = dias / 7
-    media_semanal = total_doses / semanas
-    media_semanal = f'{media_semanal:7,.0f}'.replace(',', '.')
-
-    pop_vacinada = dados_vacinacao.loc[filtro_data & filtro_estado, 'perc_vacinadas_1a_dose']
-    pop_vacinada = 'indisponível' if pop_vacinada.empty else f'{pop_vacinada.item():7.2f}%'.replace('.', ',')
-
-    pop_imunizada = dados_vacinacao.loc[filtro_data & filtro_estado, 'perc_vacinadas_2a_dose']
-    pop_imunizada = 'indisponível' if pop_imunizada.empty else f'{pop_imunizada.item():7.2f}%'.replace('.', ',')
-
-    pop_3doses = dados_vacinacao.loc[filtro_data & filtro_estado, 'perc_vacinadas_3a_dose']
-    pop_3doses = 'indisponível' if pop_3doses.empty else f'{pop_3doses.item():7.2f}%'.replace('.', ',')
-
-    pop_4doses = dados_vacinacao.loc[filtro_data & filtro_estado, 'perc_vacinadas_4a_dose']
-    pop_4doses = 'indisponível' if pop_4doses.empty else f'{pop_4doses.item():7.2f}%'.replace('.', ',')
-
-    estado = [doses_aplicadas,
-              dose_1,
-              dose_2,
-              dose_3,
-              dose_4,
-              dose_unica,
-              pop_vacinada,
-              pop_imunizada,
-              pop_3doses,
-              pop_4doses,
-              media_diaria,
-              media_movel,
-              media_semanal]
-
-    doses_aplicadas = dados_vacinacao.loc[filtro_data & filtro_cidade, 'total_doses']
-    doses_aplicadas = 'indisponível' if doses_aplicadas.empty else f'{doses_aplicadas.item():7,.0f}'.replace(',', '.')
-
-    dose_1 = dados_vacinacao.loc[filtro_data & filtro_cidade, '1a_dose']
-    dose_1 = 'indisponível' if dose_1.empty else f'{dose_1.item():7,.0f}'.replace(',', '.')
-
-    dose_2 = dados_vacinacao.loc[filtro_data & filtro_cidade, '2a_dose']
-    dose_2 = 'indisponível' if dose_2.empty else f'{dose_2.item():7,.0f}'.replace(',', '.') if not isnan(dose_2.item()) else 'indisponível'
-
-    dose_3 = dados_vacinacao.loc[filtro_data & filtro_cidade, '3a_dose']
-    dose_3 = 'indisponível' if dose_3.empty else f'{dose_3.item():7,.0f}'.replace(',', '.')
-
-    dose_4 = dados_vacinacao.loc[filtro_data & filtro_cidade, '4a_dose']
-    dose_4 = 'indisponível' if dose_4.empty else f'{dose_4.item():7,.0f}'.replace(',', '.')
-
-    dose_unica = dados_vacinacao.loc[filtro_data & filtro_cidade, 'dose_unica']
-    dose_unica = 'indisponível' if dose_unica.empty else f'{dose_unica.item():7,.0f}'.replace(',', '.')
-
-    total_doses = dados_vacinacao.loc[filtro_data_max & filtro_cidade, 'total_doses'].item()
-    data_max = dados_vacinacao.loc[filtro_data_max & filtro_cidade, 'data'].item()
-    dias = (data_max - inicio_vacinacao).days
-    media_diaria = total_doses / dias
-    media_diaria = f'{media_diaria:7,.0f}'.replace(',', '.')
-
-    media_movel = dados_vacinacao.loc[filtro_cidade, ['data', 'aplicadas_dia']] \
-                                 .rolling('7D', on='data') \
-                                 .mean() \
-                                 .iat[-1,1]
-    media_movel = f'{media_movel:7,.0f}'.replace(',', '.')
-
-    semanas = dias / 7
-    media_semanal = total_doses / semanas
-    media_semanal = f'{media_semanal:7,.0f}'.replace(',', '.')
-
-    pop_vacinada = dados_vacinacao.loc[filtro_data & filtro_cidade, 'perc_vacinadas_1a_dose']
-    pop_vacinada = 'indisponível' if pop_vacinada.empty else f'{pop_vacinada.item():7.2f}%'.replace('.', ',')
-
-    pop_imunizada = dados_vacinacao.loc[filtro_data & filtro_cidade, 'perc_vacinadas_2a_dose']
-    pop_imunizada = 'indisponível' if pop_imunizada.empty else f'{pop_imunizada.item():7.2f}%'.replace('.', ',')
-
-    pop_3doses = dados_vacinacao.loc[filtro_data & filtro_cidade, 'perc_vacinadas_3a_dose']
-    pop_3doses = 'indisponível' if pop_3doses.empty else f'{pop_3doses.item():7.2f}%'.replace('.', ',')
-
-    pop_4doses = dados_vacinacao.loc[filtro_data & filtro_cidade, 'perc_vacinadas_4a_dose']
-    pop_4doses = 'indisponível' if pop_4doses.empty else f'{pop_4doses.item():7.2f}%'.replace('.', ',')
-
-    cidade = [doses_aplicadas,
-              dose_1,
-              dose_2,
-              dose_3,
-              dose_4,
-              dose_unica,
-              pop_vacinada,
-              pop_imunizada,
-              pop_3doses,
-              pop_4doses,
-              media_diaria,
-              media_movel,
-              media_semanal]
-
-    fig = go.Figure(data=[go.Table(header=dict(values=cabecalho,
-                                               fill_color='#00aabb',
-                                               font=dict(color='white'),
-                                               align=['right', 'right', 'right'],
-                                               line=dict(width=5)),
-                                   cells=dict(values=[info, estado, cidade],
-                                              fill_color='lavender',
-                                              align='right',
-                                              line=dict(width=5)),
-                                   columnwidth=[1, 1, 1])])
+        for coluna, texto in zip(colunas, textos):
+            coluna.append(texto)
 
-    fig.update_layout(
-        font=dict(size=15, family='Roboto'),
-        margin=dict(l=1, r=1, b=1, t=30, pad=5),
-        annotations=[dict(x=0, y=0, showarrow=False, font=dict(size=13),
-                          text='<i><b>Fonte:</b> <a href = "https://www.seade.gov.br/coronavirus/">'
-                               'Governo do Estado de São Paulo</a></i>')],
-        height=550
-    )
+    return colunas
 
-    # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/resumo-vacinacao.html', include_plotlyjs='directory', auto_open=False)
+def _formata_inteiros(valores, largura=0, nulo='indisponível'):
+    # 1234567 -> '1.234.567'
+    return _formata_numeros(valores, milhar=True, largura=largura, nulo=nulo)
 
-    fig.update_layout(
-        font=dict(size=13, family='Roboto'),
-        margin=dict(l=1, r=1, b=1, t=30, pad=5),
-        annotations=[dict(x=0, y=0)],
-        height=620
-    )
 
-    # fig.show()
+def _formata_decimais(valores, casas, sufixo='', largura=0, nulo='indisponível'):
+    # 12.345 -> '12,35' (casas=2); percentuais com sufixo='%'
+    return _formata_numeros(valores, casas, sufixo=sufixo, largura=largura, nulo=nulo)
 
-    pio.write_html(fig, file='docs/graficos/resumo-vacinacao-mobile.html', include_plotlyjs='directory', auto_open=False)
 
+def _formata_variacoes(valores, nulo=nan):
+    # 12.34 -> '+12,3%'; sem valor, nan (sem texto nos gráficos) ou o texto indicado
+    return _formata_numeros(valores, 1, sinal=True, sufixo='%', nulo=nulo)
 
-def gera_resumo_diario(dados_munic, dados_cidade, leitos_municipais, dados_estado, leitos_estaduais, isolamento, internacoes, dados_vacinacao):
-    hoje = data_processamento
 
-    cabecalho = ['<b>Resumo diário</b>',
-                 '<b>Estado de SP</b><br><i>' + hoje.strftime('%d/%m/%Y') + '</i>',
-                 '<b>Cidade de SP</b><br><i>' + hoje.strftime('%d/%m/%Y') + '</i>']
+def _formata_numeros(valores, casas=0, milhar=False, sinal=False, sufixo='', largura=0, nulo='indisponível'):
+    # formatação brasileira: f'{x:{largura},.{casas}f}' com '.' e ',' trocados (sem separador de milhar se
+    # milhar=False), seguido do sufixo. Valores ausentes viram nulo
+    formato = f'{"+" if sinal else ""}{largura}{"," if milhar else ""}.{casas}f'
+    troca = str.maketrans(',.', '.,')
+    valores = np.asarray(valores, dtype='f8').ravel()
 
-    info = ['<b>Vacinadas</b>', '<b>Casos</b>', '<b>Casos no dia</b>', '<b>Óbitos</b>', '<b>Óbitos no dia</b>',
-            '<b>Letalidade</b>', '<b>Leitos Covid-19</b>', '<b>Internados UTI</b>', '<b>Ocupação de UTIs</b>', '<b>Isolamento</b>']
+    textos = np.empty(len(valores), dtype=object)
+    textos[:] = [format(v, formato).translate(troca) + sufixo if np.isfinite(v) else nulo for v in valores.tolist()]
 
-    filtro = (isolamento.município == 'Estado de São Paulo') & (isolamento.data.dt.date == hoje.date() - timedelta(days=1))
-    isolamento_atual = isolamento.loc[filtro, 'isolamento']
-    isolamento_atual = 'indisponível' if isolamento_atual.empty else f'{isolamento_atual.item():7.0f}%'.replace('.', ',')
+    return textos
 
-    filtro = (dados_vacinacao.municipio == 'ESTADO DE SAO PAULO') & (dados_vacinacao.data.dt.date == hoje.date())
-    vacinadas = dados_vacinacao.loc[filtro, 'aplicadas_dia']
-    vacinadas = 'indisponível' if vacinadas.empty else f'{vacinadas.item():7,.0f}'.replace(',', '.')
 
-    filtro = (dados_estado.data.dt.date == hoje.date())
+def _vacinacao_retrato(vacinacao_regiao, linha_dia, dia):
+    inicio_vacinacao = pd.to_datetime('2021-01-17')
 
-    total_casos = dados_estado.loc[filtro, 'total_casos']
-    total_casos = 'indisponível' if total_casos.empty else f'{total_casos.item():7,.0f}'.replace(',', '.')
+    valores = {c: _valor_retrato(linha_dia, c) for c in ('aplicadas_dia', 'total_doses', '1a_dose', '2a_dose', '3a_dose',
+                                                         '4a_dose', 'dose_unica', 'perc_vacinadas_1a_dose',
+                                                         'perc_vacinadas_2a_dose', 'perc_vacinadas_3a_dose',
+                                                         'perc_vacinadas_4a_dose')}
 
-    casos_dia = dados_estado.loc[filtro, 'casos_dia']
-    casos_dia = 'indisponível' if casos_dia.empty else f'{casos_dia.item():7,.0f}'.replace(',', '.')
+    # médias calculadas a partir do último registro disponível até a data do retrato
+    historico = linhas_data(vacinacao_regiao, None, dia)
 
-    total_obitos = dados_estado.loc[filtro, 'total_obitos']
-    total_obitos = 'indisponível' if total_obitos.empty else f'{total_obitos.item():7,.0f}'.replace(',', '.')
+    if historico.empty:
+        valores.update(media_diaria=None, media_movel=None, media_semanal=None)
+        return valores
 
-    obitos_dia = dados_estado.loc[filtro, 'obitos_dia']
-    obitos_dia = 'indisponível' if obitos_dia.empty else f'{obitos_dia.item():7,.0f}'.replace(',', '.')
+    ultimo = historico.iloc[-1]
+    dias = (ultimo.data - inicio_vacinacao).days + 1
+    janela = linhas_data(historico, ultimo.data - timedelta(days=6), ultimo.data).aplicadas_dia
 
-    letalidade_atual = dados_estado.loc[filtro, 'letalidade']
-    letalidade_atual = 'indisponível' if letalidade_atual.empty else f'{letalidade_atual.item():7.2f}%'.replace('.', ',')
+    valores.update(media_diaria=ultimo.total_doses / dias,
+                   media_movel=janela.mean(),
+                   media_semanal=ultimo.total_doses / (dias / 7))
 
-    leitos_covid = internacoes.loc[(internacoes.drs == 'Estado de São Paulo') & (internacoes.data.dt.date == hoje.date()), 'total_covid_uti_ultimo_dia']
-    leitos_covid = 'indisponível' if leitos_covid.empty else f'{leitos_covid.item():7,.0f}'.replace(',', '.')
+    return valores
 
-    internacoes_dia = internacoes.loc[(internacoes.drs == 'Estado de São Paulo') & (internacoes.data.dt.date == hoje.date()), 'pacientes_uti_ultimo_dia']
-    internacoes_dia = 'indisponível' if internacoes_dia.empty else f'{internacoes_dia.item():7,.0f}'.replace(',', '.')
 
-    ocupacao_uti = leitos_estaduais.loc[leitos_estaduais.data.dt.date == hoje.date(), 'sp_uti']
-    ocupacao_uti = 'indisponível' if ocupacao_uti.empty else f'{ocupacao_uti.item():7.1f}%'.replace('.', ',')
+def gera_retrato_diario(data, dados_munic, dados_estado, leitos_estaduais, isolamento, indice_internacoes, dados_vacinacao):
+    # valores brutos dos indicadores do estado e da capital para um único dia (None quando indisponíveis);
+    # cada fonte é filtrada uma única vez pela data e o retrato é compartilhado pelas tabelas de resumo
+    dia = pd.Timestamp(data).normalize()
 
-    estado = [vacinadas,
-              total_casos,
-              casos_dia,
-              total_obitos,
-              obitos_dia,
-              letalidade_atual,
-              leitos_covid,
-              internacoes_dia,
-              ocupacao_uti,
-              isolamento_atual]
+    vacinacao_dia = linhas_data(dados_vacinacao, dia)
+    isolamento_dia = linhas_data(isolamento, dia - timedelta(days=1))
 
-    filtro = (isolamento.município == 'São Paulo') & (isolamento.data.dt.date == hoje.date() - timedelta(days=1))
-    isolamento_atual = isolamento.loc[filtro, 'isolamento']
-    isolamento_atual = 'indisponível' if isolamento_atual.empty else f'{isolamento_atual.item():7.0f}%'.replace('.', ',')
+    retrato = {'data': dia}
 
-    filtro = (dados_vacinacao.municipio == 'SAO PAULO') & (dados_vacinacao.data.dt.date == hoje.date())
-    vacinadas = dados_vacinacao.loc[filtro, 'aplicadas_dia']
-    vacinadas = 'indisponível' if vacinadas.empty else f'{vacinadas.item():7,.0f}'.replace(',', '.')
+    for regiao, municipio, municipio_vacinacao, regiao_internacoes in (('estado', 'Estado de São Paulo', 'ESTADO DE SAO PAULO', 'estado'),
+                                                                       ('cidade', 'São Paulo', 'SAO PAULO', 'municipio')):
+        vacinacao_regiao = dados_vacinacao.loc[dados_vacinacao.municipio == municipio_vacinacao]
+        valores = _vacinacao_retrato(vacinacao_regiao, vacinacao_dia.loc[vacinacao_dia.municipio == municipio_vacinacao], dia)
 
-    filtro = (dados_munic.nome_munic == 'São Paulo') & (dados_munic.datahora.dt.date == hoje.date())
+        valores['isolamento'] = _valor_retrato(isolamento_dia.loc[isolamento_dia.município == municipio], 'isolamento')
 
-    total_casos = dados_munic.loc[filtro, 'casos']
-    total_casos = 'indisponível' if total_casos.empty else f'{total_casos.item():7,.0f}'.replace(',', '.')
+        for chave, coluna in (('leitos_covid', 'total_covid_uti_ultimo_dia'), ('internados_uti', 'pacientes_uti_ultimo_dia')):
+            valor = busca_internacoes(indice_internacoes, regiao_internacoes, dia, coluna)
+            valores[chave] = None if valor is None or pd.isna(valor) else valor
 
-    casos_dia = dados_munic.loc[filtro, 'casos_novos']
-    casos_dia = 'indisponível' if casos_dia.empty else f'{casos_dia.item():7,.0f}'.replace(',', '.')
+        retrato[regiao] = valores
 
-    total_obitos = dados_munic.loc[filtro, 'obitos']
-    total_obitos = 'indisponível' if total_obitos.empty else f'{total_obitos.item():7,.0f}'.replace(',', '.')
+    casos = linhas_data(dados_estado, dia)
+    retrato['estado'].update({c: _valor_retrato(casos, c) for c in ('total_casos', 'casos_dia', 'total_obitos', 'obitos_dia', 'letalidade')})
 
-    obitos_dia = dados_munic.loc[filtro, 'obitos_novos']
-    obitos_dia = 'indisponível' if obitos_dia.empty else f'{obitos_dia.item():7,.0f}'.replace(',', '.')
+    casos = linhas_data(dados_munic, dia, coluna='datahora')
+    casos = casos.loc[casos.nome_munic == 'São Paulo']
+    retrato['cidade'].update({chave: _valor_retrato(casos, coluna) for chave, coluna in (('total_casos', 'casos'),
+                                                                                        ('casos_dia', 'casos_novos'),
+                                                                                        ('total_obitos', 'obitos'),
+                                                                                        ('obitos_dia', 'obitos_novos'),
+                                                                                        ('letalidade', 'letalidade'))})
 
-    letalidade_atual = dados_munic.loc[filtro, 'letalidade']
-    letalidade_atual = 'indisponível' if letalidade_atual.empty else f'{letalidade_atual.item() * 100:7.2f}%'.replace('.', ',')
+    # a letalidade municipal é uma fração; a estadual já está em %
+    if retrato['cidade']['letalidade'] is not None:
+        retrato['cidade']['letalidade'] *= 100
 
-    leitos_covid = internacoes.loc[(internacoes.drs == 'Município de São Paulo') & (internacoes.data.dt.date == hoje.date()), 'total_covid_uti_ultimo_dia']
-    leitos_covid = 'indisponível' if leitos_covid.empty else f'{leitos_covid.item():7,.0f}'.replace(',', '.')
+    # ocupação de UTI do estado vem da série de leitos estaduais; a da capital, das internações
+    retrato['estado']['ocupacao_uti'] = _valor_retrato(linhas_data(leitos_estaduais, dia), 'sp_uti')
+    ocupacao = busca_internacoes(indice_internacoes, 'municipio', dia, 'ocupacao_leitos_ultimo_dia')
+    retrato['cidade']['ocupacao_uti'] = None if ocupacao is None or pd.isna(ocupacao) else ocupacao
 
-    internacoes_dia = internacoes.loc[(internacoes.drs == 'Município de São Paulo') & (internacoes.data.dt.date == hoje.date()), 'pacientes_uti_ultimo_dia']
-    internacoes_dia = 'indisponível' if internacoes_dia.empty else f'{internacoes_dia.item():7,.0f}'.replace(',', '.')
+    return retrato
 
-    ocupacao_uti = internacoes.loc[(internacoes.drs == 'Município de São Paulo') & (internacoes.data.dt.date == hoje.date()), 'ocupacao_leitos_ultimo_dia']
-    ocupacao_uti = 'indisponível' if ocupacao_uti.empty else f'{ocupacao_uti.item():7.1f}%'.replace('.', ',')
 
-    cidade = [vacinadas,
-              total_casos,
-              casos_dia,
-              total_obitos,
-              obitos_dia,
-              letalidade_atual,
-              leitos_covid,
-              internacoes_dia,
-              ocupacao_uti,
-              isolamento_atual]
+def gera_resumo_vacinacao(retrato):
+    cabecalho = ['Campanha de<br>vacinação',
+                 'Estado de SP<br><i>' + retrato['data'].strftime('%d/%m/%Y') + '</i>',
+                 'Cidade de SP<br><i>' + retrato['data'].strftime('%d/%m/%Y') + '</i>']
 
-    fig = go.Figure(data=[go.Table(header=dict(values=cabecalho,
-                                               fill_color='#00aabb',
-                                               font=dict(color='white'),
-                                               align=['right', 'right', 'right'],
-                                               line=dict(width=5)),
-                                   cells=dict(values=[info, estado, cidade],
-                                              fill_color='lavender',
-                                              align='right',
-                                              line=dict(width=5)),
-                                   columnwidth=[1, 1, 1])])
+    info = ['Doses aplicadas', '1ª dose', '2ª dose', '3ª dose', '4ª dose',
+            'Dose única', 'População 1ª dose (%)', 'População 2ª dose (%)',
+            'População 3ª dose (%)', 'População 4ª dose (%)', 'Média diária',
+            'Média móvel 7 dias', 'Média semanal']
 
-    fig.update_layout(
-        font=dict(size=15, family='Roboto'),
-        margin=dict(l=1, r=1, b=1, t=30, pad=5),
-        annotations=[dict(x=0, y=0, showarrow=False, font=dict(size=13),
-                          text='<i><b>Fonte:</b> <a href = "https://www.seade.gov.br/coronavirus/">'
-                               'Governo do Estado de São Paulo</a></i>')],
-        height=445
-    )
+    estado, cidade = _colunas_retrato(retrato, [('total_doses', None), ('1a_dose', None), ('2a_dose', None),
+                                                ('3a_dose', None), ('4a_dose', None), ('dose_unica', None),
+                                                ('perc_vacinadas_1a_dose', 2), ('perc_vacinadas_2a_dose', 2),
+                                                ('perc_vacinadas_3a_dose', 2), ('perc_vacinadas_4a_dose', 2),
+                                                ('media_diaria', None), ('media_movel', None),
+                                                ('media_semanal', None)])
 
-    # fig.show()
+    tabela = pd.DataFrame({cabecalho[0]: info, cabecalho[1]: estado, cabecalho[2]: cidade})
+    fonte = '<a href="https://www.seade.gov.br/coronavirus/">Governo do Estado de São Paulo</a>'
 
-    pio.write_html(fig, file='docs/graficos/resumo.html', include_plotlyjs='directory', auto_open=False)
+    escreve_tabela(tabela, 'docs/graficos/resumo-vacinacao.html', titulos_linhas=True, fonte=fonte)
+    escreve_tabela(tabela, 'docs/graficos/resumo-vacinacao-mobile.html', titulos_linhas=True, fonte=fonte)
 
-    fig.update_layout(
-        font=dict(size=13, family='Roboto'),
-        margin=dict(l=1, r=1, b=1, t=30, pad=5),
-        annotations=[dict(x=0, y=0)],
-        height=430
-    )
 
-    # fig.show()
+def gera_resumo_diario(retrato):
+    cabecalho = ['Resumo diário',
+                 'Estado de SP<br><i>' + retrato['data'].strftime('%d/%m/%Y') + '</i>',
+                 'Cidade de SP<br><i>' + retrato['data'].strftime('%d/%m/%Y') + '</i>']
 
-    pio.write_html(fig, file='docs/graficos/resumo-mobile.html', include_plotlyjs='directory', auto_open=False)
+    info = ['Vacinadas', 'Casos', 'Casos no dia', 'Óbitos', 'Óbitos no dia',
+            'Letalidade', 'Leitos Covid-19', 'Internados UTI', 'Ocupação de UTIs', 'Isolamento']
 
+    estado, cidade = _colunas_retrato(retrato, [('aplicadas_dia', None), ('total_casos', None), ('casos_dia', None),
+                                                ('total_obitos', None), ('obitos_dia', None), ('letalidade', 2),
+                                                ('leitos_covid', None), ('internados_uti', None),
+                                                ('ocupacao_uti', 1), ('isolamento', 0)])
 
-def _formata_variacao(v, retorna_texto=False):
-    if isnan(v) or v is None:
-        if retorna_texto:
-            return 'indisponível'
-        else:
-            return nan
+    tabela = pd.DataFrame({cabecalho[0]: info, cabecalho[1]: estado, cabecalho[2]: cidade})
+    fonte = '<a href="https://www.seade.gov.br/coronavirus/">Governo do Estado de São Paulo</a>'
 
-    return f'+{v:02.1f}%'.replace('.', ',') if v >= 0 else f'{v:02.1f}%'.replace('.', ',')
+    escreve_tabela(tabela, 'docs/graficos/resumo.html', titulos_linhas=True, fonte=fonte)
+    escreve_tabela(tabela, 'docs/graficos/resumo-mobile.html', titulos_linhas=True, fonte=fonte)
 
 
 def _formata_semana_ordinal(data):
@@ -1387,119 +2326,42 @@ def gera_resumo_semanal(evolucao_cidade, evolucao_estado):
     hoje = data_processamento - timedelta(days=1)
     semana = _formata_semana_extenso(_converte_semana(hoje), inclui_ano=False)
 
-    cabecalho = [f'<b>{hoje_formatado}ª semana<br>epidemiológica</b>',
-                 f'<b>Estado de SP</b><br>{semana}',
-                 f'<b>Cidade de SP</b><br>{semana}']
+    cabecalho = [f'{hoje_formatado}ª semana<br>epidemiológica',
+                 f'Estado de SP<br>{semana}',
+                 f'Cidade de SP<br>{semana}']
 
     semana = _formata_semana_extenso(_converte_semana(hoje), inclui_ano=True)
 
-    info = ['<b>Vacinadas</b>', '<b>Variação</b>',
-            '<b>Casos</b>', '<b>Variação</b>',
-            '<b>Óbitos</b>', '<b>Variação</b>',
-            '<b>Internações</b>', '<b>Variação</b>',
-            '<b>Ocupação de UTIs</b>', '<b>Variação</b>',
-            '<b>Isolamento</b>', '<b>Variação</b>']
-
-    num_semana = evolucao_estado.index[evolucao_estado.data == semana].item()
-
-    vacinadas_semana = evolucao_estado.loc[num_semana, 'vacinadas_semana']
-    vacinadas_semana = 'indisponível' if isnan(vacinadas_semana) else f'{vacinadas_semana.item():7,.0f}'.replace(',', '.')
-
-    casos_semana = evolucao_estado.loc[num_semana, 'casos_semana']
-    casos_semana = 'indisponível' if isnan(casos_semana) else f'{casos_semana.item():7,.0f}'.replace(',', '.')
-
-    obitos_semana = evolucao_estado.loc[num_semana, 'obitos_semana']
-    obitos_semana = 'indisponível' if isnan(obitos_semana) else f'{obitos_semana.item():7,.0f}'.replace(',', '.')
-
-    internacoes = evolucao_estado.loc[num_semana, 'internacoes_semana']
-    internacoes = 'indisponível' if isnan(internacoes) else f'{internacoes.item():7,.0f}'.replace(',', '.')
-
-    uti = evolucao_estado.loc[num_semana, 'uti']
-    uti = 'indisponível' if isnan(uti) else f'{uti.item():7.1f}%'.replace('.', ',')
-
-    isolamento_atual = evolucao_estado.loc[num_semana, 'isolamento_atual']
-    isolamento_atual = 'indisponível' if isnan(isolamento_atual) else f'{isolamento_atual.item():7.1f}%'.replace('.', ',')
-
-    estado = [vacinadas_semana,  # Vacinadas
-              '<i>' + _formata_variacao(evolucao_estado.loc[num_semana, 'variacao_vacinadas'], retorna_texto=True) + '</i>',  # Variação vacinadas
-              casos_semana,  # Casos
-              '<i>' + _formata_variacao(evolucao_estado.loc[num_semana, 'variacao_casos'], retorna_texto=True) + '</i>',  # Variação casos
-              obitos_semana,  # óbitos
-              '<i>' + _formata_variacao(evolucao_estado.loc[num_semana, 'variacao_obitos'], retorna_texto=True) + '</i>',  # Variação óbitos
-              internacoes,  # Internações
-              '<i>' + _formata_variacao(evolucao_estado.loc[num_semana, 'variacao_internacoes'], retorna_texto=True) + '</i>',  # Variação de internações
-              uti,  # Ocupação de UTIs
-              '<i>' + _formata_variacao(evolucao_estado.loc[num_semana, 'variacao_uti'], retorna_texto=True) + '</i>',  # Variação ocupação de UTIs
-              isolamento_atual, # Isolamento social
-              '<i>' + _formata_variacao(evolucao_estado.loc[num_semana, 'variacao_isolamento'], retorna_texto=True) + '</i>']  # Variação isolamento
-
-    num_semana = evolucao_cidade.index[evolucao_cidade.data == semana].item()
-
-    vacinadas_semana = evolucao_cidade.loc[num_semana, 'vacinadas_semana']
-    vacinadas_semana = 'indisponível' if isnan(vacinadas_semana) else f'{vacinadas_semana.item():7,.0f}'.replace(',', '.')
-
-    casos_semana = evolucao_cidade.loc[num_semana, 'casos_semana']
-    casos_semana = 'indisponível' if isnan(casos_semana) else f'{casos_semana.item():7,.0f}'.replace(',', '.')
-
-    obitos_semana = evolucao_cidade.loc[num_semana, 'obitos_semana']
-    obitos_semana = 'indisponível' if isnan(obitos_semana) else f'{obitos_semana.item():7,.0f}'.replace(',', '.')
-
-    internacoes = evolucao_cidade.loc[num_semana, 'internacoes_semana']
-    internacoes = 'indisponível' if isnan(internacoes) else f'{internacoes.item():7,.0f}'.replace(',', '.')
-
-    uti = evolucao_cidade.loc[num_semana, 'uti']
-    uti = 'indisponível' if isnan(uti) else f'{uti.item():7.1f}%'.replace('.', ',')
-
-    isolamento_atual = evolucao_cidade.loc[num_semana, 'isolamento_atual']
-    isolamento_atual = 'indisponível' if isnan(isolamento_atual) else f'{isolamento_atual.item():7.1f}%'.replace('.', ',')
-
-    cidade = [vacinadas_semana,  # Vacinadas
-              '<i>' + _formata_variacao(evolucao_cidade.loc[num_semana, 'variacao_vacinadas'], retorna_texto=True) + '</i>',  # Variação vacinadas
-              casos_semana,  # Casos
-              '<i>' + _formata_variacao(evolucao_cidade.loc[num_semana, 'variacao_casos'], retorna_texto=True) + '</i>',  # Variação casos
-              obitos_semana,  # óbitos
-              '<i>' + _formata_variacao(evolucao_cidade.loc[num_semana, 'variacao_obitos'], retorna_texto=True) + '</i>',  # Variação óbitos
-              internacoes,  # Internações
-              '<i>' + _formata_variacao(evolucao_cidade.loc[num_semana, 'variacao_internacoes'], retorna_texto=True) + '</i>',  # Variação de internações
-              uti,  # Ocupação de UTIs
-              '<i>' + _formata_variacao(evolucao_cidade.loc[num_semana, 'variacao_uti'], retorna_texto=True) + '</i>',  # Variação ocupação de UTIs
-              isolamento_atual,  # Isolamento social
-              '<i>' + _formata_variacao(evolucao_cidade.loc[num_semana, 'variacao_isolamento'], retorna_texto=True) + '</i>']  # Variação isolamento
-
-    fig = go.Figure(data=[go.Table(header=dict(values=cabecalho,
-                                               fill_color='#00aabb',
-                                               font=dict(color='white'),
-                                               align=['right', 'right', 'right'],
-                                               line=dict(width=5)),
-                                   cells=dict(values=[info, estado, cidade],
-                                              fill_color='lavender',
-                                              align='right',
-                                              line=dict(width=5)),
-                                   columnwidth=[1, 1, 1])])
+    info = ['Vacinadas', 'Variação',
+            'Casos', 'Variação',
+            'Óbitos', 'Variação',
+            'Internações', 'Variação',
+            'Ocupação de UTIs', 'Variação',
+            'Isolamento', 'Variação']
 
-    fig.update_layout(
-        font=dict(size=15, family='Roboto'),
-        margin=dict(l=1, r=1, b=1, t=30, pad=5),
-        annotations=[dict(x=0, y=0, showarrow=False, font=dict(size=13),
-                          text='<i><b>Fonte:</b> <a href = "https://www.seade.gov.br/coronavirus/">'
-                               'Governo do Estado de São Paulo</a></i>')],
-        height=515
-    )
+    # colunas com os totais da semana, cada um seguido da respectiva variação
+    totais = ['vacinadas_semana', 'casos_semana', 'obitos_semana', 'internacoes_semana']
+    percentuais = ['uti', 'isolamento_atual']
+    variacoes = ['variacao_vacinadas', 'variacao_casos', 'variacao_obitos', 'variacao_internacoes', 'variacao_uti',
+                 'variacao_isolamento']
 
-    # fig.show()
+    def coluna_semana(evolucao):
+        linha = evolucao.loc[evolucao.index[evolucao.data == semana].item()]
 
-    pio.write_html(fig, file='docs/graficos/resumo-semanal.html', include_plotlyjs='directory', auto_open=False)
+        valores = list(_formata_inteiros(linha[totais], largura=7)) + \
+            list(_formata_decimais(linha[percentuais], 1, sufixo='%', largura=7))
 
-    fig.update_layout(
-        font=dict(size=13, family='Roboto'),
-        margin=dict(l=1, r=1, b=1, t=30, pad=5),
-        annotations=[dict(x=0, y=0)],
-        height=495
-    )
+        return [texto for valor, variacao in zip(valores, _formata_variacoes(linha[variacoes], nulo='indisponível'))
+                for texto in (valor, '<i>' + variacao + '</i>')]
 
-    # fig.show()
+    estado = coluna_semana(evolucao_estado)
+    cidade = coluna_semana(evolucao_cidade)
 
-    pio.write_html(fig, file='docs/graficos/resumo-semanal-mobile.html', include_plotlyjs='directory', auto_open=False)
+    tabela = pd.DataFrame({cabecalho[0]: info, cabecalho[1]: estado, cabecalho[2]: cidade})
+    fonte = '<a href="https://www.seade.gov.br/coronavirus/">Governo do Estado de São Paulo</a>'
+
+    escreve_tabela(tabela, 'docs/graficos/resumo-semanal.html', titulos_linhas=True, fonte=fonte)
+    escreve_tabela(tabela, 'docs/graficos/resumo-semanal-mobile.html', titulos_linhas=True, fonte=fonte)
 
 
 def gera_casos_estado(dados):
@@ -1538,8 +2400,9 @@ def gera_casos_estado(dados):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/casos-estado.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    _decima_series(fig, 'docs/graficos/casos-estado.html')
+
+    escreve_grafico(fig, 'docs/graficos/casos-estado.html')
 
     # versão mobile
     fig.update_traces(selector=dict(type='scatter'), mode='lines')
@@ -1555,8 +2418,7 @@ def gera_casos_estado(dados):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/casos-estado-mobile.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/casos-estado-mobile.html')
 
 
 def gera_casos_cidade(dados):
@@ -1595,8 +2457,9 @@ def gera_casos_cidade(dados):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/casos-cidade.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    _decima_series(fig, 'docs/graficos/casos-cidade.html')
+
+    escreve_grafico(fig, 'docs/graficos/casos-cidade.html')
 
     # versão mobile
     fig.update_traces(selector=dict(type='scatter'), mode='lines')
@@ -1612,8 +2475,7 @@ def gera_casos_cidade(dados):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/casos-cidade-mobile.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/casos-cidade-mobile.html')
 
 
 def gera_doencas_preexistentes_casos(doencas):
@@ -1706,8 +2568,7 @@ def gera_doencas_preexistentes_casos(doencas):
 
     fig.update_yaxes(range=[0, 105], tickvals=[*range(0, 105, 5)])
 
-    pio.write_html(fig, file='docs/graficos/doencas-casos.html', include_plotlyjs='directory',
-                   auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/doencas-casos.html')
 
     # versão mobile
     fig.update_yaxes(range=[0, 105], tickvals=[*range(0, 105, 10)])
@@ -1718,8 +2579,7 @@ def gera_doencas_preexistentes_casos(doencas):
         height=400
     )
 
-    pio.write_html(fig, file='docs/graficos/doencas-casos-mobile.html', include_plotlyjs='directory',
-                   auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/doencas-casos-mobile.html')
 
 
 def gera_doencas_preexistentes_obitos(doencas):
@@ -1812,8 +2672,7 @@ def gera_doencas_preexistentes_obitos(doencas):
 
     fig.update_yaxes(range=[0, 105], tickvals=[*range(0, 105, 5)])
 
-    pio.write_html(fig, file='docs/graficos/doencas-obitos.html', include_plotlyjs='directory',
-                   auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/doencas-obitos.html')
 
     # versão mobile
     fig.update_yaxes(range=[0, 105], tickvals=[*range(0, 105, 10)])
@@ -1824,18 +2683,40 @@ def gera_doencas_preexistentes_obitos(doencas):
         height=400
     )
 
-    pio.write_html(fig, file='docs/graficos/doencas-obitos-mobile.html', include_plotlyjs='directory',
-                   auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/doencas-obitos-mobile.html')
+
+
+def calcula_casos_obitos(dados_raciais, dimensoes=('raca_cor',)):
+    # tabela única com casos, óbitos e percentuais por categoria da primeira dimensão;
+    # dimensões extras (ex.: 'sexo', 'faixa_etaria') definem os grupos sobre os quais os percentuais são calculados
+    dimensoes = list(dimensoes)
+    extras = dimensoes[1:]
+
+    contagem = dados_raciais.groupby(dimensoes + ['obito'], dropna=False).contagem.sum().unstack('obito', fill_value=0)
+
+    tabela = pd.DataFrame({'casos': contagem.sum(axis=1),
+                           'obitos': contagem[1] if 1 in contagem.columns else 0},
+                          index=contagem.index)
+
+    totais = tabela.groupby(level=extras).transform('sum') if extras else tabela.sum()
+    percentuais = (tabela / totais) * 100
+
+    tabela['casos_perc'] = percentuais.casos
+    tabela['obitos_perc'] = percentuais.obitos
+
+    return tabela
 
 
 def gera_casos_obitos_por_raca_cor(dados_raciais):
-    racas_cores = list(dados_raciais.reset_index('raca_cor').raca_cor.unique())
+    tabela = calcula_casos_obitos(dados_raciais)
 
-    casos = [dados_raciais.xs(rc, level='raca_cor').contagem.sum() for rc in racas_cores]
-    casos_perc = ['{:02.1f}%'.format((c / sum(casos)) * 100) for c in casos]
+    racas_cores = list(tabela.index)
 
-    obitos = [dados_raciais.xs((1, rc), level=('obito', 'raca_cor')).contagem.sum() for rc in racas_cores]
-    obitos_perc = ['{:02.1f}%'.format((o / sum(obitos)) * 100) for o in obitos]
+    casos = tabela.casos
+    casos_perc = tabela.casos_perc.map('{:02.1f}%'.format)
+
+    obitos = tabela.obitos
+    obitos_perc = tabela.obitos_perc.map('{:02.1f}%'.format)
 
     fig = go.Figure()
 
@@ -1866,8 +2747,7 @@ def gera_casos_obitos_por_raca_cor(dados_raciais):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/raca-cor.html', include_plotlyjs='directory',
-                   auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/raca-cor.html')
 
     # versão mobile
     fig.update_layout(
@@ -1876,8 +2756,7 @@ def gera_casos_obitos_por_raca_cor(dados_raciais):
         height=400
     )
 
-    pio.write_html(fig, file='docs/graficos/raca-cor-mobile.html', include_plotlyjs='directory',
-                   auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/raca-cor-mobile.html')
 
 
 def gera_isolamento_grafico(isolamento):
@@ -1896,36 +2775,63 @@ def gera_isolamento_grafico(isolamento):
     cidades_iniciais = ['Estado de São Paulo', 'São Paulo', 'Guarulhos', 'Osasco', 'Jundiaí', 'Caieiras',
                         'Campinas', 'Santo André', 'Mauá', 'Francisco Morato', 'Poá']
 
-    for m in l_municipios:
-        grafico = isolamento[isolamento.município == m]
+    # no modo JSON só as cidades iniciais ficam no gráfico; os demais municípios são gravados em
+    # isolamento/<município>.json e carregados num único trace quando escolhidos no menu (ver grafico.js)
+    grupos = isolamento.groupby('município', sort=False)
 
+    for m in l_municipios:
         if m in cidades_iniciais:
+            grafico = grupos.get_group(m)
             fig.add_trace(go.Scatter(x=grafico['dia'], y=grafico['isolamento'], name=m,
                                      mode='lines+markers', hovertemplate='%{y:.0f}%', visible=True))
-        else:
+        elif not graficos_json:
+            grafico = grupos.get_group(m)
             fig.add_trace(go.Scatter(x=grafico['dia'], y=grafico['isolamento'], name=m,
                                      mode='lines+markers+text', textposition='top center',
-                                     text=grafico['isolamento'].apply(lambda i: str(i) + '%'),
+                                     text=_formata_decimais(grafico['isolamento'], 0, sufixo='%'),
                                      hovertemplate='%{y:.0f}%', visible=False))
 
+    if graficos_json:
+        fig.add_trace(go.Scatter(mode='lines+markers+text', textposition='top center',
+                                 hovertemplate='%{y:.0f}%', visible=False))
+
+        for m, grafico in grupos:
+            if m not in cidades_iniciais:
+                y = _arredonda_exibidos(grafico['isolamento'], fig.data[-1].hovertemplate)
+                escreve_dados_grafico('docs/graficos/isolamento/' + _nome_arquivo(m) + '.json',
+                                      [{'x': grafico['dia'], 'y': y, 'name': m,
+                                        'text': _formata_decimais(grafico['isolamento'], 0, sufixo='%')}])
+
+    nomes_traces = [t.name for t in fig.data]
+    trace_dinamico = len(nomes_traces) - 1
+
+    def visiveis(cidades):
+        return [n in cidades for n in nomes_traces]
+
     opcao_metro = dict(label='Região Metropolitana',
                        method='update',
-                       args=[{'visible': s_municipios.isin(cidades_iniciais)},
+                       args=[{'visible': visiveis(cidades_iniciais)},
                              {'title.text': titulo_a + 'Região Metropolitana' + titulo_b},
                              {'showlegend': True}])
 
     opcao_estado = dict(label='Estado de São Paulo',
                         method='update',
-                        args=[{'visible': s_municipios.isin(['Estado de São Paulo'])},
+                        args=[{'visible': visiveis(['Estado de São Paulo'])},
                               {'title.text': titulo_a + 'Estado de São Paulo' + titulo_b},
                               {'showlegend': False}])
 
     def cria_lista_opcoes(cidade):
+        if cidade in nomes_traces:
+            return dict(label=cidade,
+                        method='update',
+                        args=[{'visible': visiveis([cidade])},
+                              {'title.text': titulo_a + cidade + titulo_b},
+                              {'showlegend': False}])
+
         return dict(label=cidade,
-                    method='update',
-                    args=[{'visible': s_municipios.isin([cidade])},
-                          {'title.text': titulo_a + cidade + titulo_b},
-                          {'showlegend': False}])
+                    method='skip',
+                    args=[{'arquivo': 'isolamento/' + _nome_arquivo(cidade) + '.json', 'traces': [trace_dinamico]},
+                          {'title.text': titulo_a + cidade + titulo_b}])
 
     fig.update_layout(
         font=dict(family='Roboto'),
@@ -1945,7 +2851,9 @@ def gera_isolamento_grafico(isolamento):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/isolamento.html', include_plotlyjs='directory', auto_open=False)
+    _decima_series(fig, 'docs/graficos/isolamento.html')
+
+    escreve_grafico(fig, 'docs/graficos/isolamento.html')
 
     # versão mobile
     fig.update_traces(mode='lines+text')
@@ -1961,52 +2869,25 @@ def gera_isolamento_grafico(isolamento):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/isolamento-mobile.html', include_plotlyjs='directory', auto_open=False)
+    escreve_grafico(fig, 'docs/graficos/isolamento-mobile.html')
 
 
 def gera_isolamento_tabela(isolamento):
-    dados = isolamento.loc[isolamento.data == isolamento.data.max(), ['data', 'município', 'isolamento']]
+    dados = linhas_data(isolamento, isolamento.data.iat[-1])[['data', 'município', 'isolamento']].copy()
     dados.sort_values(by=['isolamento', 'município'], ascending=False, inplace=True)
 
-    cabecalho = ['<b>Cidade</b>',
-                 '<b>Isolamento</b><br><i>' + dados.data.iloc[0].strftime('%d/%m/%Y') + '</i>']
-
-    fig = go.Figure(data=[go.Table(header=dict(values=cabecalho,
-                                               fill_color='#00aabb',
-                                               font=dict(color='white'),
-                                               align='right',
-                                               line=dict(width=5)),
-                                   cells=dict(values=[dados.município, dados.isolamento.map('{:02.0f}%'.format)],
-                                              fill_color='lavender',
-                                              align='right',
-                                              line=dict(width=5),
-                                              height=30),
-                                   columnwidth=[1, 1])])
-
-    fig.update_layout(
-        font=dict(size=15, family='Roboto'),
-        margin=dict(l=1, r=1, b=1, t=30, pad=5),
-        annotations=[dict(x=0, y=1.05, showarrow=False, font=dict(size=13),
-                          text='<i><b>Fonte:</b> <a href = "https://www.saopaulo.sp.gov.br/coronavirus/isolamento/">'
-                               'Governo do Estado de São Paulo</a></i>')],
-        height=600
-    )
-
-    # fig.show()
-
-    pio.write_html(fig, file='docs/graficos/tabela-isolamento.html', include_plotlyjs='directory', auto_open=False)
-
-    fig.update_layout(
-        font=dict(size=13, family='Roboto'),
-        margin=dict(l=1, r=1, b=1, t=30, pad=5),
-        annotations=[dict(x=0, y=1.05)],
-        height=400
-    )
+    cabecalho = ['Cidade',
+                 'Isolamento<br><i>' + dados.data.iloc[0].strftime('%d/%m/%Y') + '</i>']
 
-    # fig.show()
+    tabela = pd.DataFrame({cabecalho[0]: dados.município.to_numpy(),
+                           cabecalho[1]: _formata_decimais(dados.isolamento, 0, sufixo='%')})
+    chaves = pd.DataFrame({cabecalho[1]: dados.isolamento.to_numpy()})
+    fonte = '<a href="https://www.saopaulo.sp.gov.br/coronavirus/isolamento/">Governo do Estado de São Paulo</a>'
 
-    pio.write_html(fig, file='docs/graficos/tabela-isolamento-mobile.html', include_plotlyjs='directory',
-                   auto_open=False)
+    escreve_tabela(tabela, 'docs/graficos/tabela-isolamento.html', ordenavel=True, chaves=chaves, fonte=fonte,
+                   altura=600, virtual=True)
+    escreve_tabela(tabela, 'docs/graficos/tabela-isolamento-mobile.html', ordenavel=True, chaves=chaves,
+                   fonte=fonte, altura=400, virtual=True)
 
 
 def gera_evolucao_estado(evolucao_estado):
@@ -2017,53 +2898,38 @@ def gera_evolucao_estado(evolucao_estado):
     fig.add_trace(go.Scatter(x=grafico['data'], y=grafico['isolamento'], line=dict(color='orange'),
                              name='isolamento médio<br>de 2 semanas atrás', hovertemplate='%{y:.2f}%',
                              mode='lines+markers+text', textposition='top center',
-                             text=grafico['variacao_isolamento_2sem'].apply(lambda v: _formata_variacao(v))),
+                             text=_formata_variacoes(grafico['variacao_isolamento_2sem'])),
                   secondary_y=True)
 
     fig.add_trace(go.Scatter(x=grafico['data'], y=grafico['uti'], line=dict(color='green'),
                              name='taxa média de<br>ocupação de UTI', hovertemplate='%{y:.2f}%',
                              mode='lines+markers+text', textposition='top center',
-                             text=grafico['variacao_uti'].apply(lambda v: _formata_variacao(v))),
+                             text=_formata_variacoes(grafico['variacao_uti'])),
                   secondary_y=True)
 
     fig.add_trace(go.Scatter(x=grafico['data'], y=grafico['perc_imu_semana'], line=dict(color='black'),
                              name='população imunizada', hovertemplate='%{y:.2f}%',
                              mode='lines+markers+text', textposition='top center',
-                             text=grafico['variacao_perc_imu'].apply(lambda v: _formata_variacao(v))),
+                             text=_formata_variacoes(grafico['variacao_perc_imu'])),
                   secondary_y=True)
 
     fig.add_trace(go.Bar(x=grafico['data'], y=grafico['casos_semana'], marker_color='blue',
                          name='casos na<br>semana atual', textposition='outside',
-                         text=grafico['variacao_casos'].apply(lambda v: _formata_variacao(v))))
+                         text=_formata_variacoes(grafico['variacao_casos'])))
 
     fig.add_trace(go.Bar(x=grafico['data'], y=grafico['obitos_semana'], marker_color='red',
                          name='óbitos na<br>semana atual', textposition='outside',
-                         text=grafico['variacao_obitos'].apply(lambda v: _formata_variacao(v))))
+                         text=_formata_variacoes(grafico['variacao_obitos'])))
 
     fig.add_trace(go.Bar(x=grafico['data'], y=grafico['vacinadas_semana'], visible='legendonly',
                          marker_color='black', textposition='outside', name='pessoas vacinadas<br>na semana atual',
-                         text=grafico['variacao_vacinadas'].apply(lambda v: _formata_variacao(v))))
+                         text=_formata_variacoes(grafico['variacao_vacinadas'])))
 
     fig.add_trace(go.Bar(x=grafico['data'], y=grafico['internacoes_semana'], visible='legendonly',
                          marker_color='green', textposition='outside', name='novas internações<br>na semana atual',
-                         text=grafico['variacao_internacoes'].apply(lambda v: _formata_variacao(v))))
-
-    d = grafico.data.size
-
-    frames = [dict(data=[dict(type='scatter', x=grafico.data[:d + 1], y=grafico.isolamento[:d + 1]),
-                         dict(type='scatter', x=grafico.data[:d + 1], y=grafico.uti[:d + 1]),
-                         dict(type='scatter', x=grafico.data[:d + 1], y=grafico.perc_imu_semana[:d + 1]),
-                         dict(type='bar', x=grafico.data[:d + 1], y=grafico.casos_semana[:d + 1]),
-                         dict(type='bar', x=grafico.data[:d + 1], y=grafico.obitos_semana[:d + 1]),
-                         dict(type='bar', x=grafico.data[:d + 1], y=grafico.vacinadas_semana[:d + 1]),
-                         dict(type='bar', x=grafico.data[:d + 1], y=grafico.internacoes_semana[:d + 1])],
-                   traces=[0, 1, 2, 3, 4, 5, 6],
-                   ) for d in range(0, d)]
+                         text=_formata_variacoes(grafico['variacao_internacoes'])))
 
-    fig.frames = frames
-
-    botoes = [dict(label='Animar', method='animate',
-                   args=[None, dict(frame=dict(duration=400, redraw=True), fromcurrent=True, mode='immediate')])]
+    botoes = _adiciona_animacao(fig, duracao=400)
 
     fig.update_yaxes(title_text='Número de casos ou óbitos', secondary_y=False)
     fig.update_yaxes(title_text='Taxa média de isolamento há 2 semanas (%)', secondary_y=True)
@@ -2086,8 +2952,7 @@ def gera_evolucao_estado(evolucao_estado):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/evolucao-estado.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/evolucao-estado.html')
 
     # versão mobile
     fig.update_traces(selector=dict(type='scatter'), mode='lines')
@@ -2103,8 +2968,7 @@ def gera_evolucao_estado(evolucao_estado):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/evolucao-estado-mobile.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/evolucao-estado-mobile.html')
 
 
 def gera_evolucao_cidade(evolucao_cidade):
@@ -2115,53 +2979,38 @@ def gera_evolucao_cidade(evolucao_cidade):
     fig.add_trace(go.Scatter(x=grafico['data'], y=grafico['isolamento'], line=dict(color='orange'),
                              name='isolamento médio<br>de 2 semanas atrás', hovertemplate='%{y:.2f}%',
                              mode='lines+markers+text', textposition='top center',
-                             text=grafico['variacao_isolamento_2sem'].apply(lambda v: _formata_variacao(v))),
+                             text=_formata_variacoes(grafico['variacao_isolamento_2sem'])),
                   secondary_y=True)
 
     fig.add_trace(go.Scatter(x=grafico['data'], y=grafico['uti'], line=dict(color='green'),
                              name='taxa média de<br>ocupação de UTI', hovertemplate='%{y:.2f}%',
                              mode='lines+markers+text', textposition='top center',
-                             text=grafico['variacao_uti'].apply(lambda v: _formata_variacao(v))),
+                             text=_formata_variacoes(grafico['variacao_uti'])),
                   secondary_y=True)
 
     fig.add_trace(go.Scatter(x=grafico['data'], y=grafico['perc_imu_semana'], line=dict(color='black'),
                              name='população imunizada', hovertemplate='%{y:.2f}%',
                              mode='lines+markers+text', textposition='top center',
-                             text=grafico['variacao_perc_imu'].apply(lambda v: _formata_variacao(v))),
+                             text=_formata_variacoes(grafico['variacao_perc_imu'])),
                   secondary_y=True)
 
     fig.add_trace(go.Bar(x=grafico['data'], y=grafico['casos_semana'], marker_color='blue',
                          name='casos na<br>semana atual', textposition='outside',
-                         text=grafico['variacao_casos'].apply(lambda v: _formata_variacao(v))))
+                         text=_formata_variacoes(grafico['variacao_casos'])))
 
     fig.add_trace(go.Bar(x=grafico['data'], y=grafico['obitos_semana'], marker_color='red',
                          name='óbitos na<br>semana atual', textposition='outside',
-                         text=grafico['variacao_obitos'].apply(lambda v: _formata_variacao(v))))
+                         text=_formata_variacoes(grafico['variacao_obitos'])))
 
     fig.add_trace(go.Bar(x=grafico['data'], y=grafico['vacinadas_semana'], visible='legendonly',
                          marker_color='black', textposition='outside', name='pessoas vacinadas<br>na semana atual',
-                         text=grafico['variacao_vacinadas'].apply(lambda v: _formata_variacao(v))))
+                         text=_formata_variacoes(grafico['variacao_vacinadas'])))
 
     fig.add_trace(go.Bar(x=grafico['data'], y=grafico['internacoes_semana'], visible='legendonly',
                          marker_color='green', textposition='outside', name='novas internações<br>na semana atual',
-                         text=grafico['variacao_internacoes'].apply(lambda v: _formata_variacao(v))))
-
-    d = grafico.data.size
-
-    frames = [dict(data=[dict(type='scatter', x=grafico.data[:d + 1], y=grafico.isolamento[:d + 1]),
-                         dict(type='scatter', x=grafico.data[:d + 1], y=grafico.uti[:d + 1]),
-                         dict(type='scatter', x=grafico.data[:d + 1], y=grafico.perc_imu_semana[:d + 1]),
-                         dict(type='bar', x=grafico.data[:d + 1], y=grafico.casos_semana[:d + 1]),
-                         dict(type='bar', x=grafico.data[:d + 1], y=grafico.obitos_semana[:d + 1]),
-                         dict(type='bar', x=grafico.data[:d + 1], y=grafico.vacinadas_semana[:d + 1]),
-                         dict(type='bar', x=grafico.data[:d + 1], y=grafico.internacoes_semana[:d + 1])],
-                   traces=[0, 1, 2, 3, 4, 5, 6],
-                   ) for d in range(0, d)]
-
-    fig.frames = frames
+                         text=_formata_variacoes(grafico['variacao_internacoes'])))
 
-    botoes = [dict(label='Animar', method='animate',
-                   args=[None, dict(frame=dict(duration=400, redraw=True), fromcurrent=True, mode='immediate')])]
+    botoes = _adiciona_animacao(fig, duracao=400)
 
     fig.update_yaxes(title_text='Número de casos ou óbitos', secondary_y=False)
     fig.update_yaxes(title_text='Taxa média de isolamento há 2 semanas (%)', secondary_y=True)
@@ -2184,8 +3033,7 @@ def gera_evolucao_cidade(evolucao_cidade):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/evolucao-cidade.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/evolucao-cidade.html')
 
     # versão mobile
     fig.update_traces(selector=dict(type='scatter'), mode='lines')
@@ -2201,8 +3049,7 @@ def gera_evolucao_cidade(evolucao_cidade):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/evolucao-cidade-mobile.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/evolucao-cidade-mobile.html')
 
 
 def gera_leitos_estaduais(leitos):
@@ -2237,8 +3084,9 @@ def gera_leitos_estaduais(leitos):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/leitos-estaduais.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    _decima_series(fig, 'docs/graficos/leitos-estaduais.html')
+
+    escreve_grafico(fig, 'docs/graficos/leitos-estaduais.html')
 
     # versão mobile
     fig.update_traces(mode='lines')
@@ -2254,8 +3102,7 @@ def gera_leitos_estaduais(leitos):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/leitos-estaduais-mobile.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/leitos-estaduais-mobile.html')
 
 
 def gera_drs(internacoes):
@@ -2270,78 +3117,58 @@ def gera_drs(internacoes):
     titulo_a = 'Departamento Regional de Saúde - '
     titulo_b = '<br><i>Fonte: <a href = "https://www.seade.gov.br/coronavirus/">Governo do Estado de São Paulo</a></i>'
 
-    for d in l_drs:
-        grafico = internacoes[internacoes.drs == d]
-        mostrar = d == 'Estado de São Paulo'
-
-        fig.add_trace(go.Scatter(x=grafico['dia'], y=grafico['pacientes_uti_mm7d'],
-                                 name='pacientes internados em leitos<br>de UTI para Covid-19 - média<br>móvel dos últimos 7 dias',
-                                 mode='lines+markers', hovertemplate='%{y:.0f}', customdata=[d], visible=mostrar))
-
-        fig.add_trace(go.Scatter(x=grafico['dia'], y=grafico['pacientes_uti_ultimo_dia'],
-                                 name='pacientes internados em leitos<br>de UTI para Covid-19<br>no dia anterior',
-                                 mode='lines+markers', hovertemplate='%{y:.0f}', customdata=[d], visible=mostrar))
-
-        fig.add_trace(go.Scatter(x=grafico['dia'], y=grafico['total_covid_uti_mm7d'],
-                                 name='leitos Covid-19 - média<br>móvel dos últimos 7 dias',
-                                 mode='lines+markers', hovertemplate='%{y:.0f}', customdata=[d], visible=mostrar))
-
-        fig.add_trace(go.Scatter(x=grafico['dia'], y=grafico['total_covid_uti_ultimo_dia'],
-                                 name='leitos Covid-19<br>no dia anterior',
-                                 mode='lines+markers', hovertemplate='%{y:.0f}', customdata=[d], visible=mostrar))
-
-        fig.add_trace(go.Scatter(x=grafico['dia'], y=grafico['ocupacao_leitos'],
-                                 name='ocupação de leitos de<br>UTI para Covid-19 - média<br>móvel dos últimos 7 dias',
-                                 mode='lines+markers', hovertemplate='%{y:.2f}%', customdata=[d], visible=mostrar),
-                      secondary_y=True)
-
-        fig.add_trace(go.Scatter(x=grafico['dia'], y=grafico['ocupacao_leitos_ultimo_dia'],
-                                 name='ocupação de leitos de<br>UTI para Covid-19<br>no dia anterior',
-                                 mode='lines+markers', hovertemplate='%{y:.2f}%', customdata=[d], visible=mostrar),
-                      secondary_y=True)
-
-        fig.add_trace(go.Scatter(x=grafico['dia'], y=grafico['leitos_pc'], name='leitos Covid-19 para<br>cada 100 mil habitantes',
-                                 mode='lines+markers', customdata=[d], visible=mostrar))
-
-        fig.add_trace(go.Scatter(x=grafico['dia'], y=grafico['internacoes_7d'],
-                                 name='internações (UTI e enfermaria,<br>confirmados e suspeitos)<br>média móvel dos últimos 7 dias',
-                                 mode='lines+markers', customdata=[d], visible=mostrar))
-
-        fig.add_trace(go.Scatter(x=grafico['dia'], y=grafico['internacoes_7d_l'],
-                                 name='internações (UTI e enfermaria,<br>confirmados e suspeitos)<br>média móvel dos 7 dias<br>anteriores',
-                                 mode='lines+markers', customdata=[d], visible=mostrar))
-
-        fig.add_trace(go.Scatter(x=grafico['dia'], y=grafico['internacoes_7v7'],
-                                 name='variação do número<br>de internações 7 dias',
-                                 mode='lines+markers', hovertemplate='%{y:.1f}%', customdata=[d], visible=mostrar),
-                      secondary_y=True)
-
-        fig.add_trace(go.Scatter(x=grafico['dia'], y=grafico['internacoes_ultimo_dia'],
-                                 name='internações (UTI e enfermaria,<br>confirmados e suspeitos)<br>no último dia',
-                                 mode='lines+markers', customdata=[d], visible=mostrar))
-
-        fig.add_trace(go.Scatter(x=grafico['dia'], y=grafico['pacientes_enf_mm7d'],
-                                 name='pacientes enfermaria - <br>média móvel dos últimos 7 dias',
-                                 mode='lines+markers', customdata=[d], visible=mostrar))
-
-        fig.add_trace(go.Scatter(x=grafico['dia'], y=grafico['total_covid_enf_mm7d'],
-                                 name='leitos enfermaria - <br>média móvel dos últimos 7 dias',
-                                 mode='lines+markers', customdata=[d], visible=mostrar))
-
-        fig.add_trace(go.Scatter(x=grafico['dia'], y=grafico['pacientes_enf_ultimo_dia'],
-                                 name='pacientes em enfermaria<br>no último dia',
-                                 mode='lines+markers', customdata=[d], visible=mostrar))
-
-        fig.add_trace(go.Scatter(x=grafico['dia'], y=grafico['total_covid_enf_ultimo_dia'],
-                                 name='leitos de enfermaria<br>no último dia',
-                                 mode='lines+markers', customdata=[d], visible=mostrar))
+    # séries de cada DRS: (coluna, nome, hovertemplate, eixo secundário)
+    series = [('pacientes_uti_mm7d', 'pacientes internados em leitos<br>de UTI para Covid-19 - média<br>móvel dos últimos 7 dias', '%{y:.0f}', False),
+              ('pacientes_uti_ultimo_dia', 'pacientes internados em leitos<br>de UTI para Covid-19<br>no dia anterior', '%{y:.0f}', False),
+              ('total_covid_uti_mm7d', 'leitos Covid-19 - média<br>móvel dos últimos 7 dias', '%{y:.0f}', False),
+              ('total_covid_uti_ultimo_dia', 'leitos Covid-19<br>no dia anterior', '%{y:.0f}', False),
+              ('ocupacao_leitos', 'ocupação de leitos de<br>UTI para Covid-19 - média<br>móvel dos últimos 7 dias', '%{y:.2f}%', True),
+              ('ocupacao_leitos_ultimo_dia', 'ocupação de leitos de<br>UTI para Covid-19<br>no dia anterior', '%{y:.2f}%', True),
+              ('leitos_pc', 'leitos Covid-19 para<br>cada 100 mil habitantes', None, False),
+              ('internacoes_7d', 'internações (UTI e enfermaria,<br>confirmados e suspeitos)<br>média móvel dos últimos 7 dias', None, False),
+              ('internacoes_7d_l', 'internações (UTI e enfermaria,<br>confirmados e suspeitos)<br>média móvel dos 7 dias<br>anteriores', None, False),
+              ('internacoes_7v7', 'variação do número<br>de internações 7 dias', '%{y:.1f}%', True),
+              ('internacoes_ultimo_dia', 'internações (UTI e enfermaria,<br>confirmados e suspeitos)<br>no último dia', None, False),
+              ('pacientes_enf_mm7d', 'pacientes enfermaria - <br>média móvel dos últimos 7 dias', None, False),
+              ('total_covid_enf_mm7d', 'leitos enfermaria - <br>média móvel dos últimos 7 dias', None, False),
+              ('pacientes_enf_ultimo_dia', 'pacientes em enfermaria<br>no último dia', None, False),
+              ('total_covid_enf_ultimo_dia', 'leitos de enfermaria<br>no último dia', None, False)]
+
+    grupos = internacoes.groupby('drs', sort=False)
+
+    def adiciona_traces(d, mostrar, customdata):
+        grafico = grupos.get_group(d)
+
+        for coluna, nome, hovertemplate, secundario in series:
+            fig.add_trace(go.Scatter(x=grafico['dia'], y=grafico[coluna], name=nome, mode='lines+markers',
+                                     hovertemplate=hovertemplate, customdata=customdata, visible=mostrar),
+                          secondary_y=secundario or None)  # None: sem atribuir os eixos do trace
+
+    if graficos_json:
+        # no modo JSON o gráfico traz apenas o Estado; os dados de cada DRS são gravados numa única passagem
+        # em drs/<drs>.json e carregados nos mesmos traces quando escolhidos no menu (ver grafico.js)
+        adiciona_traces('Estado de São Paulo', True, None)
+
+        for d, grafico in grupos:
+            escreve_dados_grafico('docs/graficos/drs/' + _nome_arquivo(d) + '.json',
+                                  [{'x': grafico['dia'], 'y': _arredonda_exibidos(grafico[coluna], hovertemplate)}
+                                   for coluna, _, hovertemplate, _ in series])
+
+        def cria_lista_opcoes(drs):
+            return dict(label=drs,
+                        method='skip',
+                        args=[{'arquivo': 'drs/' + _nome_arquivo(drs) + '.json', 'traces': list(range(len(series)))},
+                              {'title.text': titulo_a + drs + titulo_b}])
+    else:
+        for d in l_drs:
+            adiciona_traces(d, d == 'Estado de São Paulo', [d])
 
-    def cria_lista_opcoes(drs):
-        return dict(label=drs,
-                    method='update',
-                    args=[{'visible': [True if drs in trace['customdata'] else False for trace in fig._data]},
-                          {'title.text': titulo_a + drs + titulo_b},
-                          {'showlegend': True}])
+        def cria_lista_opcoes(drs):
+            return dict(label=drs,
+                        method='update',
+                        args=[{'visible': [True if drs in trace['customdata'] else False for trace in fig._data]},
+                              {'title.text': titulo_a + drs + titulo_b},
+                              {'showlegend': True}])
 
     fig.update_layout(
         font=dict(family='Roboto'),
@@ -2363,7 +3190,7 @@ def gera_drs(internacoes):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/drs.html', include_plotlyjs='directory', auto_open=False)
+    escreve_grafico(fig, 'docs/graficos/drs.html')
 
     # versão mobile
     fig.update_traces(mode='lines+text')
@@ -2379,7 +3206,7 @@ def gera_drs(internacoes):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/drs-mobile.html', include_plotlyjs='directory', auto_open=False)
+    escreve_grafico(fig, 'docs/graficos/drs-mobile.html')
 
 
 def gera_leitos_municipais(leitos):
@@ -2408,22 +3235,7 @@ def gera_leitos_municipais(leitos):
     fig.add_trace(go.Scatter(x=leitos['dia'], y=leitos['suspeitos_publico'], visible='legendonly',
                              mode='lines+markers', name='pacientes atendidos com<br>suspeita de Covid-19'))
 
-    d = leitos.dia.size
-
-    frames = [dict(data=[dict(type='scatter', x=leitos.dia[:d + 1], y=leitos.ocupacao_uti_covid_publico[:d + 1]),
-                         dict(type='scatter', x=leitos.dia[:d + 1], y=leitos.uti_covid_publico[:d + 1]),
-                         dict(type='scatter', x=leitos.dia[:d + 1], y=leitos.internados_uti_publico[:d + 1]),
-                         dict(type='scatter', x=leitos.dia[:d + 1], y=leitos.ventilacao_publico[:d + 1]),
-                         dict(type='scatter', x=leitos.dia[:d + 1], y=leitos.internados_publico[:d + 1]),
-                         dict(type='scatter', x=leitos.dia[:d + 1], y=leitos.respiratorio_publico[:d + 1]),
-                         dict(type='scatter', x=leitos.dia[:d + 1], y=leitos.suspeitos_publico[:d + 1])],
-                   traces=[0, 1, 2, 3, 4, 5, 6],
-                   ) for d in range(0, d)]
-
-    fig.frames = frames
-
-    botoes = [dict(label='Animar', method='animate',
-                   args=[None, dict(frame=dict(duration=200, redraw=True), fromcurrent=True, mode='immediate')])]
+    botoes = _adiciona_animacao(fig, duracao=200)
 
     fig.update_layout(
         font=dict(family='Roboto'),
@@ -2448,8 +3260,7 @@ def gera_leitos_municipais(leitos):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/leitos-municipais.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/leitos-municipais.html')
 
     # versão mobile
     fig.update_traces(mode='lines')
@@ -2465,8 +3276,7 @@ def gera_leitos_municipais(leitos):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/leitos-municipais-mobile.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/leitos-municipais-mobile.html')
 
 
 def gera_leitos_municipais_privados(leitos):
@@ -2495,22 +3305,7 @@ def gera_leitos_municipais_privados(leitos):
     fig.add_trace(go.Scatter(x=leitos['dia'], y=leitos['suspeitos_privado'], visible='legendonly',
                              mode='lines+markers', name='pacientes atendidos com<br>suspeita de Covid-19'))
 
-    d = leitos.dia.size
-
-    frames = [dict(data=[dict(type='scatter', x=leitos.dia[:d + 1], y=leitos.ocupacao_uti_covid_privado[:d + 1]),
-                         dict(type='scatter', x=leitos.dia[:d + 1], y=leitos.uti_covid_privado[:d + 1]),
-                         dict(type='scatter', x=leitos.dia[:d + 1], y=leitos.internados_uti_privado[:d + 1]),
-                         dict(type='scatter', x=leitos.dia[:d + 1], y=leitos.ventilacao_privado[:d + 1]),
-                         dict(type='scatter', x=leitos.dia[:d + 1], y=leitos.internados_privado[:d + 1]),
-                         dict(type='scatter', x=leitos.dia[:d + 1], y=leitos.respiratorio_privado[:d + 1]),
-                         dict(type='scatter', x=leitos.dia[:d + 1], y=leitos.suspeitos_privado[:d + 1])],
-                   traces=[0, 1, 2, 3, 4, 5, 6],
-                   ) for d in range(0, d)]
-
-    fig.frames = frames
-
-    botoes = [dict(label='Animar', method='animate',
-                   args=[None, dict(frame=dict(duration=200, redraw=True), fromcurrent=True, mode='immediate')])]
+    botoes = _adiciona_animacao(fig, duracao=200)
 
     fig.update_layout(
         font=dict(family='Roboto'),
@@ -2535,8 +3330,7 @@ def gera_leitos_municipais_privados(leitos):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/leitos-municipais-privados.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/leitos-municipais-privados.html')
 
     # versão mobile
     fig.update_traces(mode='lines')
@@ -2552,8 +3346,7 @@ def gera_leitos_municipais_privados(leitos):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/leitos-municipais-privados-mobile.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/leitos-municipais-privados-mobile.html')
 
 
 def gera_leitos_municipais_total(leitos):
@@ -2582,22 +3375,7 @@ def gera_leitos_municipais_total(leitos):
     fig.add_trace(go.Scatter(x=leitos['dia'], y=leitos['suspeitos_total'], visible='legendonly',
                              mode='lines+markers', name='pacientes atendidos com<br>suspeita de Covid-19'))
 
-    d = leitos.dia.size
-
-    frames = [dict(data=[dict(type='scatter', x=leitos.dia[:d + 1], y=leitos.ocupacao_uti_covid_total[:d + 1]),
-                         dict(type='scatter', x=leitos.dia[:d + 1], y=leitos.uti_covid_total[:d + 1]),
-                         dict(type='scatter', x=leitos.dia[:d + 1], y=leitos.internados_uti_total[:d + 1]),
-                         dict(type='scatter', x=leitos.dia[:d + 1], y=leitos.ventilacao_total[:d + 1]),
-                         dict(type='scatter', x=leitos.dia[:d + 1], y=leitos.internados_total[:d + 1]),
-                         dict(type='scatter', x=leitos.dia[:d + 1], y=leitos.respiratorio_total[:d + 1]),
-                         dict(type='scatter', x=leitos.dia[:d + 1], y=leitos.suspeitos_total[:d + 1])],
-                   traces=[0, 1, 2, 3, 4, 5, 6],
-                   ) for d in range(0, d)]
-
-    fig.frames = frames
-
-    botoes = [dict(label='Animar', method='animate',
-                   args=[None, dict(frame=dict(duration=200, redraw=True), fromcurrent=True, mode='immediate')])]
+    botoes = _adiciona_animacao(fig, duracao=200)
 
     fig.update_layout(
         font=dict(family='Roboto'),
@@ -2622,8 +3400,7 @@ def gera_leitos_municipais_total(leitos):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/leitos-municipais-total.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/leitos-municipais-total.html')
 
     # versão mobile
     fig.update_traces(mode='lines')
@@ -2639,8 +3416,7 @@ def gera_leitos_municipais_total(leitos):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/leitos-municipais-total-mobile.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/leitos-municipais-total-mobile.html')
 
 
 def gera_hospitais_campanha(hospitais_campanha):
@@ -2676,23 +3452,7 @@ def gera_hospitais_campanha(hospitais_campanha):
                                  name='pacientes em processo de<br>transferência para internação<br>no HMCamp',
                                  visible='legendonly'))
 
-        d = grafico.dia.size
-
-        frames = [dict(data=[dict(type='scatter', x=grafico.dia[:d + 1], y=grafico.comum[:d + 1]),
-                             dict(type='scatter', x=grafico.dia[:d + 1], y=grafico.ocupação_comum[:d + 1]),
-                             dict(type='scatter', x=grafico.dia[:d + 1], y=grafico.uti[:d + 1]),
-                             dict(type='scatter', x=grafico.dia[:d + 1], y=grafico.ocupação_uti[:d + 1]),
-                             dict(type='scatter', x=grafico.dia[:d + 1], y=grafico.altas[:d + 1]),
-                             dict(type='scatter', x=grafico.dia[:d + 1], y=grafico.óbitos[:d + 1]),
-                             dict(type='scatter', x=grafico.dia[:d + 1], y=grafico.transferidos[:d + 1]),
-                             dict(type='scatter', x=grafico.dia[:d + 1], y=grafico.chegando[:d + 1])],
-                       traces=[0, 1, 2, 3, 4, 5, 6, 7],
-                       ) for d in range(0, d)]
-
-        fig.frames = frames
-
-        botoes = [dict(label='Animar', method='animate',
-                       args=[None, dict(frame=dict(duration=200, redraw=True), fromcurrent=True, mode='immediate')])]
+        botoes = _adiciona_animacao(fig, duracao=200)
 
         fig.update_layout(
             font=dict(family='Roboto'),
@@ -2714,8 +3474,7 @@ def gera_hospitais_campanha(hospitais_campanha):
 
         # fig.show()
 
-        pio.write_html(fig, file='docs/graficos/' + h.lower() + '.html',
-                       include_plotlyjs='directory', auto_open=False, auto_play=False)
+        escreve_grafico(fig, 'docs/graficos/' + h.lower() + '.html')
 
         # versão mobile
         fig.update_traces(mode='lines')
@@ -2731,8 +3490,7 @@ def gera_hospitais_campanha(hospitais_campanha):
 
         # fig.show()
 
-        pio.write_html(fig, file='docs/graficos/' + h.lower() + '-mobile.html',
-                       include_plotlyjs='directory', auto_open=False, auto_play=False)
+        escreve_grafico(fig, 'docs/graficos/' + h.lower() + '-mobile.html')
 
 
 def gera_evolucao_vacinacao_estado(dados_vacinacao):
@@ -2807,8 +3565,7 @@ def gera_evolucao_vacinacao_estado(dados_vacinacao):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/vacinacao-estado.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/vacinacao-estado.html')
 
     # versão mobile
     fig.update_traces(selector=dict(type='scatter'), mode='lines')
@@ -2824,8 +3581,7 @@ def gera_evolucao_vacinacao_estado(dados_vacinacao):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/vacinacao-estado-mobile.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/vacinacao-estado-mobile.html')
 
 
 def gera_evolucao_vacinacao_cidade(dados_vacinacao):
@@ -2900,8 +3656,7 @@ def gera_evolucao_vacinacao_cidade(dados_vacinacao):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/vacinacao-cidade.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/vacinacao-cidade.html')
 
     # versão mobile
     fig.update_traces(selector=dict(type='scatter'), mode='lines')
@@ -2917,8 +3672,7 @@ def gera_evolucao_vacinacao_cidade(dados_vacinacao):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/vacinacao-cidade-mobile.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/vacinacao-cidade-mobile.html')
 
 
 def gera_populacao_vacinada(dados):
@@ -3004,8 +3758,7 @@ def gera_populacao_vacinada(dados):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/populacao-vacinada.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/populacao-vacinada.html')
 
     # versão mobile
     fig.update_layout(
@@ -3024,8 +3777,7 @@ def gera_populacao_vacinada(dados):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/populacao-vacinada-mobile.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/populacao-vacinada-mobile.html')
 
 
 def gera_tipo_doses(dados):
@@ -3068,8 +3820,7 @@ def gera_tipo_doses(dados):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/vacinas-tipo.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/vacinas-tipo.html')
 
     # versão mobile
     fig.update_layout(
@@ -3083,8 +3834,7 @@ def gera_tipo_doses(dados):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/vacinas-tipo-mobile.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/vacinas-tipo-mobile.html')
 
 
 def gera_doses_aplicadas(dados):
@@ -3123,8 +3873,7 @@ def gera_doses_aplicadas(dados):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/vacinas-aplicadas.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/vacinas-aplicadas.html')
 
     # versão mobile
     fig.update_layout(
@@ -3138,13 +3887,12 @@ def gera_doses_aplicadas(dados):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/vacinas-aplicadas-mobile.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/vacinas-aplicadas-mobile.html')
 
 
 def gera_tabela_vacinacao(dados):
-    data = datetime.strftime(dados.data.max(), format='%d/%m/%Y')
-    dados_tab = dados.loc[dados.data == dados.data.max()].copy()
+    data = datetime.strftime(dados.data.iat[-1], format='%d/%m/%Y')
+    dados_tab = linhas_data(dados, dados.data.iat[-1]).copy()
     dados_tab.columns = ['Data', 'Município', '1ª dose', '2ª dose', '3ª dose', '4ª dose', '5ª dose', '6ª dose',
                          'Dose única', 'Aplicadas no dia', 'Doses aplicadas', 'Doses recebidas', 'Aplicadas (%)',
                          '1ª dose (dia)', '1ª dose (%)', '2ª dose (dia)', '2ª dose (%)', '3ª dose (dia)',
@@ -3158,86 +3906,31 @@ def gera_tabela_vacinacao(dados):
     dados_tab.sort_values(by='3ª dose (%)', ascending=False, inplace=True)
 
     dados_tab['Município'] = dados_tab['Município'].apply(lambda m: formata_municipio(m))
-    dados_tab['1ª dose'] = dados_tab['1ª dose'].apply(lambda x: f'{x:8,.0f}'.replace(',', '.'))
-    dados_tab['1ª dose (%)'] = dados_tab['1ª dose (%)'].apply(lambda x: f'{x:8.2f}%'.replace('.', ','))
-    dados_tab['2ª dose'] = dados_tab['2ª dose'].apply(lambda x: f'{x:8,.0f}'.replace(',', '.'))
-    dados_tab['2ª dose (%)'] = dados_tab['2ª dose (%)'].apply(lambda x: f'{x:8.2f}%'.replace('.', ','))
-    dados_tab['3ª dose'] = dados_tab['3ª dose'].apply(lambda x: f'{x:8,.0f}'.replace(',', '.'))
-    dados_tab['3ª dose (%)'] = dados_tab['3ª dose (%)'].apply(lambda x: f'{x:8.2f}%'.replace('.', ','))
-    dados_tab['4ª dose'] = dados_tab['4ª dose'].apply(lambda x: f'{x:8,.0f}'.replace(',', '.'))
-    dados_tab['4ª dose (%)'] = dados_tab['4ª dose (%)'].apply(lambda x: f'{x:8.2f}%'.replace('.', ','))
-    dados_tab['5ª dose'] = dados_tab['5ª dose'].apply(lambda x: f'{x:8,.0f}'.replace(',', '.'))
-    dados_tab['5ª dose (%)'] = dados_tab['5ª dose (%)'].apply(lambda x: f'{x:8.2f}%'.replace('.', ','))
-    dados_tab['6ª dose'] = dados_tab['6ª dose'].apply(lambda x: f'{x:8,.0f}'.replace(',', '.'))
-    dados_tab['6ª dose (%)'] = dados_tab['6ª dose (%)'].apply(lambda x: f'{x:8.2f}%'.replace('.', ','))
-    dados_tab['Dose única'] = dados_tab['Dose única'].apply(lambda x: f'{x:8,.0f}'.replace(',', '.'))
-    dados_tab['Dose única (%)'] = dados_tab['Dose única (%)'].apply(lambda x: f'{x:8.2f}%'.replace('.', ','))
-    dados_tab['Doses aplicadas'] = dados_tab['Doses aplicadas'].apply(lambda x: f'{x:8,.0f}'.replace(',', '.'))
-    dados_tab['1ª dose (dia)'] = dados_tab['1ª dose (dia)'].apply(lambda x: f'{x:8,.0f}'.replace(',', '.'))
-    dados_tab['2ª dose (dia)'] = dados_tab['2ª dose (dia)'].apply(lambda x: f'{x:8,.0f}'.replace(',', '.'))
-    dados_tab['3ª dose (dia)'] = dados_tab['3ª dose (dia)'].apply(lambda x: f'{x:8,.0f}'.replace(',', '.'))
-    dados_tab['4ª dose (dia)'] = dados_tab['4ª dose (dia)'].apply(lambda x: f'{x:8,.0f}'.replace(',', '.'))
-    dados_tab['5ª dose (dia)'] = dados_tab['5ª dose (dia)'].apply(lambda x: f'{x:8,.0f}'.replace(',', '.'))
-    dados_tab['6ª dose (dia)'] = dados_tab['6ª dose (dia)'].apply(lambda x: f'{x:8,.0f}'.replace(',', '.'))
-    dados_tab['Dose única (dia)'] = dados_tab['Dose única (dia)'].apply(lambda x: f'{x:8,.0f}'.replace(',', '.'))
-    dados_tab['Doses recebidas'] = dados_tab['Doses recebidas'].apply(lambda x: f'{x:8,.0f}'.replace(',', '.'))
-    dados_tab['Aplicadas (%)'] = dados_tab['Aplicadas (%)'].apply(lambda x: f'{x:8.2f}%'.replace('.', ','))
-    dados_tab['População'] = dados_tab['População'].apply(lambda x: f'{x:8,.0f}'.replace(',', '.'))
-
-    html_inicial = '''<!DOCTYPE html>
-    <html lang="pt-br"> 
-    <head> 
-      <meta charset="utf-8"/> 
-      <meta name="viewport" content="width=device-width, initial-scale=1"/> 
-      <meta name="theme-color" content="#00AABB"/> 
-      <meta name="description" content="Acompanhe os casos de Covid-19 na cidade e no estado de São Paulo"/> 
-      <meta name="author" content="Davi Silva Rodrigues"/> 
-      <title>Covid-19 em São Paulo</title> 
-      <link rel="stylesheet" href="https://fonts.googleapis.com/css?family=Roboto:400,700&display=swap"/> 
-      <link rel="stylesheet" href="https://cdn.datatables.net/1.10.25/css/jquery.dataTables.min.css"/> 
-    </head> 
-    <style>
-      body {font-family: "Roboto", sans-serif;} 
-      @media only screen and (max-width: 478px) {body {font-size: 3vw;}} 
-      @media only screen and (min-width: 479px) {body {font-size: 2.25vw;}} 
-      @media only screen and (min-width: 768px) {body {font-size: 1vw;}} 
-    </style> 
-    <body>Dados de ''' + data
-
-    html_tabela = dados_tab.to_html(classes='display" id="tabela', index=False,
-                                    columns=['Município', '1ª dose', '1ª dose (%)', '2ª dose', '2ª dose (%)',
-                                             '3ª dose', '3ª dose (%)', '4ª dose', '4ª dose (%)', '5ª dose',
-                                             '5ª dose (%)', '6ª dose', '6ª dose (%)', 'Dose única', 'Dose única (%)',
-                                             'Doses aplicadas', '1ª dose (dia)', '2ª dose (dia)', '3ª dose (dia)',
-                                             '4ª dose (dia)', '5ª dose (dia)', '6ª dose (dia)', 'Dose única (dia)',
-                                             'Doses recebidas', 'Aplicadas (%)', 'População'])
-
-    html_final = '''<script src="https://code.jquery.com/jquery-3.5.1.js"></script> 
-    <script src="https://cdn.datatables.net/1.10.25/js/jquery.dataTables.min.js"></script> 
-    <script> 
-        $(document).ready(function() { 
-            $("#tabela").DataTable({ 
-                  scrollY:        "490px", 
-                  scrollCollapse: true, 
-                  paging:         false, 
-                  order:          [[ 6, "desc" ]], 
-                  language:       {decimal: ",",thousands: "."}, 
-                  columnDefs:     [{targets: "_all",className: "dt-right"}] 
-            });
-        }); 
-    </script>
-    </body> 
-    </html>'''
-
-    with open('docs/graficos/tabela-vacinacao.html', 'w+', encoding='utf-8') as fo:
-        fo.write(html_inicial + html_tabela + html_final)
-
-    html_tabela = dados_tab.to_html(classes='display" id="tabela', index=False, columns=['Município', '3ª dose (%)'])
-    html_final = html_final.replace('scrollY:        "490px"', 'scrollY:        "530px"')
-    html_final = html_final.replace('order:          [[ 6, "desc" ]]', 'order:          [[ 1, "desc" ]]')
-
-    with open('docs/graficos/tabela-vacinacao-mobile.html', 'w+', encoding='utf-8') as fo:
-        fo.write(html_inicial + html_tabela + html_final)
+
+    colunas_inteiras = ['1ª dose', '2ª dose', '3ª dose', '4ª dose', '5ª dose', '6ª dose', 'Dose única',
+                        'Doses aplicadas', '1ª dose (dia)', '2ª dose (dia)', '3ª dose (dia)', '4ª dose (dia)',
+                        '5ª dose (dia)', '6ª dose (dia)', 'Dose única (dia)', 'Doses recebidas', 'População']
+    colunas_percentuais = ['1ª dose (%)', '2ª dose (%)', '3ª dose (%)', '4ª dose (%)', '5ª dose (%)', '6ª dose (%)',
+                           'Dose única (%)', 'Aplicadas (%)']
+
+    # valores numéricos para a ordenação das colunas formatadas
+    chaves = dados_tab[colunas_inteiras + colunas_percentuais].copy()
+
+    for coluna in colunas_inteiras:
+        dados_tab[coluna] = _formata_inteiros(dados_tab[coluna])
+
+    for coluna in colunas_percentuais:
+        dados_tab[coluna] = _formata_decimais(dados_tab[coluna], 2, sufixo='%')
+
+    colunas = ['Município', '1ª dose', '1ª dose (%)', '2ª dose', '2ª dose (%)', '3ª dose', '3ª dose (%)', '4ª dose',
+               '4ª dose (%)', '5ª dose', '5ª dose (%)', '6ª dose', '6ª dose (%)', 'Dose única', 'Dose única (%)',
+               'Doses aplicadas', '1ª dose (dia)', '2ª dose (dia)', '3ª dose (dia)', '4ª dose (dia)', '5ª dose (dia)',
+               '6ª dose (dia)', 'Dose única (dia)', 'Doses recebidas', 'Aplicadas (%)', 'População']
+
+    escreve_tabela(dados_tab[colunas], 'docs/graficos/tabela-vacinacao.html', ordenavel=True, chaves=chaves,
+                   legenda='Dados de ' + data, altura=490, virtual=True)
+    escreve_tabela(dados_tab[['Município', '3ª dose (%)']], 'docs/graficos/tabela-vacinacao-mobile.html',
+                   ordenavel=True, chaves=chaves, legenda='Dados de ' + data, altura=530, virtual=True)
 
 
 def gera_distribuicao_imunizantes(dados_imunizantes):
@@ -3247,8 +3940,8 @@ def gera_distribuicao_imunizantes(dados_imunizantes):
         fig.add_trace(go.Scatter(x=dados_imunizantes.loc[dados_imunizantes['vacina'] == v, 'data'].apply(lambda d: d.strftime('%d/%b/%y')),
                                  y=dados_imunizantes.loc[dados_imunizantes['vacina'] == v, 'aplicadas'],
                                  mode='lines', line=dict(width=0.5), stackgroup='one', name=v,
-                                 text=dados_imunizantes.loc[dados_imunizantes['vacina'] == v, 'aplicadas'] \
-                                                       .apply(lambda a: f'{a:,.0f}'.replace(',', '.') if a is not None else ''),
+                                 text=_formata_inteiros(dados_imunizantes.loc[dados_imunizantes['vacina'] == v, 'aplicadas'],
+                                                        nulo=''),
                                  hovertemplate='<br>Percentual: %{y:.2f}%<br>'
                                                'Doses aplicadas: %{text}<br>',
                                  groupnorm='percent'))
@@ -3275,8 +3968,7 @@ def gera_distribuicao_imunizantes(dados_imunizantes):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/imunizantes.html', include_plotlyjs='directory',
-                   auto_open=False)
+    escreve_grafico(fig, 'docs/graficos/imunizantes.html')
 
     # versão mobile
     fig.update_xaxes(nticks=10)
@@ -3290,46 +3982,219 @@ def gera_distribuicao_imunizantes(dados_imunizantes):
 
     # fig.show()
 
-    pio.write_html(fig, file='docs/graficos/imunizantes-mobile.html',
-                   include_plotlyjs='directory', auto_open=False, auto_play=False)
+    escreve_grafico(fig, 'docs/graficos/imunizantes-mobile.html')
 
 
-def atualiza_service_worker(dados_estado):
-    data_atual = dados_estado.data.iat[-1].strftime('%d/%m/%Y')
+def comprime_arquivos(arquivos):
+    # grava X.gz (e X.br, se o módulo brotli estiver instalado) com a compressão máxima ao lado de cada arquivo
+    # alterado desde a última compressão, para que sejam servidos sem compressão no momento da requisição;
+    # os tamanhos e a revisão do conteúdo comprimido ficam em docs/graficos/compressao.json. Os blocos de dados
+    # e os arquivos pequenos não são comprimidos, e um formato que não reduz o arquivo fica registrado como None
+    tamanhos = _carrega_json(_ARQUIVO_TAMANHOS, {})
 
-    with open('docs/serviceWorker.js', 'r') as file:
-        filedata = file.read()
+    for arquivo in dict.fromkeys(arquivos):
+        if not os.path.exists(arquivo):
+            continue
 
-    versao_anterior = int(filedata[16:18])
-    data_anterior = filedata[51:61]
+        chave = os.path.relpath(arquivo, 'docs/graficos')
 
-    # primeira atualização no dia
-    if filedata.count(data_atual) == 0:
-        versao_atual = 1
-        filedata = filedata.replace(data_anterior, data_atual)
-    else:
-        versao_atual = versao_anterior + 1
+        if os.path.dirname(os.path.abspath(arquivo)) == os.path.abspath(_PASTA_BLOCOS) or \
+                os.path.getsize(arquivo) < _TAMANHO_MINIMO_COMPRESSAO:
+            tamanhos.pop(chave, None)
+            _remove_comprimidos(arquivo, ['gz', 'br'])
+            continue
+
+        with open(arquivo, 'rb') as original:
+            dados = original.read()
+
+        revisao = hashlib.sha256(dados).hexdigest()[:_TAMANHO_REVISAO]
+
+        if not _compressao_desatualizada(arquivo, tamanhos.get(chave), revisao):
+            continue
+
+        tamanhos[chave] = {'original': len(dados), 'revisao': revisao}
+
+        # mtime=0 para que arquivos iguais gerem sempre o mesmo .gz e não apareçam como alterados no git
+        tamanhos[chave]['gz'] = _grava_comprimido(arquivo, 'gz', gzip.compress(dados, compresslevel=9, mtime=0),
+                                                  len(dados))
+
+        if brotli is not None:
+            tamanhos[chave]['br'] = _grava_comprimido(arquivo, 'br', brotli.compress(dados, quality=11), len(dados))
+
+    tamanhos = {chave: valor for chave, valor in sorted(tamanhos.items())
+                if os.path.exists(os.path.join('docs/graficos', chave))}
+
+    with open(_ARQUIVO_TAMANHOS, 'w', encoding='utf-8') as arquivo:
+        json.dump(tamanhos, arquivo, indent=1)
+
+
+def _compressao_desatualizada(arquivo, registro, revisao):
+    # as cópias comprimidas valem enquanto o original tiver o conteúdo da última compressão; as datas de
+    # modificação não servem para isso, já que um checkout novo as define pela ordem em que grava os arquivos
+    formatos = ['gz'] + (['br'] if brotli is not None else [])
+
+    return registro is None or registro.get('revisao') != revisao or \
+        any(formato not in registro or (registro[formato] is not None and not os.path.exists(f'{arquivo}.{formato}'))
+            for formato in formatos)
+
+
+def _remove_comprimidos(arquivo, formatos):
+    for formato in formatos:
+        if os.path.exists(f'{arquivo}.{formato}'):
+            os.remove(f'{arquivo}.{formato}')
+
+
+def _grava_comprimido(arquivo, formato, dados, tamanho_original):
+    # a cópia só vale se for menor que o original; senão, a anterior é removida e o tamanho fica None
+    if len(dados) >= tamanho_original:
+        _remove_comprimidos(arquivo, [formato])
+        return None
+
+    with open(f'{arquivo}.{formato}', 'wb') as comprimido:
+        comprimido.write(dados)
+
+    return len(dados)
+
+
+def _carrega_json(arquivo, padrao):
+    try:
+        with open(arquivo, 'r', encoding='utf-8') as entrada:
+            return json.load(entrada)
+    except (OSError, ValueError):
+        return padrao
+
+
+# arquivos do site que não são gerados pelos gráficos, mas também são servidos comprimidos
+_ARQUIVOS_ESTATICOS = ['docs/graficos/plotly.min.js', 'docs/graficos/grafico.js', 'docs/graficos/tabela.css',
+                       'docs/graficos/tabela.js']
+
+# tamanhos dos arquivos comprimidos por comprime_arquivos
+_ARQUIVO_TAMANHOS = 'docs/graficos/compressao.json'
+
+# arquivos menores que isso (em bytes) não são comprimidos: o ganho não compensa a cópia e o registro
+_TAMANHO_MINIMO_COMPRESSAO = 1024
+
+
+def atualiza_service_worker(arquivos=None):
+    # os manifestos de docs/serviceWorker.js são refeitos a partir dos arquivos gravados, cada um com um resumo
+    # do conteúdo (revisão): PRECACHE, guardado na instalação, traz só o essencial da página inicial (ver
+    # _arquivo_essencial) e CACHE_NO_USO o restante, guardado na primeira visita e revalidado em segundo plano;
+    # os navegadores baixam de novo apenas os arquivos cuja revisão mudou. Sem a lista dos gráficos (arquivos
+    # vazio ou None), os do manifesto atual são mantidos e só as revisões são refeitas
+    with open('docs/serviceWorker.js', 'r', encoding='utf-8') as arquivo:
+        codigo = arquivo.read()
+
+    inicio = codigo.index(_INICIO_MANIFESTO) + len(_INICIO_MANIFESTO)
+    fim = codigo.index(_FIM_MANIFESTO, inicio)
+
+    anterior = dict(re.findall(r"\['([^']+)', '([0-9a-f]+)'\]", codigo[inicio:fim]))
+
+    if not arquivos:
+        arquivos = ['docs/' + url for url in anterior]
+
+    arquivos = [arquivo for arquivo in dict.fromkeys(_ARQUIVOS_SITE + _ARQUIVOS_ESTATICOS + arquivos)
+                if os.path.exists(arquivo) and not _carregado_sob_demanda(arquivo)]
+
+    manifesto = {arquivo[len('docs/'):]: _revisao_arquivo(arquivo) for arquivo in sorted(arquivos)}
+    essenciais = {arquivo[len('docs/'):] for arquivo in arquivos if _arquivo_essencial(arquivo)}
+
+    alterados = sum(anterior.get(url) != revisao for url, revisao in manifesto.items())
+
+    print(f'\tPRECACHE: {len(essenciais)} arquivos, CACHE_NO_USO: {len(manifesto) - len(essenciais)} arquivos, '
+          f'{alterados} alterados')
+
+    def lista(nome, urls):
+        linhas = ',\n'.join(f"\t['{url}', '{manifesto[url]}']" for url in urls)
+        return f'const {nome} = [\n{linhas}\n];\n'
+
+    codigo = codigo[:inicio] + '\n' + \
+        lista('PRECACHE', [url for url in manifesto if url in essenciais]) + '\n' + \
+        lista('CACHE_NO_USO', [url for url in manifesto if url not in essenciais]) + codigo[fim:]
 
-    print(f'\tCACHE_NAME: Covid19-SP-{data_atual}-{str(versao_atual).zfill(2)}')
+    with open('docs/serviceWorker.js', 'w', encoding='utf-8') as arquivo:
+        arquivo.write(codigo)
 
-    versao_anterior = "VERSAO = '" + str(versao_anterior).zfill(2) + "'"
-    versao_atual = "VERSAO = '" + str(versao_atual).zfill(2) + "'"
-    filedata = filedata.replace(versao_anterior, versao_atual)
 
-    with open('docs/serviceWorker.js', 'w') as file:
-        file.write(filedata)
+def _arquivo_essencial(arquivo):
+    # a estrutura do site e os resumos da página inicial, nas versões desktop e mobile
+    if not arquivo.startswith('docs/graficos/'):
+        return True
+
+    nome = os.path.splitext(os.path.basename(arquivo))[0]
+    nome = nome[:-len('-mobile')] if nome.endswith('-mobile') else nome
+
+    return nome in _GRAFICOS_ESSENCIAIS
+
+
+def _carregado_sob_demanda(arquivo):
+    # dados buscados só quando o usuário pede (ver escreve_dados_grafico), que ficam fora do pré-cache
+    if not arquivo.startswith('docs/graficos/'):
+        return False
+
+    return os.path.dirname(arquivo) != 'docs/graficos' or arquivo.endswith('-completo.json')
+
+
+def _revisao_arquivo(arquivo):
+    resumo = hashlib.sha256()
+
+    with open(arquivo, 'rb') as entrada:
+        for bloco in iter(lambda: entrada.read(1 << 20), b''):
+            resumo.update(bloco)
+
+    return resumo.hexdigest()[:_TAMANHO_REVISAO]
+
+
+# arquivos do site fora de docs/graficos guardados pelo serviceWorker para uso offline
+_ARQUIVOS_SITE = ['docs/index.html', 'docs/manifest.json', 'docs/css/style.css', 'docs/app.js', 'docs/images/bg01.png',
+                  'docs/icons/android-chrome-192x192.png', 'docs/icons/android-chrome-512x512.png',
+                  'docs/icons/apple-touch-icon.png', 'docs/icons/favicon-16x16.png', 'docs/icons/favicon-32x32.png',
+                  'docs/icons/favicon.ico']
+
+# gráficos e tabelas de docs/graficos guardados já na instalação do serviceWorker (a página inicial e os
+# arquivos de que ela depende); os demais são guardados quando usados pela primeira vez
+_GRAFICOS_ESSENCIAIS = ['resumo', 'resumo-semanal', 'resumo-vacinacao', 'tabela', 'graficos', 'navegacao']
+
+# trecho de docs/serviceWorker.js reescrito por atualiza_service_worker
+_INICIO_MANIFESTO = '// início do manifesto (gerado por covid19sp.py)'
+_FIM_MANIFESTO = '// fim do manifesto'
+
+# caracteres hexadecimais do SHA-256 usados como revisão de cada arquivo
+_TAMANHO_REVISAO = 12
 
 
 if __name__ == '__main__':
     processa_doencas = False
     vacinacao = False
+    # número de processos usados na geração dos gráficos (None: um por núcleo; 1: geração sequencial)
+    processos_graficos = None
+    # True: cada gráfico é gravado uma vez em JSON, com a versão mobile como sobreposição (ver escreve_grafico)
+    graficos_json = True
+    # True: gráficos com as mesmas entradas da execução anterior não são refeitos (ver docs/graficos/cache.json)
+    cache_graficos = True
+    # True: arquivos alterados ganham versões .gz/.br pré-comprimidas (ver comprime_arquivos)
+    comprime_graficos = True
+    # True (modo JSON): a página inicial monta os gráficos em divs, com um único Plotly, em vez de iframes
+    # (ver escreve_indice_graficos)
+    graficos_na_pagina = True
+    # False: nenhum dado é baixado e são usados apenas os arquivos de dados/ (ver _busca_csv)
+    busca_dados = True
+
+    # um gráfico com erro não impede os demais, mas o script termina com erro para que o site não seja
+    # publicado incompleto
+    falhas = []
 
     if len(sys.argv) == 1:
         data_processamento = datetime.now()
-        main()
+        falhas += main()
+    elif sys.argv[1] == '--service-worker':
+        # só as revisões do manifesto, depois de arquivos estáticos (app.js, grafico.js etc.) editados à mão
+        atualiza_service_worker()
     else:
         for i in range(int(sys.argv[1]), -1, -1):
             data_processamento = datetime.now() - timedelta(days=i)
             print(f'\nDia em processamento -> {data_processamento:%d/%m/%Y}\n')
-            main()
+            falhas += main()
+
+    if falhas:
+        sys.exit(1)
 
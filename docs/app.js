@@ -109,7 +109,7 @@ function criaLink(descricao, linkDesktop) {
 	divConteudo.insertAdjacentElement('beforeEnd', divSubTitulo);
 }
 
-function criaIFrame(linkDesktop, linkMobile, versaoMobile) {	
+function criaIFrame(linkDesktop, linkMobile, versaoMobile, divDestino) {	
 	var iframe = document.createElement('iframe');
 	iframe.src = versaoMobile ? linkMobile : linkDesktop;
 	iframe.style.display = 'block';
@@ -123,32 +123,220 @@ function criaIFrame(linkDesktop, linkMobile, versaoMobile) {
 		iframe.srcElement.style.height = altura;
 	}
 
-	var divConteudo = document.getElementById('conteudo');
+	var divConteudo = divDestino || document.getElementById('conteudo');
 	divConteudo.insertAdjacentElement('beforeEnd', iframe);
 }
+
+// Gráficos gravados em JSON que podem ser montados na própria página, {nome: {altura, altura_mobile}}
+// (ver escreve_indice_graficos em covid19sp.py); os que não estão no índice continuam em iframes.
+var indiceGraficos = fetch('graficos/graficos.json')
+	.then(function(resposta) {
+		return resposta.ok ? resposta.json() : {};
+	})
+	.catch(function() {
+		return {};
+	});
+
+var carregamentoPlotly = null;
+var observadorGraficos = null;
+
+function carregaScript(src) {
+	return new Promise(function(resolve, reject) {
+		var script = document.createElement('script');
+		script.src = src;
+		script.onload = resolve;
+		script.onerror = reject;
+		document.head.appendChild(script);
+	});
+}
+
+// O Plotly e grafico.js são carregados uma única vez, quando o primeiro gráfico aparece na tela.
+function carregaPlotly() {
+	if(!carregamentoPlotly)
+		carregamentoPlotly = carregaScript('graficos/plotly.min.js').then(function() {
+			return carregaScript('graficos/grafico.js');
+		});
+
+	return carregamentoPlotly;
+}
+
+function montaGrafico(divGrafico) {
+	carregaPlotly()
+		.then(function() {
+			carregaGrafico(divGrafico, divGrafico.getAttribute('data-grafico'), divGrafico.getAttribute('data-mobile') === 'true');
+		})
+		.catch(function(err) {
+			carregamentoPlotly = null;
+			console.log('Erro: não foi possível carregar o Plotly.', err);
+		});
+}
+
+// Cada gráfico é montado quando chega perto da área visível da página.
+function observaGrafico(divGrafico) {
+	if(!('IntersectionObserver' in window)) {
+		montaGrafico(divGrafico);
+		return;
+	}
+
+	if(!observadorGraficos)
+		observadorGraficos = new IntersectionObserver(function(entradas, observador) {
+			entradas.forEach(function(entrada) {
+				if(entrada.isIntersecting) {
+					observador.unobserve(entrada.target);
+					montaGrafico(entrada.target);
+				}
+			});
+		}, {rootMargin: '200px'});
+
+	observadorGraficos.observe(divGrafico);
+}
+
+function criaGrafico(linkDesktop, linkMobile, versaoMobile) {
+	// o lugar do gráfico é reservado já, para manter a ordem da página enquanto o índice é carregado
+	var divDestino = document.createElement('div');
+
+	var divConteudo = document.getElementById('conteudo');
+	divConteudo.insertAdjacentElement('beforeEnd', divDestino);
+
+	indiceGraficos.then(function(indice) {
+		var nome = linkDesktop.replace(/\.html$/, '');
+		var grafico = indice[nome.split('/').pop()];
+
+		if(!grafico) {
+			criaIFrame(linkDesktop, linkMobile, versaoMobile, divDestino);
+			return;
+		}
+
+		var altura = (versaoMobile ? grafico.altura_mobile : grafico.altura) || 450;
+
+		var divGrafico = document.createElement('div');
+		divGrafico.className = 'grafico';
+		divGrafico.style.width = '100%';
+		divGrafico.style.height = altura + 'px';
+		divGrafico.setAttribute('data-grafico', nome);
+		divGrafico.setAttribute('data-mobile', versaoMobile ? 'true' : 'false');
+
+		divDestino.appendChild(divGrafico);
+		observaGrafico(divGrafico);
+	});
+}
+			
+// Arquivos dos outros menus baixados antecipadamente nos momentos ociosos, um de cada vez, para que a troca de
+// menu não espere pela rede (ver escreve_navegacao em covid19sp.py): primeiro os comuns a vários menus (plotly.min.js
+// e grafico.js), fora do orçamento, e depois os do menu seguinte ao atual, na ordem dos menus e de cada menu, até
+// ORCAMENTO_PRE_CARREGAMENTO bytes transferidos por visita; arquivos maiores que o saldo são pulados.
+var ORCAMENTO_PRE_CARREGAMENTO = 2 * 1024 * 1024;
+
+var navegacao = fetch('graficos/navegacao.json')
+	.then(function(resposta) {
+		return resposta.ok ? resposta.json() : {};
+	})
+	.catch(function() {
+		return {};
+	});
+
+var preCarregados = {};
+var filaPreCarregamento = [];
+var saldoPreCarregamento = ORCAMENTO_PRE_CARREGAMENTO;
+var preCarregando = false;
+
+function quandoOcioso(funcao) {
+	if('requestIdleCallback' in window)
+		requestIdleCallback(funcao, {timeout: 10000});
+	else
+		setTimeout(funcao, 1000);
+}
+
+function preCarregaMenus(pagina) {
+	if(navigator.connection && navigator.connection.saveData)
+		return;
+
+	navegacao.then(function(dados) {
+		var menus = dados.menus || {};
+		var ordem = Object.keys(menus);
+		var versao = versaoMobile ? 'mobile' : 'desktop';
+		var inicio = ordem.indexOf(pagina);
+
+		// os arquivos do menu atual já estão sendo buscados pela própria página
+		((menus[pagina] || {})[versao] || []).forEach(function(item) {
+			preCarregados[item[0]] = true;
+		});
+
+		// os comuns não contam no orçamento
+		filaPreCarregamento = (dados.comuns || []).map(function(item) {
+			return [item[0], 0];
+		});
+
+		for(var i = 1; i < ordem.length; i++) {
+			var menu = menus[ordem[(inicio + i) % ordem.length]];
+
+			if(menu[versao])
+				filaPreCarregamento = filaPreCarregamento.concat(menu[versao]);
+		}
+
+		if(!preCarregando) {
+			preCarregando = true;
+			quandoOcioso(preCarregaProximo);
+		}
+	});
+}
+
+function preCarregaProximo() {
+	while(filaPreCarregamento.length) {
+		var item = filaPreCarregamento.shift();
+		var arquivo = item[0];
+		var tamanho = item[1];
+
+		if(preCarregados[arquivo] || tamanho > saldoPreCarregamento)
+			continue;
+
+		preCarregados[arquivo] = true;
+		saldoPreCarregamento -= tamanho;
+
+		fetch(arquivo)
+			.then(function(resposta) {
+				return resposta.blob();
+			})
+			.catch(function(err) {
+				console.log('Erro: não foi possível pré-carregar ' + arquivo + '.', err);
+			})
+			.then(function() {
+				quandoOcioso(preCarregaProximo);
+			});
+
+		return;
+	}
+
+	preCarregando = false;
+}
 			
 function montaPagina(pagina) {	
 	//limpa página
 	document.getElementById('conteudo').innerHTML = '';
+
+	if(observadorGraficos)
+		observadorGraficos.disconnect();
 	
 	paginaAtual = pagina;
+	preCarregaMenus(pagina);
 	
+	// covid19sp.py lê destes cases os menus e os gráficos de cada um (ver _menus_app)
 	switch(paginaAtual) {
 		case 'resumo':
 			criaTitulo('Campanha de vacinação');
 			
 			criaLink('Ampliar resumo da campanha de vacinação', 'graficos/resumo-vacinacao.html');
-			criaIFrame('graficos/resumo-vacinacao.html', 'graficos/resumo-vacinacao-mobile.html', versaoMobile);
+			criaGrafico('graficos/resumo-vacinacao.html', 'graficos/resumo-vacinacao-mobile.html', versaoMobile);
 			
 			criaTitulo('Semana Epidemiológica');
 			
 			criaLink('Ampliar resumo semanal', 'graficos/resumo-semanal.html');
-			criaIFrame('graficos/resumo-semanal.html', 'graficos/resumo-semanal-mobile.html', versaoMobile);
+			criaGrafico('graficos/resumo-semanal.html', 'graficos/resumo-semanal-mobile.html', versaoMobile);
 			
 			criaTitulo('Resumo diário');
 			
 			criaLink('Ampliar resumo diário', 'graficos/resumo.html');
-			criaIFrame('graficos/resumo.html', 'graficos/resumo-mobile.html', versaoMobile);
+			criaGrafico('graficos/resumo.html', 'graficos/resumo-mobile.html', versaoMobile);
 			
 			break;
 			
@@ -156,35 +344,35 @@ function montaPagina(pagina) {
 			criaTitulo('Evolução da pandemia');
 			
 			criaLink('Ampliar gráfico da evolução da pandemia no estado', 'graficos/evolucao-estado.html');
-			criaIFrame('graficos/evolucao-estado.html', 'graficos/evolucao-estado-mobile.html', versaoMobile);
+			criaGrafico('graficos/evolucao-estado.html', 'graficos/evolucao-estado-mobile.html', versaoMobile);
 			
 			criaLink('Ampliar gráfico da evolução da pandemia na cidade', 'graficos/evolucao-cidade.html');
-			criaIFrame('graficos/evolucao-cidade.html', 'graficos/evolucao-cidade-mobile.html', versaoMobile);
+			criaGrafico('graficos/evolucao-cidade.html', 'graficos/evolucao-cidade-mobile.html', versaoMobile);
 			
 			criaTitulo('Casos no Estado');
 			
 			criaLink('Ampliar gráfico de casos no estado', 'graficos/casos-estado.html');
-			criaIFrame('graficos/casos-estado.html', 'graficos/casos-estado-mobile.html', versaoMobile);
+			criaGrafico('graficos/casos-estado.html', 'graficos/casos-estado-mobile.html', versaoMobile);
 			
 			criaTitulo('Casos na Cidade');
 			
 			criaLink('Ampliar gráfico de casos na cidade', 'graficos/casos-cidade.html');
-			criaIFrame('graficos/casos-cidade.html', 'graficos/casos-cidade-mobile.html', versaoMobile);
+			criaGrafico('graficos/casos-cidade.html', 'graficos/casos-cidade-mobile.html', versaoMobile);
 			
 			criaTitulo('Doenças preexistentes nos casos');
 			
 			criaLink('Ampliar gráfico de doenças preexistentes nos casos', 'graficos/doencas-casos.html');
-			criaIFrame('graficos/doencas-casos.html', 'graficos/doencas-casos-mobile.html', versaoMobile);
+			criaGrafico('graficos/doencas-casos.html', 'graficos/doencas-casos-mobile.html', versaoMobile);
 			
 			criaTitulo('Doenças preexistentes nos óbitos');
 			
 			criaLink('Ampliar gráfico de doenças preexistentes nos óbitos', 'graficos/doencas-obitos.html');
-			criaIFrame('graficos/doencas-obitos.html', 'graficos/doencas-obitos-mobile.html', versaoMobile);
+			criaGrafico('graficos/doencas-obitos.html', 'graficos/doencas-obitos-mobile.html', versaoMobile);
 			
 			criaTitulo('Raça/cor nos casos e óbitos');
 			
 			criaLink('Ampliar gráfico de raça/cor nos casos e óbitos', 'graficos/raca-cor.html');
-			criaIFrame('graficos/raca-cor.html', 'graficos/raca-cor-mobile.html', versaoMobile);
+			criaGrafico('graficos/raca-cor.html', 'graficos/raca-cor-mobile.html', versaoMobile);
 			
 			break;
 		
@@ -192,10 +380,10 @@ function montaPagina(pagina) {
 			criaTitulo('Adesão ao Isolamento Social');
 			
 			criaLink('Ampliar gráfico do isolamento social', 'graficos/isolamento.html');
-			criaIFrame('graficos/isolamento.html', 'graficos/isolamento-mobile.html', versaoMobile);
+			criaGrafico('graficos/isolamento.html', 'graficos/isolamento-mobile.html', versaoMobile);
 			
 			criaLink('Ampliar tabela do isolamento social', 'graficos/tabela-isolamento.html');
-			criaIFrame('graficos/tabela-isolamento.html', 'graficos/tabela-isolamento-mobile.html', versaoMobile);
+			criaGrafico('graficos/tabela-isolamento.html', 'graficos/tabela-isolamento-mobile.html', versaoMobile);
 			
 			break;
 			
@@ -203,35 +391,35 @@ function montaPagina(pagina) {
 			criaTitulo('Ocupação de leitos no Estado');
 			
 			criaLink('Ampliar gráfico de ocupação de leitos no estado', 'graficos/leitos-estaduais.html');
-			criaIFrame('graficos/leitos-estaduais.html', 'graficos/leitos-estaduais-mobile.html', versaoMobile);
+			criaGrafico('graficos/leitos-estaduais.html', 'graficos/leitos-estaduais-mobile.html', versaoMobile);
 			
 			criaTitulo('Departamentos Regionais de Saúde');
 			
 			criaLink('Ampliar gráfico de leitos no DRS', 'graficos/drs.html');
-			criaIFrame('graficos/drs.html', 'graficos/drs-mobile.html', versaoMobile);
+			criaGrafico('graficos/drs.html', 'graficos/drs-mobile.html', versaoMobile);
 			
 			criaTitulo('Ocupação de leitos públicos na Cidade');
 			
 			criaLink('Ampliar gráfico da situação dos hospitais municipais', 'graficos/leitos-municipais.html');
-			criaIFrame('graficos/leitos-municipais.html', 'graficos/leitos-municipais-mobile.html', versaoMobile);
+			criaGrafico('graficos/leitos-municipais.html', 'graficos/leitos-municipais-mobile.html', versaoMobile);
 			
 			criaTitulo('Ocupação de leitos privados contratados pela Prefeitura');
 			
 			criaLink('Ampliar gráfico da situação dos leitos privados', 'graficos/leitos-municipais-privados.html');
-			criaIFrame('graficos/leitos-municipais-privados.html', 'graficos/leitos-municipais-privados-mobile.html', versaoMobile);
+			criaGrafico('graficos/leitos-municipais-privados.html', 'graficos/leitos-municipais-privados-mobile.html', versaoMobile);
 			
 			criaTitulo('Ocupação geral de leitos públicos e privados na Cidade');
 			
 			criaLink('Ampliar gráfico da situação dos leitos em geral', 'graficos/leitos-municipais-total.html');
-			criaIFrame('graficos/leitos-municipais-total.html', 'graficos/leitos-municipais-total-mobile.html', versaoMobile);
+			criaGrafico('graficos/leitos-municipais-total.html', 'graficos/leitos-municipais-total-mobile.html', versaoMobile);
 			
 			criaTitulo('Situação dos Hospitais Municipais de Campanha');
 			
 			criaLink('Ampliar gráfico do HMCamp do Pacaembu', 'graficos/pacaembu.html');
-			criaIFrame('graficos/pacaembu.html', 'graficos/pacaembu-mobile.html', versaoMobile);
+			criaGrafico('graficos/pacaembu.html', 'graficos/pacaembu-mobile.html', versaoMobile);
 			
 			criaLink('Ampliar gráfico do HMCamp do Anhembi', 'graficos/anhembi.html');
-			criaIFrame('graficos/anhembi.html', 'graficos/anhembi-mobile.html', versaoMobile);
+			criaGrafico('graficos/anhembi.html', 'graficos/anhembi-mobile.html', versaoMobile);
 			
 			break;
 			
@@ -239,22 +427,22 @@ function montaPagina(pagina) {
 			criaTitulo('Evolução da campanha de vacinação contra a Covid-19');
 			
 			criaLink('Ampliar gráfico da vacinação contra Covid-19 no estado', 'graficos/vacinacao-estado.html');
-			criaIFrame('graficos/vacinacao-estado.html', 'graficos/vacinacao-estado-mobile.html', versaoMobile);
+			criaGrafico('graficos/vacinacao-estado.html', 'graficos/vacinacao-estado-mobile.html', versaoMobile);
 			
 			criaLink('Ampliar gráfico da vacinação contra Covid-19 na cidade', 'graficos/vacinacao-cidade.html');
-			criaIFrame('graficos/vacinacao-cidade.html', 'graficos/vacinacao-cidade-mobile.html', versaoMobile);
+			criaGrafico('graficos/vacinacao-cidade.html', 'graficos/vacinacao-cidade-mobile.html', versaoMobile);
 			
 			criaLink('Ampliar gráfico da população vacinada contra Covid-19', 'graficos/populacao-vacinada.html');
-			criaIFrame('graficos/populacao-vacinada.html', 'graficos/populacao-vacinada-mobile.html', versaoMobile);
+			criaGrafico('graficos/populacao-vacinada.html', 'graficos/populacao-vacinada-mobile.html', versaoMobile);
 			
 			criaLink('Ampliar gráfico das doses de vacinas aplicadas', 'graficos/vacinas-tipo.html');
-			criaIFrame('graficos/vacinas-tipo.html', 'graficos/vacinas-tipo-mobile.html', versaoMobile);
+			criaGrafico('graficos/vacinas-tipo.html', 'graficos/vacinas-tipo-mobile.html', versaoMobile);
 			
 			criaLink('Ampliar gráfico das vacinas disponíveis x aplicadas', 'graficos/vacinas-aplicadas.html');
-			criaIFrame('graficos/vacinas-aplicadas.html', 'graficos/vacinas-aplicadas-mobile.html', versaoMobile);
+			criaGrafico('graficos/vacinas-aplicadas.html', 'graficos/vacinas-aplicadas-mobile.html', versaoMobile);
 			
 			criaLink('Ampliar gráfico dos imunizantes distribuídos', 'graficos/imunizantes.html');
-			criaIFrame('graficos/imunizantes.html', 'graficos/imunizantes-mobile.html', versaoMobile);
+			criaGrafico('graficos/imunizantes.html', 'graficos/imunizantes-mobile.html', versaoMobile);
 			
 			var descricao = '';
 			
@@ -264,7 +452,7 @@ function montaPagina(pagina) {
 				descricao = 'Ampliar tabela da vacinação nos municípios';
 			
 			criaLink(descricao, 'graficos/tabela-vacinacao.html');
-			criaIFrame('graficos/tabela-vacinacao.html', 'graficos/tabela-vacinacao-mobile.html', versaoMobile);
+			criaGrafico('graficos/tabela-vacinacao.html', 'graficos/tabela-vacinacao-mobile.html', versaoMobile);
 			
 			break;
 			
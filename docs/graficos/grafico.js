@@ -0,0 +1,280 @@
+// Monta os gráficos gravados em JSON por covid19sp.py (ver escreve_grafico): X.json traz os dados e o
+// layout da versão desktop em 'figura' e, em 'mobile', apenas o que muda na versão mobile. Os vetores de
+// dados ficam em 'vetores' (listas ou typed arrays em base64) e são referenciados por {vetor: i}.
+
+var TIPOS_VETORES = {i1: Int8Array, i2: Int16Array, i4: Int32Array, f8: Float64Array};
+
+function decodificaVetor(vetor) {
+	if(!ehObjeto(vetor) || vetor.bdata === undefined)
+		return vetor;
+
+	var binario = atob(vetor.bdata);
+	var bytes = new Uint8Array(binario.length);
+
+	for(var i = 0; i < binario.length; i++)
+		bytes[i] = binario.charCodeAt(i);
+
+	var valores = new TIPOS_VETORES[vetor.dtype](bytes.buffer);
+
+	// decimais gravados como inteiros: valor / escala, com o inteiro 'nulo' no lugar de NaN
+	if(vetor.escala === undefined && vetor.nulo === undefined)
+		return valores;
+
+	var escala = vetor.escala || 1;
+	var numeros = new Float64Array(valores.length);
+
+	for(var j = 0; j < valores.length; j++)
+		numeros[j] = valores[j] === vetor.nulo ? NaN : valores[j] / escala;
+
+	return numeros;
+}
+
+function resolveVetores(valor, vetores) {
+	if(Array.isArray(valor))
+		return valor.map(function(v) {
+			return resolveVetores(v, vetores);
+		});
+
+	if(ehObjeto(valor)) {
+		if(typeof valor.vetor === 'number' && Object.keys(valor).length === 1)
+			return vetores[valor.vetor];
+
+		for(var chave in valor)
+			valor[chave] = resolveVetores(valor[chave], vetores);
+	}
+
+	return valor;
+}
+
+function aplicaSobreposicao(base, sobreposicao) {
+	for(var chave in sobreposicao) {
+		var valor = sobreposicao[chave];
+
+		if(valor === null)
+			delete base[chave];
+		else if(ehObjeto(valor) && ehObjeto(base[chave]))
+			aplicaSobreposicao(base[chave], valor);
+		else
+			base[chave] = valor;
+	}
+
+	return base;
+}
+
+function ehObjeto(valor) {
+	return typeof valor === 'object' && valor !== null && !Array.isArray(valor) && !ArrayBuffer.isView(valor);
+}
+
+function montaFigura(especificacao, versaoMobile) {
+	var vetores = (especificacao.vetores || []).map(decodificaVetor);
+	var figura = resolveVetores(especificacao.figura, vetores);
+	var mobile = resolveVetores(especificacao.mobile, vetores);
+
+	if(versaoMobile && mobile) {
+		if(mobile.layout)
+			aplicaSobreposicao(figura.layout, mobile.layout);
+
+		if(mobile.data)
+			figura.data = mobile.data.map(function(trace, i) {
+				return aplicaSobreposicao(figura.data[i] || {}, trace);
+			});
+
+		if(mobile.frames)
+			figura.frames = mobile.frames;
+	}
+
+	var animacao = retiraMeta(figura.layout, 'animacao');
+
+	if(animacao)
+		figura.frames = montaQuadros(figura.data, animacao.traces);
+
+	figura.detalhe = retiraMeta(figura.layout, 'detalhe');
+
+	return figura;
+}
+
+// Instruções gravadas por covid19sp.py em layout.meta, que não são repassadas ao Plotly.
+function retiraMeta(layout, chave) {
+	if(!layout.meta || !layout.meta[chave])
+		return null;
+
+	var valor = layout.meta[chave];
+	delete layout.meta[chave];
+
+	if(!Object.keys(layout.meta).length)
+		delete layout.meta;
+
+	return valor;
+}
+
+// Quadros da animação 'Animar' (ver _adiciona_animacao): o quadro d mostra os d + 1 primeiros pontos de cada
+// trace. São montados aqui, a partir das séries completas, em vez de virem gravados no JSON.
+function montaQuadros(data, traces) {
+	var quadros = [];
+	var total = data[traces[0]].x.length;
+
+	for(var d = 0; d < total; d++)
+		quadros.push({
+			data: traces.map(function(i) {
+				return {type: data[i].type, x: data[i].x.slice(0, d + 1), y: data[i].y.slice(0, d + 1)};
+			}),
+			traces: traces
+		});
+
+	return quadros;
+}
+
+function carregaGrafico(idDiv, nome, versaoMobile) {
+	var detalhe = null;
+
+	fetch(nome + '.json')
+		.then(function(resposta) {
+			return resposta.json();
+		})
+		.then(function(especificacao) {
+			var figura = montaFigura(especificacao, versaoMobile);
+			detalhe = figura.detalhe;
+
+			return Plotly.newPlot(idDiv, {data: figura.data, layout: figura.layout, frames: figura.frames,
+			                              config: {responsive: true}});
+		})
+		.then(function(div) {
+			div.on('plotly_buttonclicked', function(evento) {
+				carregaDadosBotao(div, nome, evento.button);
+			});
+
+			if(detalhe)
+				carregaDetalheNoZoom(div, nome, detalhe);
+		})
+		.catch(function(err) {
+			console.log('Erro: não foi possível carregar o gráfico ' + nome + '.', err);
+		});
+}
+
+// Arquivos com {traces, vetores} gravados por escreve_dados_grafico, relativos à pasta do gráfico.
+function buscaTraces(nome, arquivo) {
+	var pasta = nome.substring(0, nome.lastIndexOf('/') + 1);
+	var traces = null;
+
+	return fetch(pasta + arquivo)
+		.then(function(resposta) {
+			return resposta.json();
+		})
+		.then(function(especificacao) {
+			traces = especificacao.traces;
+
+			return carregaVetores(pasta, especificacao.vetores || []);
+		})
+		.then(function(vetores) {
+			return resolveVetores(traces, vetores);
+		});
+}
+
+// Vetores longos vêm em trechos, {blocos: [nome, ...]}, gravados em blocos/<nome>.json (ver _escreve_bloco):
+// cada trecho é buscado e decodificado e as partes são unidas na ordem.
+function carregaVetores(pasta, vetores) {
+	return Promise.all(vetores.map(function(vetor) {
+		if(!ehObjeto(vetor) || !Array.isArray(vetor.blocos))
+			return decodificaVetor(vetor);
+
+		return Promise.all(vetor.blocos.map(function(bloco) {
+			return fetch(pasta + 'blocos/' + bloco + '.json')
+				.then(function(resposta) {
+					return resposta.json();
+				})
+				.then(decodificaVetor);
+		})).then(juntaVetores);
+	}));
+}
+
+function juntaVetores(partes) {
+	if(!partes.every(function(parte) { return ArrayBuffer.isView(parte); }))
+		return partes.reduce(function(vetor, parte) {
+			return vetor.concat(Array.prototype.slice.call(parte));
+		}, []);
+
+	var total = partes.reduce(function(soma, parte) {
+		return soma + parte.length;
+	}, 0);
+
+	var vetor = new Float64Array(total);
+	var inicio = 0;
+
+	partes.forEach(function(parte) {
+		vetor.set(parte, inicio);
+		inicio += parte.length;
+	});
+
+	return vetor;
+}
+
+// Atualização para Plotly.restyle/update com os atributos presentes em algum dos traces.
+function atributosTraces(traces, atributos) {
+	var atualizacao = {};
+
+	atributos.forEach(function(atributo) {
+		if(traces.some(function(trace) { return atributo in trace; }))
+			atualizacao[atributo] = traces.map(function(trace) {
+				return trace[atributo];
+			});
+	});
+
+	return atualizacao;
+}
+
+// Botões com method 'skip' e args[0] = {arquivo, traces} trazem os dados dos traces em arquivos à parte
+// (ex.: isolamento/<município>.json), buscados só quando o botão é escolhido; args[1] vai para o layout.
+function carregaDadosBotao(div, nome, botao) {
+	if(!botao || botao.method !== 'skip' || !botao.args || !ehObjeto(botao.args[0]) || !botao.args[0].arquivo)
+		return;
+
+	var dados = botao.args[0];
+
+	buscaTraces(nome, dados.arquivo)
+		.then(function(traces) {
+			var atualizacao = atributosTraces(traces, ['x', 'y', 'text', 'name']);
+
+			atualizacao.visible = traces.map(function() {
+				return true;
+			});
+
+			var ocultos = [];
+
+			for(var i = 0; i < div.data.length; i++)
+				if(dados.traces.indexOf(i) < 0)
+					ocultos.push(i);
+
+			var oculta = ocultos.length ? Plotly.restyle(div, {visible: false}, ocultos) : Promise.resolve();
+
+			return oculta.then(function() {
+				return Plotly.update(div, atualizacao, botao.args[1] || {}, dados.traces);
+			});
+		})
+		.catch(function(err) {
+			console.log('Erro: não foi possível carregar os dados de ' + dados.arquivo + '.', err);
+		});
+}
+
+// Séries longas chegam reduzidas (ver _decima_series); no primeiro zoom no eixo x os traces em detalhe.traces
+// recebem os pontos de detalhe.arquivo e passam a mostrar a resolução completa.
+function carregaDetalheNoZoom(div, nome, detalhe) {
+	var carregado = false;
+
+	div.on('plotly_relayout', function(evento) {
+		if(carregado || !('xaxis.range[0]' in evento || 'xaxis.range' in evento))
+			return;
+
+		carregado = true;
+
+		buscaTraces(nome, detalhe.arquivo)
+			.then(function(traces) {
+				var atualizacao = atributosTraces(traces, ['x', 'y', 'text', 'hovertext', 'customdata']);
+
+				return Plotly.restyle(div, atualizacao, detalhe.traces);
+			})
+			.catch(function(err) {
+				carregado = false;
+				console.log('Erro: não foi possível carregar os dados de ' + detalhe.arquivo + '.', err);
+			});
+	});
+}
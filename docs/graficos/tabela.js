@@ -0,0 +1,224 @@
+// Ordenação das tabelas gravadas por covid19sp.py (ver escreve_tabela): um clique no cabeçalho ordena a
+// coluna, do maior para o menor e, no clique seguinte, do menor para o maior. Células com data-valor são
+// comparadas por esse número (vazio: indisponível, sempre no fim) e as demais pelo texto.
+//
+// Tabelas com a classe 'virtual' trazem as linhas em data-dados ({celulas, valores}, por coluna; ver
+// _escreve_tabela_json) e só as linhas visíveis na área de rolagem ficam no documento.
+
+// linhas desenhadas além das visíveis, acima e abaixo, para que a rolagem não mostre espaços em branco
+var LINHAS_EXTRAS = 10;
+
+function chaveCelula(celula) {
+	var valor = celula.getAttribute('data-valor');
+
+	if(valor === null)
+		return celula.textContent;
+
+	return valor === '' ? null : parseFloat(valor);
+}
+
+function comparaChaves(a, b) {
+	if(typeof a === 'string' || typeof b === 'string')
+		return String(a).localeCompare(String(b), 'pt-BR');
+
+	return a - b;
+}
+
+function comparaOrdem(a, b, crescente) {
+	if(a === null || b === null)
+		return (a === null) - (b === null);
+
+	return crescente ? comparaChaves(a, b) : comparaChaves(b, a);
+}
+
+// Marca a coluna ordenada no cabeçalho e devolve o sentido da nova ordenação.
+function alternaOrdem(tabela, coluna) {
+	var titulos = tabela.tHead.rows[0].cells;
+	var crescente = titulos[coluna].getAttribute('aria-sort') === 'descending';
+
+	for(var i = 0; i < titulos.length; i++)
+		titulos[i].removeAttribute('aria-sort');
+
+	titulos[coluna].setAttribute('aria-sort', crescente ? 'ascending' : 'descending');
+
+	return crescente;
+}
+
+function ordenaTabela(tabela, coluna) {
+	var crescente = alternaOrdem(tabela, coluna);
+	var corpo = tabela.tBodies[0];
+	var linhas = Array.prototype.slice.call(corpo.rows).map(function(linha) {
+		return {linha: linha, chave: chaveCelula(linha.cells[coluna])};
+	});
+
+	linhas.sort(function(a, b) {
+		return comparaOrdem(a.chave, b.chave, crescente);
+	});
+
+	linhas.forEach(function(item) {
+		corpo.appendChild(item.linha);
+	});
+}
+
+function textoSimples(html) {
+	return String(html).replace(/<[^>]*>/g, '');
+}
+
+// Texto para a busca: sem acentos e em minúsculas.
+function normalizaBusca(texto) {
+	return texto.normalize('NFD').replace(/[\u0300-\u036f]/g, '').toLowerCase();
+}
+
+function carregaTabelaVirtual(tabela) {
+	fetch(tabela.getAttribute('data-dados'))
+		.then(function(resposta) {
+			return resposta.json();
+		})
+		.then(function(dados) {
+			montaTabelaVirtual(tabela, dados);
+		})
+		.catch(function(err) {
+			console.log('Erro: não foi possível carregar a tabela ' + tabela.getAttribute('data-dados') + '.', err);
+		});
+}
+
+function montaTabelaVirtual(tabela, dados) {
+	var total = dados.celulas.length ? dados.celulas[0].length : 0;
+	var textos = [];
+
+	for(var i = 0; i < total; i++)
+		textos.push(normalizaBusca(dados.celulas.map(function(coluna) {
+			return textoSimples(coluna[i]);
+		}).join(' ')));
+
+	var estado = {
+		tabela: tabela,
+		rolagem: tabela.parentNode,
+		dados: dados,
+		textos: textos,
+		titulosLinhas: tabela.getAttribute('data-titulos-linhas') === 'true',
+		ordem: textos.map(function(texto, i) { return i; }),
+		linhas: null,
+		alturaLinha: 0,
+		busca: ''
+	};
+
+	var desenhando = false;
+
+	estado.rolagem.addEventListener('scroll', function() {
+		if(desenhando)
+			return;
+
+		desenhando = true;
+
+		requestAnimationFrame(function() {
+			desenhando = false;
+			desenhaLinhas(estado, false);
+		});
+	});
+
+	Array.prototype.forEach.call(tabela.tHead.rows[0].cells, function(titulo, coluna) {
+		titulo.addEventListener('click', function() {
+			ordenaTabelaVirtual(estado, coluna);
+		});
+	});
+
+	var busca = document.querySelector('input.busca');
+
+	if(busca)
+		busca.addEventListener('input', function() {
+			estado.busca = normalizaBusca(busca.value.trim());
+			filtraLinhas(estado);
+		});
+
+	filtraLinhas(estado);
+}
+
+function ordenaTabelaVirtual(estado, coluna) {
+	var crescente = alternaOrdem(estado.tabela, coluna);
+	var valores = estado.dados.valores[coluna];
+	var celulas = estado.dados.celulas[coluna];
+
+	var chave = valores ? function(i) { return valores[i]; } : function(i) { return textoSimples(celulas[i]); };
+
+	estado.ordem.sort(function(a, b) {
+		return comparaOrdem(chave(a), chave(b), crescente);
+	});
+
+	filtraLinhas(estado);
+}
+
+function filtraLinhas(estado) {
+	estado.linhas = estado.busca ? estado.ordem.filter(function(i) {
+		return estado.textos[i].indexOf(estado.busca) >= 0;
+	}) : estado.ordem;
+
+	estado.rolagem.scrollTop = 0;
+	desenhaLinhas(estado, true);
+}
+
+function espacoLinhas(altura, colunas) {
+	return altura > 0 ? '<tr class="espaco"><td colspan="' + colunas + '" style="height:' + altura + 'px"></td></tr>' : '';
+}
+
+function desenhaLinhas(estado, forcar) {
+	var celulas = estado.dados.celulas;
+	var linhas = estado.linhas;
+	var altura = estado.alturaLinha || 30;
+	var rolagem = estado.rolagem;
+
+	var inicio = Math.max(0, Math.floor(rolagem.scrollTop / altura) - LINHAS_EXTRAS);
+	var fim = Math.min(linhas.length, Math.ceil((rolagem.scrollTop + rolagem.clientHeight) / altura) + LINHAS_EXTRAS);
+
+	if(!forcar && inicio === estado.inicio && fim === estado.fim)
+		return;
+
+	estado.inicio = inicio;
+	estado.fim = fim;
+
+	var html = [espacoLinhas(inicio * altura, celulas.length)];
+
+	for(var k = inicio; k < fim; k++) {
+		var i = linhas[k];
+
+		html.push('<tr>');
+
+		for(var j = 0; j < celulas.length; j++) {
+			if(estado.titulosLinhas && j === 0)
+				html.push('<th scope="row">' + celulas[j][i] + '</th>');
+			else
+				html.push('<td>' + celulas[j][i] + '</td>');
+		}
+
+		html.push('</tr>');
+	}
+
+	html.push(espacoLinhas((linhas.length - fim) * altura, celulas.length));
+
+	var corpo = estado.tabela.tBodies[0];
+	corpo.innerHTML = html.join('');
+
+	// a altura real das linhas (com as bordas) só é conhecida depois de desenhar as primeiras delas
+	if(!estado.alturaLinha && fim - inicio > 1) {
+		var primeira = inicio > 0 ? 1 : 0;
+		var medida = corpo.rows[primeira + 1].offsetTop - corpo.rows[primeira].offsetTop;
+
+		if(medida > 0) {
+			estado.alturaLinha = medida;
+			desenhaLinhas(estado, true);
+		}
+	}
+}
+
+Array.prototype.forEach.call(document.querySelectorAll('table.ordenavel'), function(tabela) {
+	if(tabela.classList.contains('virtual')) {
+		carregaTabelaVirtual(tabela);
+		return;
+	}
+
+	Array.prototype.forEach.call(tabela.tHead.rows[0].cells, function(titulo, coluna) {
+		titulo.addEventListener('click', function() {
+			ordenaTabela(tabela, coluna);
+		});
+	});
+});
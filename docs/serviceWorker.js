@@ -1,95 +1,149 @@
-const VERSAO = '03'
-const CACHE_NAME = 'Covid19-SP-13/10/2022-' + VERSAO;
-
-const CACHE_URLS = [
-	'index.html',
-	'manifest.json',
-	'css/style.css',
-	'serviceWorker.js',
-	'app.js',
-	'graficos/plotly.min.js',
-	'graficos/anhembi-mobile.html',
-	'graficos/anhembi.html',
-	'graficos/casos-cidade-mobile.html',
-	'graficos/casos-cidade.html',
-	'graficos/casos-estado-mobile.html',
-	'graficos/casos-estado.html',
-	'graficos/isolamento-mobile.html',
-	'graficos/isolamento.html',
-	'graficos/leitos-municipais-mobile.html',
-	'graficos/leitos-municipais.html',
-	'graficos/leitos-estaduais-mobile.html',
-	'graficos/leitos-estaduais.html',
-	'graficos/pacaembu-mobile.html',
-	'graficos/pacaembu.html',
-	'graficos/resumo-mobile.html',
-	'graficos/resumo.html',
-	'graficos/resumo-vacinacao-mobile.html',
-	'graficos/resumo-vacinacao.html',
-	'graficos/tabela-isolamento-mobile.html',
-	'graficos/tabela-isolamento.html',
-	'graficos/evolucao-estado.html',
-	'graficos/evolucao-estado-mobile.html',
-	'graficos/evolucao-cidade.html',
-	'graficos/evolucao-cidade-mobile.html',
-	'graficos/resumo-semanal-mobile.html',
-	'graficos/resumo-semanal.html',
-	'graficos/leitos-municipais-privados-mobile.html',
-	'graficos/leitos-municipais-privados.html',
-	'graficos/leitos-municipais-total-mobile.html',
-	'graficos/leitos-municipais-total.html',
-	'graficos/drs-mobile.html',
-	'graficos/drs.html',
-	'graficos/doencas-casos-mobile.html',
-	'graficos/doencas-casos.html',
-	'graficos/doencas-obitos-mobile.html',
-	'graficos/doencas-obitos.html',
-	'graficos/vacinacao-estado-mobile.html',
-	'graficos/vacinacao-estado.html',
-	'graficos/vacinacao-cidade-mobile.html',
-	'graficos/vacinacao-cidade.html',
-	'graficos/populacao-vacinada-mobile.html',
-	'graficos/populacao-vacinada.html',
-	'graficos/vacinas-aplicadas-mobile.html',
-	'graficos/vacinas-aplicadas.html',
-	'graficos/vacinas-tipo-mobile.html',
-	'graficos/vacinas-tipo.html',
-	'graficos/tabela_vacinacao.html',
-	'graficos/tabela-vacinacao-mobile.html',
-	'images/bg01.png',	
-	'icons/android-chrome-192x192.png',
-	'icons/android-chrome-512x512.png',
-	'icons/apple-touch-icon.png',
-	'icons/favicon-16x16.png',
-	'icons/favicon-32x32.png',
-	'icons/favicon.ico'
+// Arquivos do site com a revisão do conteúdo, [URL relativa, revisão]: os de PRECACHE são guardados na
+// instalação e os de CACHE_NO_USO na primeira vez que são pedidos.
+// início do manifesto (gerado por covid19sp.py)
+const PRECACHE = [
+	['app.js', '3d2175019aae'],
+	['css/style.css', 'bb7210e74a0a'],
+	['graficos/resumo-mobile.html', '69a492cc20f9'],
+	['graficos/resumo-semanal-mobile.html', '0574887c3ab1'],
+	['graficos/resumo-semanal.html', '7ee74baf36c5'],
+	['graficos/resumo-vacinacao-mobile.html', '719667bc29d6'],
+	['graficos/resumo-vacinacao.html', '092207b30771'],
+	['graficos/resumo.html', 'a8ff02d5f68f'],
+	['graficos/tabela.css', '983b79a589e3'],
+	['graficos/tabela.js', 'deeb614bb031'],
+	['icons/android-chrome-192x192.png', '64708f213555'],
+	['icons/android-chrome-512x512.png', '91fa646c8085'],
+	['icons/apple-touch-icon.png', 'bb14ee006585'],
+	['icons/favicon-16x16.png', 'a902d582e3cc'],
+	['icons/favicon-32x32.png', '5c2905dfc0ec'],
+	['icons/favicon.ico', 'b078cd8e68d9'],
+	['images/bg01.png', '18a2f56276e3'],
+	['index.html', 'dc0cd55a4b4c'],
+	['manifest.json', 'ca0dd18518b1']
 ];
 
+const CACHE_NO_USO = [
+	['graficos/anhembi-mobile.html', '96147352d729'],
+	['graficos/anhembi.html', 'a0336e3b675f'],
+	['graficos/casos-cidade-mobile.html', 'db0481077b09'],
+	['graficos/casos-cidade.html', '4287fdf48ce8'],
+	['graficos/casos-estado-mobile.html', 'bb081221d461'],
+	['graficos/casos-estado.html', 'bc67861df3d6'],
+	['graficos/doencas-casos-mobile.html', '55cbc89fa2fb'],
+	['graficos/doencas-casos.html', '64e4b7ee4052'],
+	['graficos/doencas-obitos-mobile.html', 'dcf595a556cd'],
+	['graficos/doencas-obitos.html', '123aaff4dac1'],
+	['graficos/efeito-cidade-mobile.html', '105a67f6682f'],
+	['graficos/efeito-cidade.html', 'da6fa56df952'],
+	['graficos/efeito-estado-mobile.html', '55d5ad8175a2'],
+	['graficos/efeito-estado.html', '38d0b0bd9251'],
+	['graficos/evolucao-cidade-mobile.html', '21e69e272d8c'],
+	['graficos/evolucao-cidade.html', 'd54871aee97a'],
+	['graficos/evolucao-estado-mobile.html', '5e45283e1b2f'],
+	['graficos/evolucao-estado.html', '39c6d37b10bf'],
+	['graficos/grafico.js', 'cd4a5a08253b'],
+	['graficos/imunizantes-mobile.html', 'b8bf6123c0d7'],
+	['graficos/imunizantes.html', 'ba923a0e4358'],
+	['graficos/isolamento-mobile.html', '5894795d0bb7'],
+	['graficos/isolamento.html', '0530ef447c3e'],
+	['graficos/leitos-estaduais-mobile.html', '170eb5f8791d'],
+	['graficos/leitos-estaduais.html', '910dd886b84f'],
+	['graficos/pacaembu-mobile.html', 'c5477d1775b8'],
+	['graficos/pacaembu.html', 'f7d27ef0ce78'],
+	['graficos/plotly.min.js', '79126c798fb5'],
+	['graficos/populacao-3doses-mobile.html', '7091afaff0d3'],
+	['graficos/populacao-3doses.html', 'fbbdade6ad56'],
+	['graficos/populacao-imunizada-mobile.html', 'fcabc12ecf6b'],
+	['graficos/populacao-imunizada.html', 'e5322557d2e3'],
+	['graficos/populacao-vacinada-mobile.html', 'fc70dfbbdfa1'],
+	['graficos/populacao-vacinada.html', '24cd96d01026'],
+	['graficos/raca-cor-mobile.html', 'fb7d5eb2f55e'],
+	['graficos/raca-cor.html', 'ad289fa94489'],
+	['graficos/tabela-isolamento-mobile.html', 'fcbe5e6c624d'],
+	['graficos/tabela-isolamento.html', 'b45ef27dec38'],
+	['graficos/tabela-vacinacao-mobile.html', '588bfab1d6f6'],
+	['graficos/tabela-vacinacao.html', '40ea4d02edb2'],
+	['graficos/vacinacao-cidade-mobile.html', '55c5ba37ccee'],
+	['graficos/vacinacao-cidade.html', '780d60bd9efa'],
+	['graficos/vacinacao-estado-mobile.html', 'f0b0011b459a'],
+	['graficos/vacinacao-estado.html', '286c2f041779'],
+	['graficos/vacinas-aplicadas-mobile.html', 'bb9d3420d609'],
+	['graficos/vacinas-aplicadas.html', '593b4781afe9'],
+	['graficos/vacinas-tipo-mobile.html', '917d4048baae'],
+	['graficos/vacinas-tipo.html', '18b1ef4627c9']
+];
+// fim do manifesto
+
+const CACHE_ARQUIVOS = 'Covid19-SP-arquivos';
+
+// Arquivos fora do manifesto (dados carregados sob demanda e blocos de dados) baixados há mais de
+// DIAS_FORA_DO_MANIFESTO dias são excluídos na ativação, para que os blocos de dias anteriores não se acumulem.
+const DIAS_FORA_DO_MANIFESTO = 14;
+
+// URL absoluta -> URL com a revisão, usada como chave no cache: um arquivo só é baixado de novo quando a sua
+// revisão muda, e as demais entradas continuam valendo entre versões do serviceWorker
+function chavesRevisoes(manifesto) {
+	return new Map(manifesto.map(([arquivo, revisao]) => {
+		const url = new URL(arquivo, self.location).href;
+		return [url, url + '?v=' + revisao];
+	}));
+}
+
+const CHAVES_PRECACHE = chavesRevisoes(PRECACHE);
+const CHAVES = new Map([...CHAVES_PRECACHE, ...chavesRevisoes(CACHE_NO_USO)]);
+
+function semParametros(url) {
+	url = new URL(url);
+	url.search = '';
+	url.hash = '';
+
+	return url.href;
+}
+
 // The install handler takes care of precaching the resources we always need.
-self.addEventListener('install', event => {	
-	console.log('O serviceWorker está salvando os arquivos no cache...');
-	
+self.addEventListener('install', event => {
 	event.waitUntil(
-		caches.open(CACHE_NAME)
-			.then(cache => cache.addAll(CACHE_URLS))
-			.then(self.skipWaiting())
+		caches.open(CACHE_ARQUIVOS)
+			.then(cache => cache.keys().then(requisicoes => {
+				const guardadas = new Set(requisicoes.map(requisicao => requisicao.url));
+				const novas = [...CHAVES_PRECACHE.values()].filter(chave => !guardadas.has(chave));
+
+				console.log('O serviceWorker está salvando ' + novas.length + ' de ' + CHAVES_PRECACHE.size +
+				            ' arquivos no cache...');
+
+				return cache.addAll(novas);
+			}))
+			.then(() => self.skipWaiting())
 			.catch(function(err) {
 				console.log("O serviceWorker não salvou os arquivos em cache.", err);
 			})
 	);
 });
 
-// The activate handler takes care of cleaning up old caches.
+// The activate handler takes care of cleaning up old caches. Outdated revisions of PRECACHE files are
+// dropped; those of other files stay until replaced, so they can still be served while revalidating.
+// Files outside the manifest are dropped once older than DIAS_FORA_DO_MANIFESTO (see antigoForaDoManifesto).
 self.addEventListener('activate', event => {
 	event.waitUntil(
 		caches.keys().then(function(cacheNames) {
 			return Promise.all(cacheNames.map(function(thisCacheName) {
-				if (thisCacheName !== CACHE_NAME) {
+				if (thisCacheName !== CACHE_ARQUIVOS) {
 					console.log('O serviceWorker está excluindo o cache', thisCacheName);
 					return caches.delete(thisCacheName);
 				}
 			}));
 		})
+		.then(() => caches.open(CACHE_ARQUIVOS))
+		.then(cache => cache.keys().then(requisicoes => Promise.all(requisicoes.map(requisicao => {
+			const url = semParametros(requisicao.url);
+
+			if(CHAVES_PRECACHE.has(url))
+				return CHAVES_PRECACHE.get(url) !== requisicao.url && cache.delete(requisicao);
+
+			if(!CHAVES.has(url))
+				return antigoForaDoManifesto(cache, requisicao).then(antigo => antigo && cache.delete(requisicao));
+		}))))
 		.then(() => self.clients.claim())
 		.catch(function(err) {
 			console.log("O serviceWorker não foi ativado.", err);
@@ -97,31 +151,71 @@ self.addEventListener('activate', event => {
 	);
 });
 
-// The fetch handler serves responses for same-origin resources from
-// a cache. If no response is found, it populates the cache with the
-// response from the network before returning it to the page.
+// A data de um arquivo no cache é a do cabeçalho Date da resposta guardada, renovada a cada revalidação (ver
+// atualizaCache); blocos de dados, que não são revalidados, valem pela data em que foram baixados.
+function antigoForaDoManifesto(cache, requisicao) {
+	return cache.match(requisicao).then(resposta => {
+		const data = resposta ? Date.parse(resposta.headers.get('date')) : NaN;
+		return isNaN(data) || Date.now() - data > DIAS_FORA_DO_MANIFESTO * 24 * 60 * 60 * 1000;
+	});
+}
+
+// Busca chave (a URL com a revisão, ou a própria URL pedida) e guarda a resposta no lugar das anteriores.
+function atualizaCache(cache, url, chave) {
+	return fetch(chave).then(response => {
+		if(!response.ok)
+			return response;
+
+		return cache.keys(url, {ignoreSearch: true})
+			.then(requisicoes => Promise.all(requisicoes.map(requisicao => cache.delete(requisicao))))
+			.then(() => cache.put(chave, response.clone()))
+			.then(() => response);
+	});
+}
+
+// The fetch handler serves same-origin resources from the cache. A file whose current revision is
+// cached is served as is; otherwise any cached copy is served at once while the current one is
+// fetched in the background (stale-while-revalidate). Files never seen before come from the network.
 self.addEventListener('fetch', event => {
-	if(event.request.url.startsWith(self.location.origin)) {
-		event.respondWith(
-			caches.match(event.request).then(cachedResponse => {
-				if(cachedResponse) {
-					console.log('O serviceWorker buscou dados em cache.');
-					return cachedResponse;
-				}
+	if(event.request.method !== 'GET' || !event.request.url.startsWith(self.location.origin))
+		return;
+
+	// a pasta do site é servida pelo index.html
+	let url = semParametros(event.request.url);
+
+	if(url.endsWith('/') && CHAVES.has(url + 'index.html'))
+		url += 'index.html';
+
+	// arquivos fora do manifesto (ex.: dados carregados sob demanda) são guardados pela própria URL e, sem
+	// revisão conhecida, são sempre revalidados
+	const revisao = CHAVES.get(url);
+	const chave = revisao || event.request.url;
+
+	// blocos de dados têm o resumo do conteúdo no nome e nunca mudam
+	const imutavel = url.includes('/graficos/blocos/');
+
+	event.respondWith(
+		caches.open(CACHE_ARQUIVOS).then(cache => {
+			return cache.match(chave).then(atual => {
+				if(atual && (revisao || imutavel))
+					return atual;
+
+				return (atual ? Promise.resolve(atual) : cache.match(url, {ignoreSearch: true})).then(anterior => {
+					const atualizacao = atualizaCache(cache, url, chave);
+
+					if(!anterior)
+						return atualizacao;
 
-				console.log('O serviceWorker buscou dados do servidor.');
+					event.waitUntil(atualizacao.catch(function(err) {
+						console.log('O serviceWorker não conseguiu atualizar ' + url + '.', err);
+					}));
 
-				return caches.open(CACHE_NAME).then(cache => {
-					return fetch(event.request).then(response => {
-						return cache.put(event.request, response.clone()).then(() => {
-							return response;
-						});
-					});
+					return anterior;
 				});
-			})
-			.catch(function(err) {
-				console.log("O serviceWorker não conseguiu buscar dados.", err);
-			})
-		);
-	}
+			});
+		})
+		.catch(function(err) {
+			console.log("O serviceWorker não conseguiu buscar dados.", err);
+		})
+	);
 });